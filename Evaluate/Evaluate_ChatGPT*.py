@@ -1,29 +1,23 @@
-import json
-import re
-from collections import OrderedDict
+import argparse
+from collections import Counter, OrderedDict
+from standard_index import load_standard_index, category_from_path
+from graph_cache import GraphCache
+from stream_results import iter_records
+from parallel_eval import score_in_order
+from verdict_cache import VerdictCache
+from graph_algorithms import is_shortest_path, is_simple_cycle, is_hamilton_path, audit_gold_answers, verify_candidates
+from answer_keys import audit_answer_keys, gold_yes_no
+from answer_parser import parse_connectivity, parse_cycle, parse_shortestpath, parse_hamiltonpath, pop_rule_hits
+from instrumentation import profiler
 
-# Load JSON file
-def load_json(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        return json.load(file)
+# Bump whenever a checker changes, so cached verdicts are scored again
+EVALUATOR_VERSION = "chatgpt-5"
 
-def extract_path(answer):
-    # Extract path information
-    path_match = re.search(r"The path is? ([\d\s\-,>→node]+)", answer)
-    if not path_match:  # For sample1
-        path_match = re.search(r"The path is simply? ([\d\s\-,>→node]+)", answer, re.IGNORECASE)
-    if not path_match:
-        path_match = re.search(r"The path is as follows\s+\(([\d\s,]+)\)", answer)
-    if not path_match:
-        path_match = re.search(r"The path is\s+\(([\d\s,]+)\)", answer)
-    if path_match:
-        path_str = path_match.group(1)
-        # Replace all arrows and connectors to a unified format, and remove 'node' text
-        path_str = path_str.replace('node', '').replace('->', '-').replace('→', '-').replace(',', '-').replace(' ', '')
-        # Extract all edges
-        nodes = [int(node) for node in re.findall(r'\b\d+\b', path_str)]
-        return nodes
-    return []
+def print_verbose(*lines):
+    """Print what a checker found in one answer, only with --verbose"""
+    if verbose:
+        for line in lines:
+            print(line)
 
 def convert_nodes_to_edges_connectivity(nodes):
     edges = []
@@ -31,37 +25,6 @@ def convert_nodes_to_edges_connectivity(nodes):
         edges.append((nodes[i], nodes[i + 1]))
     return edges
 
-def extract_cycle(answer):
-    answer = answer.replace('\n', '')
-    # Match strings that may contain cycles
-    cycle_str_match = re.search(r"the cycle is(?: node)?(.*?)(?=[\.\n])", answer, re.IGNORECASE)
-    if not cycle_str_match:
-        cycle_str_match = re.search(r"the cycle with the fewest number of nodes(.*?)(?=(?:Yes.*?\.)|which|$)", answer, re.IGNORECASE)
-    if not cycle_str_match:
-        print("***")
-    if cycle_str_match:
-        cycle_str = cycle_str_match.group(1)
-        # Replace all arrows and connectors to a unified format
-        cycle_str = cycle_str.replace('->', '-').replace('→', '-').replace(',', '-').replace(' ', '')
-        # Remove all non-digit characters, except separators
-        cycle_str = re.sub(r"[^\d,\- >→]", '', cycle_str)
-        # Split the string into a list of nodes
-        nodes = cycle_str.split('-')
-        # Filter out nodes that cannot be converted to integers
-        filtered_nodes = [node for node in nodes if node.isdigit()]
-        # Convert the list of nodes to a tuple of edges
-        # print(filtered_nodes)
-        edges = convert_nodes_to_edges_cycle(list(map(int, filtered_nodes)))
-        return edges
-    # Match the case where only a sequence of numbers is given
-    cycle_str_match = re.search(r"The cycle is (\d+(?:, \d+)*).", answer)
-    if cycle_str_match:
-        cycle_str = cycle_str_match.group(1)
-        nodes = [int(node.strip()) for node in cycle_str.split(',')]
-        edges = convert_nodes_to_edges_cycle(nodes)
-        return edges
-    return []
-
 def convert_nodes_to_edges_cycle(nodes):
     edges = OrderedDict()  # Use OrderedDict to store edges to avoid duplication and maintain order
     for i in range(len(nodes) - 1):
@@ -75,72 +38,6 @@ def convert_nodes_to_edges_cycle(nodes):
         edges[edge] = None
     return list(edges.keys())  # Return an ordered list of edges
 
-def extract_shortest_path_and_weight(answer):
-    sentences = re.split(r'[\.\n]', answer)
-    last_sentence = sentences[-2].strip() if len(sentences) > 1 else answer.strip()
-    path = []
-    # Special case, equivalent to a patch
-    if "either" in last_sentence and "or" in last_sentence and "through" in last_sentence:
-        either_or_match = re.search(r'or\s+(.*?)\s+with', last_sentence, re.IGNORECASE)
-        through_match = re.search(r'from node (\d+)\s+to node (\d+)', last_sentence, re.IGNORECASE)
-        if either_or_match and through_match:
-            through_nodes = either_or_match.group(1).replace('node', '').replace('Node', '')
-            start, end = through_match.groups()
-            path = [int(start)] + [int(node.strip()) for node in through_nodes.split(',') if node.strip().isdigit()] + [int(end)]
-    elif "either" in last_sentence and "or" in last_sentence:
-        either_or_match = re.search(r'either\s+(.*?)\s+or', last_sentence, re.IGNORECASE)
-        if either_or_match:
-            path_str = either_or_match.group(1).replace('->', ',').replace('→', ',').replace('-', ',')
-            path = [int(node.strip()) for node in path_str.split(',') if node.strip().isdigit()]
-    elif "through" in last_sentence:
-        through_match = re.search(r'from node (\d+)\s+to node (\d+).*?through\s+(.*?)\s+(?:with|\.|$)', last_sentence, re.IGNORECASE)
-        if through_match:
-            start, end, through_nodes = through_match.groups()
-            through_nodes = through_nodes.replace('node', '').replace('Node', '')  # Remove 'node'
-            path = [int(start)] + [int(node.strip()) for node in through_nodes.split(',') if node.strip().isdigit()] + [int(end)]
-    elif "directly" in last_sentence:
-        directly_match = re.search(r'from node (\d+)\s+to node (\d+)', last_sentence, re.IGNORECASE)
-        if directly_match:
-            path = [int(directly_match.group(1)), int(directly_match.group(2))]
-    # Extract the path
-    else:
-        path_match = re.search(r'is\s+(.*?)(?:\s+with|\.|$)', last_sentence, re.IGNORECASE)
-        if path_match:
-            path_str = path_match.group(1)
-            path = [int(node) for node in re.findall(r'\b\d+\b', path_str)]
-    # Extract the weight
-    weight_match = re.search(r'total weight(?: is)?[^\d]*(\d+)', last_sentence, re.IGNORECASE)
-    weight = int(weight_match.group(1)) if weight_match else 0
-    return path, weight
-
-def extract_hamiltonpath(answer):
-    # Extract the Hamilton path
-    path_str_match = re.search(r"the path is(?: node)?(.*?)(?=(?:Yes.*?\.)|which|$)", answer, re.IGNORECASE)
-    if not path_str_match:
-        print("***")
-    if path_str_match:
-        path_str = path_str_match.group(1)
-        # Replace all arrows and connectors to a unified format
-        path_str = path_str.replace('->', '-').replace('→', '-').replace(',', '-').replace(' ', '')
-        # Remove all non-digit characters, except separators
-        path_str = re.sub(r"[^\d,\- >→]", '', path_str)
-        # Split the string into a list of nodes
-        nodes = path_str.split('-')
-        # Filter out nodes that cannot be converted to integers
-        filtered_nodes = [node for node in nodes if node.isdigit()]
-        # Convert the list of nodes to a tuple of edges
-        # print(filtered_nodes)
-        edges = convert_nodes_to_edges_hamiltonpath(list(map(int, filtered_nodes)))
-        return edges
-    # Match the case where only a sequence of numbers is given
-    path_str_match = re.search(r"The path is (\d+(?:, \d+)*).", answer)
-    if path_str_match:
-        path_str = path_str_match.group(1)
-        nodes = [int(node.strip()) for node in path_str.split(',')]
-        edges = convert_nodes_to_edges_hamiltonpath(nodes)
-        return edges
-    return []
-
 def convert_nodes_to_edges_hamiltonpath(nodes):
     edges = OrderedDict()  # Use OrderedDict to store edges to prevent duplication and maintain order
     for i in range(len(nodes) - 1):
@@ -151,140 +48,246 @@ def convert_nodes_to_edges_hamiltonpath(nodes):
     return list(edges.keys())  # Return an ordered list of edges
 
 def compare_answers_connectivity(result_answer, standard_answer, qid):
-    # Check the accuracy of yes/no
-    result_yes_no = "yes" if ("yes" in result_answer.lower() or "there is a path" in result_answer.lower()) else ("no" if "no," in result_answer.lower() or "there is no path" in result_answer.lower() else None)
-    standard_yes_no = "yes" if ("yes" in standard_answer.lower()) else "no"
+    # Parse the yes/no and the path
+    parsed = parse_connectivity(result_answer)
+    result_yes_no = parsed.yes_no
+    graph = graph_cache.get('Connectivity', qid)
+    # The expected yes/no comes from the union-find components of the graph
+    standard_yes_no = gold_yes_no(graph, 'Connectivity', standard_answer)
     # If neither "yes" nor "no" is in the result
     if result_yes_no is None:
         return False, False
     roughly_correct = bool(result_yes_no == standard_yes_no)
-    # If the answer is "yes", check if the cycle actually exists
+    # If the answer is "yes", check if the path actually exists
     if result_yes_no == "yes":
-        result_path = extract_path(result_answer)
-        result_edges = convert_nodes_to_edges_connectivity(result_path)
-        # Get the edges of the graph
-        graph_data = standard_data[int(qid)]
-        edges_str = graph_data["conversations"][3]["value"]
-        edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-        edge_strs = edges_str.split("), (")
-        edges = [tuple(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
+        if not roughly_correct:
+            return False, False
+        result_edges = convert_nodes_to_edges_connectivity(parsed.nodes)
+        # The path has to join the queried nodes, in either direction if the graph is undirected
+        if graph.query and parsed.nodes and (parsed.nodes[0], parsed.nodes[-1]) != graph.query:
+            if graph.directed or (parsed.nodes[-1], parsed.nodes[0]) != graph.query:
+                return roughly_correct, False
         # Check if each edge exists in the graph
         for edge in result_edges:
-            if not any(set(edge) == {u, v} for (u, v) in edges):
+            if not graph.has_edge(*edge):
                 return roughly_correct, False
         if len(result_edges) < 1:
             return roughly_correct, False
-        print(f"Yes: No {qid}")
-        print(result_edges)
+        print_verbose(f"Yes: No {qid}", result_edges)
         return True, True
     if result_yes_no == standard_yes_no:
-        print(f"No: No {qid}")
+        print_verbose(f"No: No {qid}")
     return roughly_correct, result_yes_no == standard_yes_no
 
 def compare_answers_cycle(result_answer, standard_answer, qid):
-    # Check the accuracy of yes/no
-    result_yes_no = "yes" if ("yes" in result_answer.lower() or "there is a cycle" in result_answer.lower()) else ("no" if "no," in result_answer.lower() or "there is no cycle" in result_answer.lower() else None)
-    standard_yes_no = "yes" if ("yes" in standard_answer.lower()) else "no"
+    # Parse the yes/no and the cycle
+    parsed = parse_cycle(result_answer)
+    result_yes_no = parsed.yes_no
+    graph = graph_cache.get('Cycle', qid)
+    # The expected yes/no comes from the precomputed cycle key of the graph
+    standard_yes_no = gold_yes_no(graph, 'Cycle', standard_answer)
     # If neither "yes" nor "no" is in the result
     if result_yes_no is None:
         return False, False
     roughly_correct = bool(result_yes_no == standard_yes_no)
     # If the answer is "yes", check if the cycle actually exists
     if result_yes_no == "yes":
-        result_cycle = extract_cycle(result_answer)
-        # Get the edges of the graph
-        graph_data = standard_data[int(qid)]
-        edges_str = graph_data["conversations"][3]["value"]
-        edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-        edge_strs = edges_str.split("), (")
-        edges = [tuple(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
-        # Check if each edge exists in the graph
-        for edge in result_cycle:
-            if not any(set(edge) == {u, v} for (u, v) in edges):
-                return roughly_correct, False
-        if len(result_cycle) < 2:
+        if not roughly_correct:
+            return False, False
+        result_cycle = convert_nodes_to_edges_cycle(parsed.nodes)
+        # The nodes must form a simple closed walk along edges of the graph
+        if not is_simple_cycle(graph, parsed.nodes):
             return roughly_correct, False
-        print(f"Yes: No {qid}")
-        print(result_cycle)
+        print_verbose(f"Yes: No {qid}", result_cycle)
         return True, True
     if result_yes_no == standard_yes_no:
-        print(f"No: No {qid}")
+        print_verbose(f"No: No {qid}")
     return roughly_correct, result_yes_no == standard_yes_no
 
-def compare_answers_shortestpath(result_answer, standard_answer, qid):
-    result_path, result_weight = extract_shortest_path_and_weight(result_answer)
-    standard_path, standard_weight = extract_shortest_path_and_weight(standard_answer)
-    # Print the standard path
-    # print(standard_path)
-    if result_weight != standard_weight:
+def compare_answers_shortestpath(result_answer, qid):
+    _, result_path, result_weight, _ = parse_shortestpath(result_answer)
+    # Get the parsed graph corresponding to the ID, its shortest distances are precomputed
+    graph = graph_cache.get('ShortestPath', qid)
+    # The path must exist in the graph, be a shortest path between the queried nodes and match the stated weight
+    if not is_shortest_path(graph, result_path, result_weight):
         return False
-    # Get data corresponding to the ID
-    graph_data = standard_data[int(qid) - 135]
-    # Get the edges of the graph and properly handle the string format
-    edges_str = graph_data["conversations"][3]["value"]
-    edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-    edge_strs = edges_str.split("), (")
-    edges = [tuple(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
-    # Extract the nodes and weights from the generated path
-    result_path_nodes = result_path
-    result_path_edges = [(result_path_nodes[i], result_path_nodes[i + 1]) for i in range(len(result_path_nodes) - 1)]
-    # Check if the path exists in the graph and calculate the total weight of the path
-    total_weight = 0
-    for edge in result_path_edges:
-        # Find the edge in the graph
-        found_edge = next(((u, v, w) for (u, v, w) in edges if set(edge) == {u, v}), None)
-        if not found_edge:
-            return False
-        total_weight += found_edge[2]
-    # Compare the total weight of the path with the generated weight
-    if (total_weight == result_weight):
-        print(f"No {qid}")
-        print(result_path)
-        print(total_weight)
-    return total_weight == result_weight
+    print_verbose(f"No {qid}", result_path, result_weight)
+    return True
 
 def compare_answers_hamiltonpath(result_answer, standard_answer, qid):
-    # Check the accuracy of yes/no
-    result_yes_no = "yes" if ("yes" in result_answer.lower()) else ("no" if ("no," in result_answer.lower() or "no path" in result_answer.lower()) else None)
+    # Parse the yes/no and the path
+    parsed = parse_hamiltonpath(result_answer)
+    result_yes_no = parsed.yes_no
     standard_yes_no = "yes" if ("yes" in standard_answer.lower()) else "no"
     # If neither "yes" nor "no" is in the result
     if result_yes_no is None:
         return False
     # If the answer is "yes", check if the cycle actually exists
     if result_yes_no == "yes":
-        result_path = extract_hamiltonpath(result_answer)
-        # Get the nodes and edges of the graph
-        graph_data = standard_data[int(qid) - 277]
-        node_str = graph_data["conversations"][1]["value"]  # There are 8 nodes in the diagram.
-        node_count_match = re.search(r"There are (\d+) nodes", node_str)
-        node_count = int(node_count_match.group(1))
-        all_nodes = set(range(node_count))
-        nodes_in_path = set()
-        edges_str = graph_data["conversations"][3]["value"]
-        edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-        edge_strs = edges_str.split("), (")
-        edges = [tuple(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
-        # Check if each edge exists in the graph
-        for edge in result_path:
-            if not any(set(edge) == {u, v} for (u, v) in edges):
-                return False
-            nodes_in_path.update(edge)
-        if nodes_in_path != all_nodes:
+        result_path = convert_nodes_to_edges_hamiltonpath(parsed.nodes)
+        # The path must visit every node exactly once along edges of the graph
+        if not is_hamilton_path(graph_cache.get('HamiltonPath', qid), parsed.nodes):
             return False
-        if len(result_path) < 1:
-            return False
-        print(f"Yes: No {qid}")
-        print(result_path)
+        print_verbose(f"Yes: No {qid}", result_path)
         return True
     if result_yes_no == standard_yes_no:
-        print(f"No: No {qid}")
+        print_verbose(f"No: No {qid}")
     return result_yes_no == standard_yes_no
 
-# Load data
-results_data = load_json('/path/to/results.json')
-standard_data = load_json('/path/to/standard.json') # standard.json can be composed of test.json files under /VisionGraph/Dataset
+def load_ground_truth(standard_files, cache_file=None, profile=False, verbose_output=False):
+    """Load and pre-parse the ground truth used by the checkers (no-op in forked workers, which inherit it)"""
+    global standard_index, graph_cache, verdict_cache, gold_mismatches, verbose
+    if profile and not profiler.enabled:
+        profiler.enable()
+    if verbose_output:
+        verbose = True
+    if standard_index is None:
+        with profiler.stage('ground_truth'):
+            standard_index = load_standard_index(standard_files)
+            graph_cache = GraphCache(standard_index).parse_all()
+            # Precompute the shortest distances, maximum flows and maximum matchings of the questions
+            gold_mismatches = audit_gold_answers(standard_index, graph_cache)
+            # Connectivity components, cycle existence and girth of every graph
+            gold_mismatches += audit_answer_keys(standard_index, graph_cache)
+            if cache_file:
+                verdict_cache = VerdictCache(cache_file, EVALUATOR_VERSION)
+
+def score_answer(category, qid, result_answer):
+    """Verdict [rough_correct, exact_correct, parse_rule_hits] of one segment3 answer"""
+    standard_answer = standard_index.get_answer(category, qid, "segment3")
+    if category == 'Connectivity':
+        rough_correct, exact_correct = compare_answers_connectivity(result_answer, standard_answer, qid)
+    elif category == 'Cycle':
+        rough_correct, exact_correct = compare_answers_cycle(result_answer, standard_answer, qid)
+    elif category == 'ShortestPath':
+        rough_correct = exact_correct = compare_answers_shortestpath(result_answer, qid)
+    else:
+        rough_correct = exact_correct = compare_answers_hamiltonpath(result_answer, standard_answer, qid)
+    return [rough_correct, exact_correct, pop_rule_hits()]
+
+def score_candidates(category, qid, result_answers):
+    """Exact verdicts of the sampled segment3 answers of one question (e.g. the k samples of pass@k)
+
+    Identical answers are checked once. None if the question is missing or its category is not scored.
+    """
+    if category not in question_num or not standard_index.has_record(category, qid):
+        return None
+    return verify_candidates(graph_cache.get(category, qid), result_answers,
+                             lambda graph, result_answer: bool(score_answer(category, qid, result_answer)[1]))
+
+def score_result(result):
+    """Score the segment3 answer of one result, returns (category, id, difficulty, [rough_correct, exact_correct, parse_rule_hits], cache_key)
+
+    The verdict is None if the result has no ground-truth record, and the outcome None if its category is not scored.
+    """
+    qid = result["id"]
+    category = category_from_path(result["image_url"])
+    # Only the concrete graph problems are scored
+    if category not in question_num:
+        return None
+    standard = standard_index.get_record(category, qid)
+    # If the ground truth is not found, skip it but count it
+    if standard is None:
+        return category, qid, None, None, None
+    difficulty = standard["difficulty"]
+    result_answer = result["segment3"]
+    # Reuse the verdict of a previous run if the answer has not changed
+    cache_key = verdict_cache.key(category, standard, "segment3", result_answer) if verdict_cache else None
+    verdict = verdict_cache.get(cache_key) if verdict_cache else None
+    if verdict is not None:
+        return category, qid, difficulty, verdict, cache_key
+    # Answer extraction, the validators time themselves as the 'validation' stage
+    with profiler.item(category, qid), profiler.stage('extraction'):
+        verdict = score_answer(category, qid, result_answer)
+    return category, qid, difficulty, verdict, cache_key
+
+def update_accuracies(outcome):
+    """Merge the outcome of one result into the counters"""
+    if outcome is None:
+        return
+    category, qid, difficulty, verdict, cache_key = outcome
+    if verdict is None:
+        missing_results.append((category, qid))
+        return
+    if cache_key is not None:
+        verdict_cache.add(cache_key, verdict)
+    rough_correct, exact_correct, rule_hits = verdict
+    parse_rule_hits.update(rule_hits)
+    question_num[category][difficulty] += 1
+    if category in ['Connectivity', 'Cycle']:
+        if rough_correct:
+            accuracies[category][difficulty]["segment3_rough"] += 1
+        if exact_correct:
+            accuracies[category][difficulty]["segment3"] += 1
+    elif exact_correct:
+        accuracies[category][difficulty] += 1
+    if verdict_table is not None:
+        verdict_table.add((f"{category}_{difficulty}_segment3", f"{category}_total_segment3"), qid, exact_correct)
+        if category in ['Connectivity', 'Cycle']:
+            verdict_table.add((f"{category}_{difficulty}_segment3_rough", f"{category}_total_segment3_rough"), qid, rough_correct)
+
+def verdict_rows(outcome):
+    """Per-item verdict of one outcome as flat dicts; Connectivity and Cycle also keep the yes/no-only verdict"""
+    if outcome is None or outcome[3] is None:
+        return []
+    category, qid, difficulty, verdict, cache_key = outcome
+    rough_correct, exact_correct, rule_hits = verdict
+    row = {'category': category, 'id': str(qid), 'difficulty': difficulty, 'segment': 'segment3', 'correct': bool(exact_correct)}
+    if category in ['Connectivity', 'Cycle']:
+        row['rough'] = bool(rough_correct)
+    if rule_hits:
+        row['rules'] = sorted(rule_hits)
+    return [row]
+
+def reset_counters():
+    """Zero the counters, e.g. before scoring the results of another model"""
+    parse_rule_hits.clear()
+    missing_results.clear()
+    for category, difficulties in accuracies.items():
+        for difficulty in difficulties:
+            question_num[category][difficulty] = 0
+            if isinstance(difficulties[difficulty], dict):
+                difficulties[difficulty] = dict.fromkeys(difficulties[difficulty], 0)
+            else:
+                difficulties[difficulty] = 0
+
+def missing_warning():
+    """Warning about the results whose (category, id) is not in the ground truth, None if there are none"""
+    if not missing_results:
+        return None
+    examples = ", ".join(f"{category} {id}" for category, id in missing_results[:5])
+    return (f"Warning: {len(missing_results)} results have no ground-truth record and were not scored "
+            f"(e.g. {examples}), check that --standard matches the results")
+
+def print_statistics():
+    for category in accuracies:
+        print(f"Category: {category}")
+        for difficulty in accuracies[category]:
+            # Check if the number of questions is 0
+            if question_num[category][difficulty] == 0:
+                continue
+            if (category == 'ShortestPath' or category == 'HamiltonPath'):
+                accuracy = accuracies[category][difficulty] / question_num[category][difficulty]
+                print(f"  {difficulty} Accuracy: {accuracy:.4f}")
+            else:
+                for segment in ["segment3", "segment3_rough"]:
+                    accuracy = accuracies[category][difficulty][segment] / question_num[category][difficulty]
+                    print(f"  {difficulty} {segment} Accuracy: {accuracy:.4f}")
+    # Print how often each answer-parsing rule matched
+    print("Parse rule hits:")
+    for rule, count in sorted(parse_rule_hits.items()):
+        print(f"  {rule}: {count}")
 
+# Ground truth and verdict cache, loaded by load_ground_truth
+standard_index = None
+graph_cache = None
+verdict_cache = None
+gold_mismatches = []
 # Initialize counters
+parse_rule_hits = Counter()
+missing_results = []  # (category, id) of the results without a ground-truth record
+verbose = False  # Print what the checkers find in every answer
+verdict_table = None  # Per-item verdicts, kept for --bootstrap and --verdicts
 accuracies = {
     "Connectivity": {
         "easy": {"segment3": 0, "segment3_rough": 0},
@@ -306,52 +309,47 @@ question_num = {
     "HamiltonPath": {"easy": 0, "hard": 0}
 }
 
-# Compare the answers
-for result in results_data:
-    qid = result["id"]
-    if(int(qid) <= 561):
-        standard = standard_data[int(qid)]
-    elif(int(qid) >= 903):
-        standard = standard_data[int(qid) - 277]
-    else:
-        standard = standard_data[int(qid) - 135]
-    difficulty = standard["difficulty"]
-    category = result["image_url"].split('/')[6].split('_')[0]
-    if category == 'HamlitonPath':
-        category = 'HamiltonPath'
-    question_num[category][difficulty] += 1
-    result_answer = result["segment3"]
-    standard_answer = standard["conversations"][5]["value"]
-    if category == 'Connectivity':
-        rough_correct, exact_correct = compare_answers_connectivity(result_answer, standard_answer, qid)
-        if rough_correct:
-            accuracies[category][difficulty]["segment3_rough"] += 1
-        if exact_correct:
-            accuracies[category][difficulty]["segment3"] += 1
-    elif category == 'Cycle':
-        rough_correct, exact_correct = compare_answers_cycle(result_answer, standard_answer, qid)
-        if rough_correct:
-            accuracies[category][difficulty]["segment3_rough"] += 1
-        if exact_correct:
-            accuracies[category][difficulty]["segment3"] += 1
-    elif category == 'ShortestPath':
-        if(compare_answers_shortestpath(result_answer, standard_answer, qid)):
-            accuracies[category][difficulty] += 1
-    elif category == 'HamiltonPath':
-        if(compare_answers_hamiltonpath(result_answer, standard_answer, qid)):
-            accuracies[category][difficulty] += 1
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", default='/path/to/results.json', help="Model answers, JSON array or JSONL")
+    parser.add_argument("--standard", nargs='+', default=['/path/to/standard.json'], help="standard.json can be composed of test.json files under /VisionGraph/Dataset, or list those test.json files directly")
+    parser.add_argument("--workers", type=int, default=1, help="Number of scoring processes")
+    parser.add_argument("--cache", default=None, help="Verdict cache file, only new or changed answers are scored again")
+    parser.add_argument("--profile", default=None, help="Write a JSON report of the stage timings, parse failures and slowest items to this file")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Print bootstrap confidence intervals of every accuracy with this many resamples, e.g. 10000")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--verdicts", default=None, help="Write the per-item verdicts to this file, for significance.py")
+    parser.add_argument("--verbose", action='store_true', help="Print the parsed path or cycle of every correct answer")
+    args = parser.parse_args()
+    if args.bootstrap or args.verdicts:
+        # Requires numpy, only imported when asked for
+        from significance import VerdictTable, print_intervals
+        verdict_table = VerdictTable()
+    # Load data, the results are streamed and scored as they arrive
+    load_ground_truth(args.standard, args.cache, args.profile is not None, args.verbose)
+    if gold_mismatches:
+        mismatches = ", ".join(f"{category} {id}" for category, id in gold_mismatches)
+        print(f"Warning: the gold answers of {mismatches} disagree with the solution computed from the graph")
+    results_data = profiler.timed_iter('load', iter_records(args.results))
+
+    # Compare the answers, merging the outcomes in input order
+    for outcome in score_in_order(score_result, results_data, args.workers, initializer=load_ground_truth, initargs=(args.standard, args.cache, args.profile is not None, args.verbose)):
+        if outcome is not None:
+            with profiler.stage('aggregation'):
+                update_accuracies(outcome)
+    if verdict_cache:
+        verdict_cache.flush()
+    if missing_warning():
+        print(missing_warning())
+
+    # Print results
+    print_statistics()
+
+    if args.bootstrap:
+        print(f"\nBootstrap Confidence Intervals ({args.bootstrap} resamples):\n")
+        print_intervals(verdict_table, args.bootstrap, args.confidence)
+    if args.verdicts:
+        verdict_table.write(args.verdicts)
 
-# Print results
-for category in accuracies:
-    print(f"Category: {category}")
-    for difficulty in accuracies[category]:
-        # Check if the number of questions is 0
-        if question_num[category][difficulty] == 0:
-            continue
-        if (category == 'ShortestPath' or category == 'HamiltonPath'):
-            accuracy = accuracies[category][difficulty] / question_num[category][difficulty]
-            print(f"  {difficulty} Accuracy: {accuracy:.4f}")
-        else:
-            for segment in ["segment3", "segment3_rough"]:
-                accuracy = accuracies[category][difficulty][segment] / question_num[category][difficulty]
-                print(f"  {difficulty} {segment} Accuracy: {accuracy:.4f}")
+    if args.profile:
+        profiler.write(args.profile)
@@ -1,12 +1,19 @@
-import json
+import argparse
 import re
 from tqdm import tqdm
+from standard_index import load_standard_index, category_from_path
+from graph_cache import GraphCache
+from stream_results import iter_records
+from parallel_eval import score_in_order
+from verdict_cache import VerdictCache
+from graph_algorithms import is_topological_order, is_shortest_path, is_hamilton_path, max_flow, is_valid_flow, is_valid_matching, audit_gold_answers, verify_candidates
+from gnn_layers import parse_embeddings, embeddings_match, precompute_gnn
+from edge_metrics import encode_edges, EdgeMetrics
+from answer_keys import audit_answer_keys, gold_yes_no
+from instrumentation import profiler
 
-def load_dataset(json_file):
-    """Load answers from a JSON file"""
-    with open(json_file, 'r') as file:
-        data = json.load(file)
-    return data
+# Bump whenever a checker changes, so cached verdicts are scored again
+EVALUATOR_VERSION = "llava-11"
 
 def extract_numbers(text):
     """Extract numbers from text"""
@@ -24,17 +31,9 @@ def extract_tuples(text):
         extracted_tuples.append(tuple(map(int, numbers)))
     return extracted_tuples
 
-def get_expected_answer(expected_data, id, segment):
-    """Get the expected answer for a given id"""
-    for item in expected_data:
-        if item['id'] == id:
-            if(segment == 'segment1'):
-                return item['conversations'][1]['value']
-            elif(segment == 'segment2'):
-                return item['conversations'][3]['value']
-            elif(segment == 'segment3'):
-                return item['conversations'][5]['value']
-    return None
+def get_expected_answer(standard_index, category, id, segment):
+    """Get the expected answer for a given category, id and segment"""
+    return standard_index.get_answer(category, id, segment)
 
 def text_to_num(text):
     num_dict = {
@@ -43,15 +42,13 @@ def text_to_num(text):
     }
     return num_dict.get(text.lower(), None)
 
-def compare_answers(result_answer, standard_answer, category):
-    result_tuples = extract_tuples(result_answer)
-    standard_tuples = extract_tuples(standard_answer)
-    correct = set(result_tuples).intersection(set(standard_tuples))
-    incorrect = set(result_tuples).difference(set(standard_tuples))
-    correct_rate = len(correct) / len(standard_tuples) if standard_tuples else 0
-    error_rate = len(incorrect) / len(result_tuples) if result_tuples else 0
-    half_correct = 1 if correct_rate >= 0.5 else 0
-    return correct_rate, error_rate, half_correct
+def edge_keys(answer, category, id):
+    """Sorted packed keys of the edge tuples of a segment2 answer, normalized for the graph of the question
+
+    Bipartite edges are (applicant, job) pairs, so they keep their order like directed edges.
+    """
+    graph = graph_cache.get(category, id)
+    return encode_edges(extract_tuples(answer), graph.directed or graph.num_applicants is not None, graph.weighted)
 
 def is_correct_answer(generated, expected, segment, category, id):
     if segment == 'segment1':
@@ -59,10 +56,12 @@ def is_correct_answer(generated, expected, segment, category, id):
         exp_numbers = extract_numbers(expected)
         if not gen_numbers:
             gen_numbers = [text_to_num(word) for word in generated.split() if text_to_num(word) is not None]
+            if not gen_numbers:
+                profiler.parse_failure(category)
         return gen_numbers == exp_numbers
     elif segment == 'segment2':
-        # Extract tuples in the second question and compare sets (ignore order)
-        return set(extract_tuples(generated)) == set(extract_tuples(expected))
+        # Compare the sets of normalized edges (ignore order, and direction in undirected graphs)
+        return edge_keys(generated, category, id) == graph_cache.get(category, id).solutions['edge_keys']
     else:
         # Remove extra spaces and newline characters to simplify comparison
         if category != "BipartiteGraphMatching":
@@ -71,108 +70,62 @@ def is_correct_answer(generated, expected, segment, category, id):
         # Compare answers based on different categories
         if category in ["Connectivity", "Cycle"]:
             try:
-                # Extract and compare the keywords "Yes" or "No"
-                return (("yes" in generated.lower()) == ("yes" in expected.lower()))
+                # Compare the keyword "Yes" with the answer key of the graph
+                return ("yes" in generated.lower()) == (gold_yes_no(graph_cache.get(category, id), category, expected) == "yes")
             except Exception as e:
                 print("One mistake happens in CC:", e)
+                profiler.parse_failure(category, e)
                 return False
         elif category == "TopologicalSort":
             try:
-                # Extract the number of nodes and edges
-                graph_data = expected_data[int(id)]
-                nodes_str = graph_data["conversations"][1]["value"]
-                nodes_num = int(re.search(r"There are (\d+) nodes", nodes_str).group(1))
-                edges_str = graph_data["conversations"][3]["value"]
-                edges = [tuple(map(int, re.findall(r'(\d+), (\d+)', edge)[0])) for edge in edges_str.split(">, <")]
                 # Extract the generated topological sort
                 gen_order = [int(node) for node in re.findall(r'\d+', generated)]
-                # Check if the number of nodes is consistent
-                if len(gen_order) != nodes_num:
-                    return False
-                # Check if the topological sort satisfies the constraints of the edges
-                for index, node in enumerate(gen_order):
-                    # Find all edges pointing to the current node
-                    incoming_edges = [u for u, v in edges if v == node]
-                    # Check if all source nodes pointing to the current node have been traversed in the topological sort
-                    for source_node in incoming_edges:
-                        if source_node not in gen_order[:index]:
-                            return False
-                return True
+                # Check the order against the edges of the parsed graph with a position map, O(V + E)
+                return is_topological_order(graph_cache.get(category, id), gen_order)
             except Exception as e:
                 print("One mistake happens in TopologicalSort:", e)
+                profiler.parse_failure(category, e)
                 return False
         elif category == "ShortestPath":
             try:
-                # Extract the path and total weight and compare
+                # Extract the path and total weight
                 gen_path = generated.split("is")[1].split("with")[0].strip()
-                # print(gen_path)
-                gen_weight = generated.split("of")[1].strip()
-                # print(gen_weight)
-                exp_weight = expected.split("of")[1].strip()
-                # If the total weight is not equal, return False
-                if gen_weight != exp_weight:
-                    return False
-                # Get data corresponding to the ID
-                graph_data = expected_data[int(id)]
-                # Get the edges of the graph and properly handle the string format
-                edges_str = graph_data["conversations"][3]["value"]
-                edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-                edge_strs = edges_str.split("), (")
-                edges = [tuple(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
-                # Extract the nodes and weights from the generated path
+                gen_weight = int(generated.split("of")[1].strip())
                 gen_path_nodes = [int(node) for node in gen_path.split(",")]
-                gen_path_edges = [(gen_path_nodes[i], gen_path_nodes[i + 1]) for i in range(len(gen_path_nodes) - 1)]
-                # Check if the path exists in the graph and calculate the total weight of the path
-                total_weight = 0
-                for edge in gen_path_edges:
-                    # Find the edge in the graph
-                    found_edge = next(((u, v, w) for (u, v, w) in edges if set(edge) == {u, v}), None)
-                    if not found_edge:
-                        return False
-                    total_weight += found_edge[2]
-                # Compare the total weight of the path with the generated weight
-                return str(total_weight) == gen_weight
+                # The path must exist in the graph, be a shortest path between the queried nodes and match the stated weight
+                return is_shortest_path(graph_cache.get(category, id), gen_path_nodes, gen_weight)
             except Exception as e:
                 print("An error occurred in ShortestPath:", e)
+                profiler.parse_failure(category, e)
             return False
         elif category == "BipartiteGraphMatching":
             try:
-                # Extract the matching of applicants and jobs
-                gen_matches = re.findall(r"applicant (\d+): job (\d+)", generated)
-                # Check for duplicate applicants or jobs
-                applicants = set()
-                jobs = set()
-                for applicant, job in gen_matches:
-                    if applicant in applicants or job in jobs:
-                        return False
-                    applicants.add(applicant)
-                    jobs.add(job)
-                # Convert to dictionary form
-                gen_matches_dict = dict(gen_matches)
-                gen_count = re.search(r"(\d+) applicants can f", generated).group(1)
-                exp_count = re.search(r"(\d+) applicants can f", expected).group(1)
-                # Check if the number of applicants matches
-                if gen_count != exp_count:
-                    return False
-                # Get data corresponding to the ID
-                graph_data = expected_data[int(id)]
-                edges_str = graph_data["conversations"][3]["value"]
-                # Check if each applicant-job pair exists in edges_str
-                for applicant, job in gen_matches_dict.items():
-                    if f"(Appl{applicant}, Job{job})" not in edges_str:
-                        return False
-                return True
+                # Extract the matching of applicants and jobs (jobs are numbered after the applicants)
+                gen_matches = [(int(applicant), int(job)) for applicant, job in re.findall(r"applicant (\d+): job (\d+)", generated)]
+                gen_count = int(re.search(r"(\d+) applicants can f", generated).group(1))
+                # No applicant or job twice, every pair an edge of the graph, and as many pairs as a maximum matching
+                return is_valid_matching(graph_cache.get(category, id), gen_matches, gen_count)
             except Exception as e:
                 print("An error occurred in BipartiteGraphMatching:", e)
+                profiler.parse_failure(category, e)
                 return False
         elif category == "MaximumFlow":
             try:
-                # Extract and compare the value of the maximum flow
-                gen_flow = re.search(r"Themaximumflowfromnode\d+tonode\d+is(\d+).", generated).group(1)
-                exp_flow = re.search(r"Themaximumflowfromnode\d+tonode\d+is(\d+).", expected).group(1)
-                return gen_flow == exp_flow
+                # Extract the queried nodes and the value of the maximum flow
+                gen_source, gen_sink, gen_flow = map(int, re.search(r"Themaximumflowfromnode(\d+)tonode(\d+)is(\d+).", generated).groups())
+                graph = graph_cache.get(category, id)
+                if graph.query is not None and (gen_source, gen_sink) != graph.query:
+                    return False
+                if not (0 <= gen_source < graph.size and 0 <= gen_sink < graph.size):
+                    return False
+                if gen_flow != max_flow(graph, gen_source, gen_sink):
+                    return False
+                # If the answer also lists the flow on the edges, it has to be a feasible flow of that value
+                gen_edge_flows = [tuple(map(int, flow)) for flow in re.findall(r"[<(](\d+),(\d+),(\d+)[>)]", generated)]
+                return not gen_edge_flows or is_valid_flow(graph, gen_source, gen_sink, gen_edge_flows, gen_flow)
             except Exception as e:
                 print("An error occurred in MaximumFlow:", e)
+                profiler.parse_failure(category, e)
                 return False
         elif category == "HamiltonPath":
             try:
@@ -180,65 +133,110 @@ def is_correct_answer(generated, expected, segment, category, id):
                     gen_path_nodes = [int(node) for node in re.findall(r'\d+', generated.split("canbe:")[1])]
                 else:
                     gen_path_nodes = [int(node) for node in re.findall(r'\d+', generated.split("pathis")[1])]
-                # Get data corresponding to the ID
-                graph_data = expected_data[int(id)]
-                # Extract the number of nodes and edges
-                nodes_str = graph_data["conversations"][1]["value"]
-                nodes_num = int(re.search(r"(\d+) nodes", nodes_str).group(1))
-                edges_str = graph_data["conversations"][3]["value"]
-                edges_str = edges_str.split("The edges are represented by the tuples:\n")[1]
-                edge_strs = edges_str.split("), (")
-                edges = [set(map(int, edge.replace("(", "").replace(")", "").split(", "))) for edge in edge_strs]
-                # Check if the path covers all nodes
-                if len(set(gen_path_nodes)) != nodes_num:
-                    return False
-                # Check if each edge on the path exists
-                for i in range(len(gen_path_nodes) - 1):
-                    edge = {gen_path_nodes[i], gen_path_nodes[i + 1]}
-                    if edge not in edges:
-                        return False
-                return True
+                # The path must visit every node exactly once along edges of the parsed graph
+                return is_hamilton_path(graph_cache.get(category, id), gen_path_nodes)
             except Exception as e:
                 print("An error occurred in HamiltonPath:", e)
+                profiler.parse_failure(category, e)
                 return False
         elif category == "GNN":
             try:
-                # Split by 'node' and compare each one by one
-                gen_lines = generated.split("node")
-                exp_lines = expected.split("node")
-                if len(gen_lines) < 2:
-                    return False
-                for gen_line, exp_line in zip(gen_lines[1:], exp_lines[1:]):
-                    if gen_line != exp_line:
-                        return False
-                return True
+                # Compare the parsed embeddings with the ones precomputed for the question as arrays
+                expected_embeddings = graph_cache.get(category, id).solutions.get('gnn', {}).get(id)
+                if expected_embeddings is None:
+                    expected_embeddings = parse_embeddings(expected)
+                return embeddings_match(parse_embeddings(generated), expected_embeddings)
             except Exception as e:
                 print("An error occurred in GNN:", e)
+                profiler.parse_failure(category, e)
                 return False
         else:
             return False
 
-# Load the generated and expected answers
-generated_data = load_dataset('/path/to/results.json')
-expected_data = load_dataset('/path/to/standard.json') # standard.json can be composed of test.json files under /VisionGraph/Dataset
-# Initialize statistics
-accuracy_stats = {}
-total_accuracy_stats = {}
-segment2_additional_stats = {}  # Additional statistics for segment2
-category_total_stats_segment2 = {}
+def load_ground_truth(standard_files, cache_file=None, profile=False):
+    """Load and pre-parse the ground truth used by the checkers (no-op in forked workers, which inherit it)"""
+    global standard_index, graph_cache, verdict_cache, gold_mismatches
+    if profile and not profiler.enabled:
+        profiler.enable()
+    if standard_index is None:
+        with profiler.stage('ground_truth'):
+            standard_index = load_standard_index(standard_files)
+            graph_cache = GraphCache(standard_index).parse_all()
+            # Precompute the shortest distances, maximum flows and maximum matchings of the questions
+            gold_mismatches = audit_gold_answers(standard_index, graph_cache)
+            # Expected GNN embeddings, propagated in batches when the question gives the initial ones
+            gold_mismatches += precompute_gnn(standard_index, graph_cache)
+            # Connectivity components, cycle existence and girth of every graph
+            gold_mismatches += audit_answer_keys(standard_index, graph_cache)
+            # Edge keys of the segment2 gold answers, once per shared graph (the answer is its edge turn)
+            for category, id in standard_index.records:
+                graph = graph_cache.get(category, id)
+                if 'edge_keys' not in graph.solutions:
+                    graph.solutions['edge_keys'] = edge_keys(standard_index.get_answer(category, id, 'segment2'), category, id)
+            if cache_file:
+                verdict_cache = VerdictCache(cache_file, EVALUATOR_VERSION)
+
+def score_answer(category, id, segment, generated_answer):
+    """Verdict [is_correct, segment2 edge keys or None] of one answer, None if the question or the answer is missing"""
+    expected_answer = get_expected_answer(standard_index, category, id, segment)
+    if generated_answer is None or expected_answer is None:
+        return None
+    if segment == 'segment2':
+        # The edge keys of the answer, update_stats computes the segment2 metrics from them in batches
+        segment2_metrics = edge_keys(generated_answer, category, id)
+        return [segment2_metrics == graph_cache.get(category, id).solutions['edge_keys'], segment2_metrics]
+    # Check if the answer is correct
+    return [is_correct_answer(generated_answer, expected_answer, segment, category, id), None]
+
+def score_candidates(category, id, segment, answers):
+    """Verdicts of the sampled answers of one question (e.g. the k samples of pass@k), None if the question is missing
 
-# Iterate over each sample in the dataset
-for data in tqdm(generated_data):
+    Identical answers are checked once, against the graph and solutions parsed once for all of them.
+    """
+    if get_expected_answer(standard_index, category, id, segment) is None:
+        return None
+    def verify(graph, answer):
+        verdict = score_answer(category, id, segment, answer)
+        return verdict is not None and bool(verdict[0])
+    return verify_candidates(graph_cache.get(category, id), answers, verify)
+
+def score_record(data):
+    """Score the three segments of one generated record"""
+    outcomes = []
     id = data["id"]
-    category = data["image_url"].split('/')[5]  # Extract category, e.g., 'Cycle'
+    category = category_from_path(data["image_url"])  # Extract category, e.g., 'Cycle'
     difficulty = data["difficulty"]  # Extract difficulty
+    # If the ground truth is not found, skip the record but count it
+    if not standard_index.has_record(category, id):
+        return [(category, id, difficulty, None, None, None)]
+    # Decoded once for the verdict cache keys of the three segments
+    standard = standard_index.get_record(category, id) if verdict_cache else None
     # Process each segment
     for segment in ["segment1", "segment2", "segment3"]:
         generated_answer = data[segment]
-        expected_answer = get_expected_answer(expected_data, id, segment)
+        expected_answer = get_expected_answer(standard_index, category, id, segment)
         # If an answer is not found, skip it
         if generated_answer is None or expected_answer is None:
             continue
+        # Reuse the verdict of a previous run if the answer has not changed
+        cache_key = verdict_cache.key(category, standard, segment, generated_answer) if verdict_cache else None
+        verdict = verdict_cache.get(cache_key) if verdict_cache else None
+        if verdict is None:
+            # Answer extraction, the validators time themselves as the 'validation' stage
+            with profiler.item(category, f"{id} {segment}"), profiler.stage('extraction'):
+                verdict = score_answer(category, id, segment, generated_answer)
+        outcomes.append((category, id, difficulty, segment, verdict, cache_key))
+    return outcomes
+
+def update_stats(outcomes):
+    """Merge the outcomes of one record into the statistics"""
+    for category, id, difficulty, segment, verdict, cache_key in outcomes:
+        if verdict is None:
+            missing_results.append((category, id))
+            continue
+        if cache_key is not None:
+            verdict_cache.add(cache_key, verdict)
+        is_correct, segment2_metrics = verdict
         # Initialize statistics for difficulty
         difficulty_segment_key = f"{category}_{difficulty}_{segment}"
         if difficulty_segment_key not in accuracy_stats:
@@ -247,49 +245,107 @@ for data in tqdm(generated_data):
         total_key = f"{category}_total_{segment}"
         if total_key not in total_accuracy_stats:
             total_accuracy_stats[total_key] = {'correct': 0, 'total': 0}
-        # Check if the answer is correct
-        is_correct = is_correct_answer(generated_answer, expected_answer, segment, category, id)
         accuracy_stats[difficulty_segment_key]['correct'] += int(is_correct)
         accuracy_stats[difficulty_segment_key]['total'] += 1
         total_accuracy_stats[total_key]['correct'] += int(is_correct)
         total_accuracy_stats[total_key]['total'] += 1
+        if verdict_table is not None:
+            verdict_table.add((difficulty_segment_key, total_key), id, is_correct)
         if segment == 'segment2':
-            # Calculate additional metrics for segment2
-            correct_rate, error_rate, half_correct = compare_answers(generated_answer, expected_answer, category)
-            segment2_key = f"{category}_{difficulty}_segment2_additional"
-            if segment2_key not in segment2_additional_stats:
-                segment2_additional_stats[segment2_key] = {'correct_rate': [], 'error_rate': [], 'half_correct': 0}
-            segment2_additional_stats[segment2_key]['correct_rate'].append(correct_rate)
-            segment2_additional_stats[segment2_key]['error_rate'].append(error_rate)
-            segment2_additional_stats[segment2_key]['half_correct'] += half_correct
-            # Aggregate statistics for each category of segment2
-            category_key = f"{category}_segment2_total"
-            if category_key not in category_total_stats_segment2:
-                category_total_stats_segment2[category_key] = {'correct_rate': [], 'error_rate': [], 'half_correct': 0}
-            category_total_stats_segment2[category_key]['correct_rate'].append(correct_rate)
-            category_total_stats_segment2[category_key]['error_rate'].append(error_rate)
-            category_total_stats_segment2[category_key]['half_correct'] += half_correct
+            # Counted per difficulty and for the whole category of segment2
+            groups = (f"{category}_{difficulty}_segment2_additional", f"{category}_segment2_total")
+            segment2_stats.add(groups, segment2_metrics, graph_cache.get(category, id).solutions['edge_keys'])
+
+def verdict_rows(outcomes):
+    """Per-item verdicts of the outcomes of one record, as flat dicts (category, id, difficulty, segment, correct)"""
+    return [{'category': category, 'id': str(id), 'difficulty': difficulty, 'segment': segment, 'correct': bool(verdict[0])}
+            for category, id, difficulty, segment, verdict, cache_key in outcomes if verdict is not None]
+
+def reset_stats():
+    """Clear the statistics, e.g. before scoring the results of another model"""
+    global segment2_stats
+    accuracy_stats.clear()
+    total_accuracy_stats.clear()
+    missing_results.clear()
+    segment2_stats = EdgeMetrics()
+
+def missing_warning():
+    """Warning about the results whose (category, id) is not in the ground truth, None if there are none"""
+    if not missing_results:
+        return None
+    examples = ", ".join(f"{category} {id}" for category, id in missing_results[:5])
+    return (f"Warning: {len(missing_results)} results have no ground-truth record and were not scored "
+            f"(e.g. {examples}), check that --standard matches the results")
+
+def print_statistics():
+    with profiler.stage('aggregation'):
+        segment2_stats.flush()
+    for key, stats in accuracy_stats.items():
+        accuracy = stats['correct'] / stats['total'] if stats['total'] > 0 else 0
+        print(f"Accuracy for {key}: {accuracy:.4f}\n")
+    print("\nTotal Accuracy Statistics:\n")
+    for key, stats in total_accuracy_stats.items():
+        total_accuracy = stats['correct'] / stats['total'] if stats['total'] > 0 else 0
+        print(f"Total Accuracy for {key}: {total_accuracy:.4f}\n")
+
+    for title, suffix in [("Segment 2 Additional Statistics", "_segment2_additional"), ("Category Total Statistics for Segment 2", "_segment2_total")]:
+        print(f"\n{title}:\n")
+        for key in segment2_stats:
+            if key.endswith(suffix):
+                stats = segment2_stats.summary(key)
+                print(f"{key}: Average Correct Rate: {stats['correct_rate']:.4f}, Average Error Rate: {stats['error_rate']:.4f}, Half Correct Percentage: {stats['half_correct'] * 100:.2f}%, "
+                      f"Precision: {stats['precision']:.4f}, F1: {stats['f1']:.4f}, Exact Match: {stats['exact_match'] * 100:.2f}%, Micro F1: {stats['micro_f1']:.4f}\n")
+
+# Ground truth and verdict cache, loaded by load_ground_truth
+standard_index = None
+graph_cache = None
+verdict_cache = None
+gold_mismatches = []
+# Initialize statistics
+accuracy_stats = {}
+total_accuracy_stats = {}
+segment2_stats = EdgeMetrics()  # Additional statistics for segment2
+verdict_table = None  # Per-item verdicts, kept for --bootstrap and --verdicts
+missing_results = []  # (category, id) of the results without a ground-truth record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", default='/path/to/results.json', help="Generated answers, JSON array or JSONL")
+    parser.add_argument("--standard", nargs='+', default=['/path/to/standard.json'], help="standard.json can be composed of test.json files under /VisionGraph/Dataset, or list those test.json files directly")
+    parser.add_argument("--workers", type=int, default=1, help="Number of scoring processes")
+    parser.add_argument("--cache", default=None, help="Verdict cache file, only new or changed answers are scored again")
+    parser.add_argument("--profile", default=None, help="Write a JSON report of the stage timings, parse failures and slowest items to this file")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Print bootstrap confidence intervals of every accuracy with this many resamples, e.g. 10000")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--verdicts", default=None, help="Write the per-item verdicts to this file, for significance.py")
+    args = parser.parse_args()
+    if args.bootstrap or args.verdicts:
+        # Only imported when asked for, like in the ChatGPT evaluator
+        from significance import VerdictTable, print_intervals
+        verdict_table = VerdictTable()
+    # Load the expected answers, the generated answers are streamed and scored as they arrive
+    load_ground_truth(args.standard, args.cache, args.profile is not None)
+    if gold_mismatches:
+        mismatches = ", ".join(f"{category} {id}" for category, id in gold_mismatches)
+        print(f"Warning: the gold answers of {mismatches} disagree with the solution computed from the graph")
+    generated_data = profiler.timed_iter('load', iter_records(args.results))
+    # Iterate over each sample in the dataset, merging the outcomes in input order
+    for outcomes in tqdm(score_in_order(score_record, generated_data, args.workers, initializer=load_ground_truth, initargs=(args.standard, args.cache, args.profile is not None))):
+        with profiler.stage('aggregation'):
+            update_stats(outcomes)
+    if verdict_cache:
+        verdict_cache.flush()
+    if missing_warning():
+        print(missing_warning())
 
-# Print results
-for key, stats in accuracy_stats.items():
-    accuracy = stats['correct'] / stats['total'] if stats['total'] > 0 else 0
-    print(f"Accuracy for {key}: {accuracy:.4f}\n")
-print("\nTotal Accuracy Statistics:\n")
-for key, stats in total_accuracy_stats.items():
-    total_accuracy = stats['correct'] / stats['total'] if stats['total'] > 0 else 0
-    print(f"Total Accuracy for {key}: {total_accuracy:.4f}\n")
+    # Print results
+    print_statistics()
 
-print("\nSegment 2 Additional Statistics:\n")
-for key, stats in segment2_additional_stats.items():
-    avg_correct_rate = sum(stats['correct_rate']) / len(stats['correct_rate']) if stats['correct_rate'] else 0
-    avg_error_rate = sum(stats['error_rate']) / len(stats['error_rate']) if stats['error_rate'] else 0
-    half_correct_percentage = (stats['half_correct'] / len(stats['correct_rate'])) * 100 if stats['correct_rate'] else 0
-    print(f"{key}: Average Correct Rate: {avg_correct_rate:.4f}, Average Error Rate: {avg_error_rate:.4f}, Half Correct Percentage: {half_correct_percentage:.2f}%\n")
+    if args.bootstrap:
+        print(f"\nBootstrap Confidence Intervals ({args.bootstrap} resamples):\n")
+        print_intervals(verdict_table, args.bootstrap, args.confidence)
+    if args.verdicts:
+        verdict_table.write(args.verdicts)
 
-print("\nCategory Total Statistics for Segment 2:\n")
-for key, stats in category_total_stats_segment2.items():
-    avg_correct_rate = sum(stats['correct_rate']) / len(stats['correct_rate']) if stats['correct_rate'] else 0
-    avg_error_rate = sum(stats['error_rate']) / len(stats['error_rate']) if stats['error_rate'] else 0
-    half_correct_percentage = (stats['half_correct'] / len(stats['correct_rate'])) * 100 if stats['correct_rate'] else 0
-    print(f"{key}: Average Correct Rate: {avg_correct_rate:.4f}, Average Error Rate: {avg_error_rate:.4f}, Half Correct Percentage: {half_correct_percentage:.2f}%\n")
-    
\ No newline at end of file
+    if args.profile:
+        profiler.write(args.profile)
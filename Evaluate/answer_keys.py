@@ -0,0 +1,212 @@
+import argparse
+import json
+import random
+from standard_index import load_standard_index
+from graph_cache import GraphCache
+
+CONNECTIVITY_QUESTION = "Is there a path between node {u} and node {v} in the graph?"
+CONNECTIVITY_ANSWER = "The answer is {answer}."
+
+def simple_edges(graph):
+    """Distinct edges without self-loops, in dataset order
+
+    A repeated edge or a self-loop is not a cycle that is_simple_cycle accepts, so the keys ignore them too.
+    """
+    return [(u, v) for u, v in (divmod(key, 1 << 32) for key in graph.edge_index) if u != v]
+
+def components(graph):
+    """Union-find component root of every node of an undirected graph, computed once per graph"""
+    roots = graph.solutions.get('components')
+    if roots is None:
+        parent = list(range(graph.size))
+
+        def find(node):
+            while parent[node] != node:
+                # Path halving
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for u, v in simple_edges(graph):
+            root_u, root_v = find(u), find(v)
+            if root_u != root_v:
+                parent[max(root_u, root_v)] = min(root_u, root_v)
+        roots = graph.solutions['components'] = [find(node) for node in range(graph.size)]
+    return roots
+
+def reachable(graph, source):
+    """Nodes reachable from source in a directed graph as an int bitset, computed once per (graph, source)"""
+    key = ('reachable', source)
+    mask = graph.solutions.get(key)
+    if mask is None:
+        mask = 1 << source
+        queue = [source]
+        for node in queue:
+            for neighbor in graph.neighbors_of(node):
+                if not mask >> neighbor & 1:
+                    mask |= 1 << neighbor
+                    queue.append(neighbor)
+        graph.solutions[key] = mask
+    return mask
+
+def connected(graph, u, v):
+    """Whether there is a path from u to v, None if a node is not in the graph
+
+    O(1) for undirected graphs once the components are built; directed graphs keep the reachable set of
+    every source asked, so repeated queries from a source are O(1) too.
+    """
+    if not (0 <= u < graph.size and 0 <= v < graph.size):
+        return None
+    if graph.directed:
+        return bool(reachable(graph, u) >> v & 1)
+    roots = components(graph)
+    return roots[u] == roots[v]
+
+def cycle_key(graph):
+    """(has_cycle, girth) of a graph, girth is the length of a shortest simple cycle or None; computed once per graph
+
+    Undirected graphs find a cycle with union-find (an edge inside a component closes one), directed graphs
+    with Kahn's algorithm (a cycle leaves nodes that never reach in-degree 0). The girth is the shortest cycle
+    found by a BFS from every node, O(V * E), and is only searched for when there is a cycle.
+    """
+    key = graph.solutions.get('cycle')
+    if key is not None:
+        return key
+    edges = simple_edges(graph)
+    adjacency = [[] for _ in range(graph.size)]
+    for u, v in edges:
+        adjacency[u].append(v)
+        if not graph.directed:
+            adjacency[v].append(u)
+    if graph.directed:
+        in_degree = [0] * graph.size
+        for _, v in edges:
+            in_degree[v] += 1
+        queue = [node for node in range(graph.size) if in_degree[node] == 0]
+        for node in queue:
+            for neighbor in adjacency[node]:
+                in_degree[neighbor] -= 1
+                if in_degree[neighbor] == 0:
+                    queue.append(neighbor)
+        has_cycle = len(queue) < graph.size
+    else:
+        # Union-find on the edges, then the roots are the components
+        roots = components(graph)
+        component_count = sum(1 for node, root in enumerate(roots) if node == root)
+        # A forest has exactly one edge fewer than nodes per component
+        has_cycle = len(edges) > graph.size - component_count
+    girth = None
+    if has_cycle:
+        for source in range(graph.size):
+            distance = [-1] * graph.size
+            parent = [-1] * graph.size
+            distance[source] = 0
+            queue = [source]
+            for node in queue:
+                # No shorter cycle through source can be found from here on
+                if girth is not None and (1 if graph.directed else 2) * distance[node] + 1 >= girth:
+                    break
+                for neighbor in adjacency[node]:
+                    if graph.directed and neighbor == source:
+                        length = distance[node] + 1
+                    elif distance[neighbor] < 0:
+                        distance[neighbor] = distance[node] + 1
+                        parent[neighbor] = node
+                        queue.append(neighbor)
+                        continue
+                    elif not graph.directed and neighbor != parent[node]:
+                        length = distance[node] + distance[neighbor] + 1
+                    else:
+                        continue
+                    if girth is None or length < girth:
+                        girth = length
+    key = graph.solutions['cycle'] = (has_cycle, girth)
+    return key
+
+def expected_yes_no(graph, category):
+    """Gold 'yes' / 'no' of a Connectivity or Cycle question from the answer key, None if it cannot be decided"""
+    if category == 'Cycle':
+        return 'yes' if cycle_key(graph)[0] else 'no'
+    if graph.query is None:
+        return None
+    answer = connected(graph, *graph.query)
+    return None if answer is None else ('yes' if answer else 'no')
+
+def gold_yes_no(graph, category, gold_answer):
+    """Gold 'yes' / 'no' from the answer key, or from the gold text if the question names no nodes of the graph"""
+    return expected_yes_no(graph, category) or ("yes" if "yes" in gold_answer.lower() else "no")
+
+def audit_answer_keys(standard_index, graph_cache):
+    """Build the answer key of every Connectivity and Cycle graph
+
+    Returns the (category, id) of the gold answers whose yes/no disagrees with the answer key.
+    """
+    mismatches = []
+    for category, id in standard_index.records:
+        if category not in ('Connectivity', 'Cycle'):
+            continue
+        key = expected_yes_no(graph_cache.get(category, id), category)
+        gold_answer = standard_index.get_answer(category, id, 'segment3')
+        if key is not None and gold_answer is not None and key != ("yes" if "yes" in gold_answer.lower() else "no"):
+            mismatches.append((category, id))
+    return mismatches
+
+def connectivity_questions(graph, count, rng):
+    """Up to `count` new (u, v, 'yes' / 'no') queries over the nodes of a graph, distinct and other than its own query
+
+    About half of them are connected pairs when the graph has enough of both, so the expanded set stays balanced.
+    """
+    if graph.size == graph.num_nodes:
+        nodes = range(graph.size)
+    else:
+        # Node ids are not contiguous, only ask about nodes that are drawn with an edge
+        nodes = sorted(set(graph.sources) | set(graph.targets))
+    asked = {graph.query, graph.query[::-1] if graph.query and not graph.directed else None}
+    pairs = [(u, v) for u in nodes for v in nodes if u != v and (graph.directed or u < v) and (u, v) not in asked]
+    rng.shuffle(pairs)
+    by_answer = {'yes': [], 'no': []}
+    for u, v in pairs:
+        answer = 'yes' if connected(graph, u, v) else 'no'
+        by_answer[answer].append((u, v, answer))
+    half = min(len(by_answer['yes']), count - min(count // 2, len(by_answer['no'])))
+    return by_answer['yes'][:half] + by_answer['no'][:count - half]
+
+def expand_connectivity(standard_index, graph_cache, per_graph, seed=0):
+    """New Connectivity records in the dataset schema, `per_graph` queries per graph with answers from the answer key"""
+    rng = random.Random(seed)
+    records = []
+    for category, id in standard_index.records:
+        if category != 'Connectivity':
+            continue
+        record = standard_index.get_record(category, id)
+        for number, (u, v, answer) in enumerate(connectivity_questions(graph_cache.get(category, id), per_graph, rng)):
+            conversations = [dict(turn) for turn in record["conversations"][:4]]
+            conversations.append({"from": "human", "value": CONNECTIVITY_QUESTION.format(u=u, v=v)})
+            conversations.append({"from": "gpt", "value": CONNECTIVITY_ANSWER.format(answer=answer)})
+            records.append({"id": f"{id}_{number}", "image": record["image"], "difficulty": record.get("difficulty"),
+                            "conversations": conversations})
+    return records
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the Connectivity and Cycle gold answers against the answer keys, and generate new Connectivity questions")
+    parser.add_argument("--dataset", nargs='+', required=True, help="Dataset/*/{train,test}.json files or columnar dataset directories")
+    parser.add_argument("--per-graph", type=int, default=0, help="New Connectivity questions per graph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the generated Connectivity records as a dataset JSON file")
+    args = parser.parse_args()
+
+    standard_index = load_standard_index(args.dataset)
+    graph_cache = GraphCache(standard_index).parse_all()
+    mismatches = audit_answer_keys(standard_index, graph_cache)
+    cycles = [cycle_key(graph_cache.get(category, id)) for category, id in standard_index.records if category == 'Cycle']
+    print(f"{len(standard_index.records)} records, {len(mismatches)} gold answers disagree with the answer key"
+          + (": " + ", ".join(f"{category} {id}" for category, id in mismatches) if mismatches else ""))
+    if cycles:
+        girths = [girth for has_cycle, girth in cycles if has_cycle]
+        print(f"Cycle: {len(girths)} of {len(cycles)} graphs have a cycle, girth {min(girths, default=None)} to {max(girths, default=None)}")
+    if args.per_graph:
+        records = expand_connectivity(standard_index, graph_cache, args.per_graph, args.seed)
+        print(f"Generated {len(records)} Connectivity questions")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(records, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,165 @@
+import re
+from collections import Counter, namedtuple
+from instrumentation import profiler
+
+# Structured result of parsing one answer: 'yes'/'no'/None, node sequence, total weight and the rule that matched
+ParsedAnswer = namedtuple('ParsedAnswer', ['yes_no', 'nodes', 'weight', 'rule'])
+
+# Parse-rule hit counts, keyed by (task, rule)
+rule_hits = Counter()
+# Rules recorded when an answer could not be parsed
+PARSE_FAILURE_RULES = ('no_answer', 'no_path', 'no_cycle')
+
+NUMBER = re.compile(r'\d+')
+BOUNDED_NUMBER = re.compile(r'\b\d+\b')
+NODE_WORD = re.compile(r'node', re.IGNORECASE)
+PATH_SEPARATORS = re.compile(r'->|→|-|,')
+
+# Rules are tried in priority order, the first one that matches anywhere in the answer wins.
+# Each rule is (name, anchor, pattern): every match starts with the literal anchor (lower case for
+# case-insensitive patterns), so the regex only runs from the first occurrence of the anchor.
+PATH_RULES = [
+    ('path_is', "The path i", re.compile(r"The path is? ([\d\s\-,>→node]+)")),
+    ('path_is_simply', "the path is simpl", re.compile(r"The path is simply? ([\d\s\-,>→node]+)", re.IGNORECASE)),
+    ('path_as_follows', "The path is as follows", re.compile(r"The path is as follows\s+\(([\d\s,]+)\)")),
+    ('path_in_parentheses', "The path is", re.compile(r"The path is\s+\(([\d\s,]+)\)")),
+]
+CYCLE_RULES = [
+    ('cycle_is', "the cycle is", re.compile(r"the cycle is(?: node)?(.*?)(?=[\.\n])", re.IGNORECASE)),
+    ('cycle_fewest_nodes', "the cycle with the fewest number of nodes", re.compile(r"the cycle with the fewest number of nodes(.*?)(?=(?:Yes.*?\.)|which|$)", re.IGNORECASE)),
+    ('cycle_number_list', "The cycle is ", re.compile(r"The cycle is (\d+(?:, \d+)*).")),
+]
+HAMILTONPATH_RULES = [
+    ('path_is', "the path is", re.compile(r"the path is(?: node)?(.*?)(?=(?:Yes.*?\.)|which|$)", re.IGNORECASE)),
+    ('path_number_list', "The path is ", re.compile(r"The path is (\d+(?:, \d+)*).")),
+]
+SHORTESTPATH_EITHER_OR_THROUGH = re.compile(r'or\s+(.*?)\s+with', re.IGNORECASE)
+SHORTESTPATH_FROM_TO = re.compile(r'from node (\d+)\s+to node (\d+)', re.IGNORECASE)
+SHORTESTPATH_EITHER_OR = re.compile(r'either\s+(.*?)\s+or', re.IGNORECASE)
+SHORTESTPATH_THROUGH = re.compile(r'from node (\d+)\s+to node (\d+).*?through\s+(.*?)\s+(?:with|\.|$)', re.IGNORECASE)
+SHORTESTPATH_IS = re.compile(r'is\s+(.*?)(?:\s+with|\.|$)', re.IGNORECASE)
+SHORTESTPATH_WEIGHT = re.compile(r'total weight(?: is)?[^\d]*(\d+)', re.IGNORECASE)
+
+def _search_rules(rules, text, lower_text=None):
+    """Return (rule name, match) of the first rule that matches, or (None, None)"""
+    for name, anchor, pattern in rules:
+        if pattern.flags & re.IGNORECASE:
+            if lower_text is None:
+                lower_text = text.lower()
+            start = lower_text.find(anchor)
+            # Lower-casing a few non-ASCII characters changes the length, then positions cannot be shared
+            if len(lower_text) != len(text):
+                start = min(start, 0)
+        else:
+            start = text.find(anchor)
+        if start < 0:
+            continue
+        match = pattern.search(text, start)
+        if match:
+            return name, match
+    return None, None
+
+def _hit(task, rule):
+    rule_hits[(task, rule)] += 1
+    if rule in PARSE_FAILURE_RULES:
+        profiler.parse_failure(task)
+    return rule
+
+def pop_rule_hits():
+    """Return the rule hits counted since the last call and reset the counter"""
+    hits = {f"{task}:{rule}": count for (task, rule), count in rule_hits.items()}
+    rule_hits.clear()
+    return hits
+
+def _yes_no(lower_answer, yes_phrase, no_phrases):
+    if "yes" in lower_answer or (yes_phrase and yes_phrase in lower_answer):
+        return "yes"
+    if any(phrase in lower_answer for phrase in no_phrases):
+        return "no"
+    return None
+
+def parse_connectivity(answer):
+    """Yes/no and, for 'yes', the node sequence of the path"""
+    lower_answer = answer.lower()
+    yes_no = _yes_no(lower_answer, "there is a path", ("no,", "there is no path"))
+    if yes_no != "yes":
+        return ParsedAnswer(yes_no, [], None, _hit('Connectivity', yes_no or 'no_answer'))
+    rule, match = _search_rules(PATH_RULES, answer, lower_answer)
+    if match is None:
+        return ParsedAnswer(yes_no, [], None, _hit('Connectivity', 'no_path'))
+    nodes = [int(node) for node in BOUNDED_NUMBER.findall(NODE_WORD.sub(' ', match.group(1)))]
+    return ParsedAnswer(yes_no, nodes, None, _hit('Connectivity', rule))
+
+def parse_cycle(answer):
+    """Yes/no and, for 'yes', the node sequence of the cycle"""
+    lower_answer = answer.lower()
+    yes_no = _yes_no(lower_answer, "there is a cycle", ("no,", "there is no cycle"))
+    if yes_no != "yes":
+        return ParsedAnswer(yes_no, [], None, _hit('Cycle', yes_no or 'no_answer'))
+    rule, match = _search_rules(CYCLE_RULES, answer.replace('\n', ''))
+    if match is None:
+        return ParsedAnswer(yes_no, [], None, _hit('Cycle', 'no_cycle'))
+    nodes = [int(node) for node in NUMBER.findall(match.group(1))]
+    return ParsedAnswer(yes_no, nodes, None, _hit('Cycle', rule))
+
+def parse_hamiltonpath(answer):
+    """Yes/no and, for 'yes', the node sequence of the Hamilton path"""
+    lower_answer = answer.lower()
+    yes_no = _yes_no(lower_answer, None, ("no,", "no path"))
+    if yes_no != "yes":
+        return ParsedAnswer(yes_no, [], None, _hit('HamiltonPath', yes_no or 'no_answer'))
+    rule, match = _search_rules(HAMILTONPATH_RULES, answer, lower_answer)
+    if match is None:
+        return ParsedAnswer(yes_no, [], None, _hit('HamiltonPath', 'no_path'))
+    nodes = [int(node) for node in NUMBER.findall(match.group(1))]
+    return ParsedAnswer(yes_no, nodes, None, _hit('HamiltonPath', rule))
+
+def _last_sentence(answer):
+    """The text between the last two '.'/newline delimiters, i.e. re.split(r'[\\.\\n]', answer)[-2]"""
+    end = max(answer.rfind('.'), answer.rfind('\n'))
+    if end < 0:
+        return answer.strip()
+    start = max(answer.rfind('.', 0, end), answer.rfind('\n', 0, end))
+    return answer[start + 1:end].strip()
+
+def _comma_nodes(text):
+    """Nodes of a comma separated list like 'node 3, node 5', entries that are not a plain number are skipped"""
+    return [int(node) for node in NODE_WORD.sub('', text).split(',') if node.strip().isdigit()]
+
+def parse_shortestpath(answer, count_hits=True):
+    """Node sequence and total weight stated in the concluding sentence (count_hits=False for gold answers)"""
+    last_sentence = _last_sentence(answer)
+    path = []
+    rule = 'no_path'
+    # Special case, equivalent to a patch
+    if "either" in last_sentence and "or" in last_sentence and "through" in last_sentence:
+        either_or_match = SHORTESTPATH_EITHER_OR_THROUGH.search(last_sentence)
+        through_match = SHORTESTPATH_FROM_TO.search(last_sentence)
+        if either_or_match and through_match:
+            start, end = through_match.groups()
+            path = [int(start)] + _comma_nodes(either_or_match.group(1)) + [int(end)]
+            rule = 'either_or_through'
+    elif "either" in last_sentence and "or" in last_sentence:
+        either_or_match = SHORTESTPATH_EITHER_OR.search(last_sentence)
+        if either_or_match:
+            path = [int(node.strip()) for node in PATH_SEPARATORS.split(either_or_match.group(1)) if node.strip().isdigit()]
+            rule = 'either_or'
+    elif "through" in last_sentence:
+        through_match = SHORTESTPATH_THROUGH.search(last_sentence)
+        if through_match:
+            start, end, through_nodes = through_match.groups()
+            path = [int(start)] + _comma_nodes(through_nodes) + [int(end)]
+            rule = 'through'
+    elif "directly" in last_sentence:
+        directly_match = SHORTESTPATH_FROM_TO.search(last_sentence)
+        if directly_match:
+            path = [int(directly_match.group(1)), int(directly_match.group(2))]
+            rule = 'directly'
+    else:
+        path_match = SHORTESTPATH_IS.search(last_sentence)
+        if path_match:
+            path = [int(node) for node in BOUNDED_NUMBER.findall(path_match.group(1))]
+            rule = 'path_is'
+    weight_match = SHORTESTPATH_WEIGHT.search(last_sentence)
+    weight = int(weight_match.group(1)) if weight_match else 0
+    return ParsedAnswer(None, path, weight, _hit('ShortestPath', rule) if count_hits else rule)
@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from evaluators import EVALUATORS, load_evaluator
+from standard_index import category_from_path
+from stream_results import iter_records
+from parallel_eval import score_in_order
+
+# Scoring and aggregation functions of each evaluator
+EVALUATOR_FUNCTIONS = {
+    'llava': ('score_record', 'update_stats', 'reset_stats'),
+    'chatgpt': ('score_result', 'update_accuracies', 'reset_counters'),
+}
+# Segments scored by each evaluator
+EVALUATOR_SEGMENTS = {'llava': ['segment1', 'segment2', 'segment3'], 'chatgpt': ['segment3']}
+
+# The evaluator module, loaded once with its ground truth (forked workers inherit both)
+evaluator = None
+evaluator_name = None
+score_function = None
+
+def init_worker(name, standard_files, cache_file):
+    """Load the evaluator and its ground truth in a worker that was not forked from the parent"""
+    global evaluator, evaluator_name, score_function
+    if evaluator is None:
+        evaluator = load_evaluator(name)
+        evaluator_name = name
+        score_function = getattr(evaluator, EVALUATOR_FUNCTIONS[name][0])
+    evaluator.load_ground_truth(standard_files, cache_file)
+
+def score_sampled(record):
+    """pass@k verdicts of a results record whose segments hold lists of sampled answers
+
+    Returns (category, id, rows), one row per segment with correct (any sample passes), passed and samples;
+    rows is None if the record has no ground truth.
+    """
+    category, id = category_from_path(record["image_url"]), record["id"]
+    if evaluator_name == 'chatgpt' and category not in evaluator.question_num:
+        return category, id, []
+    standard = evaluator.standard_index.get_record(category, id)
+    if standard is None:
+        return category, id, None
+    rows = []
+    for segment in EVALUATOR_SEGMENTS[evaluator_name]:
+        answers = record.get(segment)
+        if answers is None:
+            continue
+        answers = answers if isinstance(answers, list) else [answers]
+        if evaluator_name == 'chatgpt':
+            verdicts = evaluator.score_candidates(category, id, answers)
+        else:
+            verdicts = evaluator.score_candidates(category, id, segment, answers)
+        if verdicts is None:
+            continue
+        rows.append({'category': category, 'id': str(id), 'difficulty': standard['difficulty'], 'segment': segment,
+                     'correct': any(verdicts), 'passed': sum(verdicts), 'samples': len(verdicts)})
+    return category, id, rows
+
+def score_timed(record):
+    """Outcome of one results record, the seconds it took to score and whether it holds sampled answers
+
+    The outcome of a record with sampled answers is the one of score_sampled.
+    """
+    start = time.perf_counter()
+    sampled = any(isinstance(record.get(segment), list) for segment in EVALUATOR_SEGMENTS[evaluator_name])
+    outcome = score_sampled(record) if sampled else score_function(record)
+    return outcome, time.perf_counter() - start, sampled
+
+def open_output(path):
+    """Text file for the verdicts, gzip-compressed if the name ends with .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+def model_name(results_file):
+    return os.path.splitext(os.path.basename(results_file.removesuffix('.gz')))[0]
+
+def model_names(results_files):
+    """Default model names: the file names, or the names of their directories when the file names repeat
+    (ckptA/results.json, ckptB/results.json); None if those repeat too"""
+    names = [model_name(results_file) for results_file in results_files]
+    if len(set(names)) < len(names):
+        names = [os.path.basename(os.path.dirname(os.path.abspath(results_file))) for results_file in results_files]
+    return names if len(set(names)) == len(names) else None
+
+def score_models(name, results_files, models, standard_files, verdicts_file=None, workers=1, cache_file=None, details=False):
+    """Score every results file against the same ground truth, loaded and parsed once
+
+    The per-item verdicts are streamed to verdicts_file as JSONL, one compact line per item and segment:
+    model, category, id, difficulty, segment, correct (plus rough and the matched parse rules for the ChatGPT
+    evaluator) and latency_ms, the time taken to score the results record. A segment that holds a list of
+    sampled answers is scored as pass@k: correct if any sample passes, plus passed and samples. Returns
+    {model: {'category_segment': [correct, total]}}.
+    """
+    if len(set(models)) < len(models):
+        raise ValueError(f"Model names must be distinct, got {models}")
+    init_worker(name, standard_files, cache_file)
+    _, update_name, reset_name = EVALUATOR_FUNCTIONS[name]
+    if evaluator.gold_mismatches:
+        mismatches = ", ".join(f"{category} {id}" for category, id in evaluator.gold_mismatches)
+        print(f"Warning: the gold answers of {mismatches} disagree with the solution computed from the graph")
+    summary = {}
+    output = open_output(verdicts_file) if verdicts_file else None
+    devnull = open(os.devnull, 'w')
+    try:
+        for results_file, model in zip(results_files, models):
+            getattr(evaluator, reset_name)()
+            counts = summary[model] = defaultdict(lambda: [0, 0])
+            start = time.perf_counter()
+            # What the checkers print about single answers is only shown with --details
+            with contextlib.redirect_stdout(sys.stdout if details else devnull):
+                for outcome, seconds, sampled in score_in_order(score_timed, iter_records(results_file), workers,
+                                                                initializer=init_worker, initargs=(name, standard_files, cache_file)):
+                    if sampled:
+                        # pass@k rows, not part of the statistics of the evaluator
+                        category, id, rows = outcome
+                        if rows is None:
+                            evaluator.missing_results.append((category, id))
+                            continue
+                    else:
+                        getattr(evaluator, update_name)(outcome)
+                        rows = evaluator.verdict_rows(outcome)
+                    for row in rows:
+                        cell = counts[f"{row['category']}_{row['segment']}"]
+                        cell[0] += row['correct']
+                        cell[1] += 1
+                        if output:
+                            output.write(json.dumps(dict(row, model=model, latency_ms=round(seconds * 1000, 3)), separators=(',', ':')) + '\n')
+            if evaluator.verdict_cache:
+                evaluator.verdict_cache.flush()
+            print(f"{model}: {sum(total for _, total in counts.values())} verdicts from {results_file} in {time.perf_counter() - start:.1f} s")
+            if evaluator.missing_warning():
+                print(evaluator.missing_warning())
+            if details:
+                evaluator.print_statistics()
+    finally:
+        devnull.close()
+        if output:
+            output.close()
+    return summary
+
+def print_summary(summary):
+    """Accuracy of every category and segment (rows) for every model (columns)"""
+    models = list(summary)
+    cells = sorted({cell for counts in summary.values() for cell in counts})
+    width = max([len(cell) for cell in cells] + [4])
+    print(f"{'cell':<{width}}  " + "  ".join(f"{model:>10}" for model in models))
+    for cell in cells:
+        values = []
+        for model in models:
+            correct, total = summary[model].get(cell, (0, 0))
+            values.append(f"{correct / total:>10.4f}" if total else f"{'-':>10}")
+        print(f"{cell:<{width}}  " + "  ".join(values))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the results of many models in one run, with the ground truth loaded once")
+    parser.add_argument("--evaluator", choices=sorted(EVALUATORS), required=True, help="llava: three segments per record, chatgpt: segment3")
+    parser.add_argument("--results", nargs='+', required=True, help="Results files of the models, JSON array or JSONL")
+    parser.add_argument("--models", nargs='+', default=None, help="Model names, in the order of --results (default: the file names, or their directory names if those repeat)")
+    parser.add_argument("--standard", nargs='+', required=True, help="standard.json, test.json files or columnar dataset directories")
+    parser.add_argument("--verdicts", default=None, help="Stream the per-item verdicts of all models to this JSONL file (.gz to compress)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of scoring processes")
+    parser.add_argument("--cache", default=None, help="Verdict cache file shared by all models, only new or changed answers are scored")
+    parser.add_argument("--summary", default=None, help="Write {model: {category_segment: [correct, total]}} as JSON")
+    parser.add_argument("--details", action='store_true', help="Print the full statistics of the evaluator for every model")
+    args = parser.parse_args()
+    models = args.models or model_names(args.results)
+    if models is None:
+        parser.error("the results files and their directories have the same names, give the model names with --models")
+    if len(models) != len(args.results):
+        parser.error("--models needs one name per results file")
+    if len(set(models)) < len(models):
+        parser.error("--models must be distinct")
+
+    summary = score_models(args.evaluator, args.results, models, args.standard, args.verdicts, args.workers, args.cache, args.details)
+    print()
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, indent=2)
@@ -0,0 +1,458 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is then not reported
+    resource = None
+
+import numpy as np
+from standard_index import category_from_path
+from stream_results import iter_records
+from graph_cache import Graph
+from graph_algorithms import shortest_distances, max_flow, maximum_matching_size
+from gnn_layers import propagate
+from evaluators import EVALUATORS, evaluator_script, load_evaluator
+
+CATEGORIES = ['Connectivity', 'Cycle', 'TopologicalSort', 'ShortestPath', 'MaximumFlow', 'BipartiteGraphMatching', 'HamiltonPath', 'GNN']
+DIFFICULTIES = {
+    'Connectivity': ['easy', 'medium', 'hard'],
+    'Cycle': ['easy', 'medium', 'hard'],
+    'TopologicalSort': ['easy', 'medium', 'hard'],
+}
+SEGMENTS = ['segment1', 'segment2', 'segment3']
+
+# Question turns, as in Dataset/*/test.json
+NODE_COUNT_QUESTION = "<image>\nHow many nodes are there in the diagram."
+UNDIRECTED_EDGES_QUESTION = "Please use tuples to represent the edges in the graph. Each tuple should consist of two nodes that are connected by an undirected edge."
+DIRECTED_EDGES_QUESTION = "Please use tuples to represent the edges in the graph. Each tuple should consist of two nodes representing a directed edge, with the first node being the source and the second node being the destination."
+WEIGHTED_EDGES_QUESTION = "Please use tuples to represent the edges in the graph. Each tuple should consist of three elements: (node1, node2, weight), where 'node1' and 'node2' are the nodes connected by an edge, and 'weight' is the numerical value associated with the undirected edge."
+CAPACITY_EDGES_QUESTION = "Please use tuples to represent the edges in the graph. Each tuple should consist of three elements: <source, destination, weight>, where 'source' is the source node, 'destination' is the destination node, and 'weight' is the numerical value associated with the directed edge."
+GNN_QUESTION = "Each node is initially assigned an embedding vector in the graph, and the embedding will be updated by the sum of its neighbors' embeddings in a simple graph convolution layer. What's the embedding of each node after one layer of simple graph convolution layer?"
+
+def random_edges(rng, nodes, num_edges, connected=False):
+    """Random simple undirected edges (u < v) between the given nodes, a random spanning tree first if connected"""
+    edges = set()
+    if connected:
+        order = list(nodes)
+        rng.shuffle(order)
+        for i in range(1, len(order)):
+            u, v = order[i], order[rng.randrange(i)]
+            edges.add((min(u, v), max(u, v)))
+    num_edges = min(num_edges, len(nodes) * (len(nodes) - 1) // 2)
+    while len(edges) < num_edges:
+        u, v = rng.sample(nodes, 2)
+        edges.add((min(u, v), max(u, v)))
+    return sorted(edges)
+
+def edges_text(edges, directed=False):
+    left, right = ('<', '>') if directed else ('(', ')')
+    return "The edges are represented by the tuples:\n" + ", ".join(left + ", ".join(map(str, edge)) + right for edge in edges)
+
+def nodes_text(nodes):
+    return ",".join(map(str, nodes))
+
+def bfs_path(adjacency, source, target):
+    """Node sequence of a shortest unweighted path, or None if target is unreachable"""
+    parent = {source: None}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = parent[node]
+            return path[::-1]
+        for neighbor in adjacency[node]:
+            if neighbor not in parent:
+                parent[neighbor] = node
+                queue.append(neighbor)
+    return None
+
+def adjacency_of(num_nodes, edges):
+    adjacency = [[] for _ in range(num_nodes)]
+    for u, v in edges:
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+    return adjacency
+
+def non_edge(rng, num_nodes, edge_set):
+    """A random pair of distinct nodes that is not an edge (in either direction), or None after a few tries"""
+    for _ in range(100):
+        u, v = rng.sample(range(num_nodes), 2)
+        if (u, v) not in edge_set and (v, u) not in edge_set:
+            return u, v
+    return None
+
+# Every generator returns (edges turn, edges question, question, gold answer, correct answer, adversarial answers).
+# Correct answers are phrased the way the models answer, so they go through the evaluators' parsers.
+
+def generate_connectivity(rng, num_nodes, degree):
+    nodes = list(range(num_nodes))
+    rng.shuffle(nodes)
+    # Two components, so both answers occur
+    split = rng.randrange(1, num_nodes)
+    edges = []
+    for part in (nodes[:split], nodes[split:]):
+        if len(part) > 1:
+            edges += random_edges(rng, part, len(part) * degree // 2, connected=True)
+    edges.sort()
+    source, target = rng.sample(range(num_nodes), 2)
+    path = bfs_path(adjacency_of(num_nodes, edges), source, target)
+    question = f"Is there a path between node {source} and node {target} in the graph?"
+    if path:
+        gold = "The answer is yes."
+        correct = f"Yes, there is a path between node {source} and node {target}. The path is {nodes_text(path)}."
+        missing = non_edge(rng, num_nodes, set(edges)) or (source, target)
+        adversarial = [
+            f"No, there is no path between node {source} and node {target}.",
+            f"Yes, there is a path between node {source} and node {target}. The path is {nodes_text(missing)}.",
+            f"Yes, there is a path. The path is {source},{10 ** 12},{target}.",
+        ]
+    else:
+        gold = "The answer is no."
+        correct = f"No, there is no path between node {source} and node {target}."
+        adversarial = [f"Yes, there is a path between node {source} and node {target}. The path is {source},{target}."]
+    return edges_text(edges), UNDIRECTED_EDGES_QUESTION, question, gold, correct, adversarial
+
+def generate_cycle(rng, num_nodes, degree):
+    edges = random_edges(rng, list(range(num_nodes)), 0, connected=True)
+    edge_set = set(edges)
+    extra = non_edge(rng, num_nodes, edge_set) if num_nodes > 2 and rng.random() < 0.5 else None
+    question = "Is there a cycle in the graph?"
+    if extra:
+        # The extra edge closes the tree path between its endpoints
+        cycle = bfs_path(adjacency_of(num_nodes, edges), *extra)
+        edges = sorted(edges + [(min(extra), max(extra))])
+        gold = "Yes, there is a cycle in this graph."
+        correct = f"Yes, there is a cycle in this graph. The cycle is {', '.join(map(str, cycle + cycle[:1]))}."
+        u, v = edges[0]
+        adversarial = [
+            "No, there is no cycle in this graph.",
+            # Walks the same edge twice
+            f"Yes, there is a cycle in this graph. The cycle is {u}, {v}, {u}.",
+            # Repeats a node
+            f"Yes, there is a cycle in this graph. The cycle is {', '.join(map(str, cycle + cycle[1:2] + cycle[:1]))}.",
+        ]
+    else:
+        gold = "No, there is no cycle in this graph."
+        correct = gold
+        adversarial = [f"Yes, there is a cycle in this graph. The cycle is {', '.join(map(str, bfs_path(adjacency_of(num_nodes, edges), 0, num_nodes - 1) + [0]))}."]
+    return edges_text(edges), UNDIRECTED_EDGES_QUESTION, question, gold, correct, adversarial
+
+def generate_topologicalsort(rng, num_nodes, degree):
+    order = list(range(num_nodes))
+    rng.shuffle(order)
+    position = {node: index for index, node in enumerate(order)}
+    edges = sorted({(order[i], order[j]) for i, j in (sorted(rng.sample(range(num_nodes), 2)) for _ in range(num_nodes * degree // 2))})
+    # Another valid order, Kahn's algorithm with random tie-breaking
+    in_degree = [0] * num_nodes
+    successors = [[] for _ in range(num_nodes)]
+    for u, v in edges:
+        in_degree[v] += 1
+        successors[u].append(v)
+    ready = [node for node in range(num_nodes) if in_degree[node] == 0]
+    kahn_order = []
+    while ready:
+        node = ready.pop(rng.randrange(len(ready)))
+        kahn_order.append(node)
+        for successor in successors[node]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                ready.append(successor)
+    u, v = max(edges, key=lambda edge: position[edge[1]] - position[edge[0]]) if edges else (order[0], order[-1])
+    swapped = [v if node == u else u if node == v else node for node in kahn_order]
+    adversarial = [
+        f"The solution is: {nodes_text(order[::-1])}.",
+        f"The solution is: {nodes_text(kahn_order[:-1] + kahn_order[:1])}.",
+        f"The solution is: {nodes_text(kahn_order[:-1])}.",
+        f"The solution is: {nodes_text(swapped)}.",
+    ]
+    gold = f"The solution is: {nodes_text(order)}."
+    return edges_text(edges, directed=True), DIRECTED_EDGES_QUESTION, "Can all the nodes be visited? Give the solution.", gold, f"The solution is: {nodes_text(kahn_order)}.", adversarial
+
+def generate_shortestpath(rng, num_nodes, degree):
+    edges = [(u, v, rng.randint(1, 10)) for u, v in random_edges(rng, list(range(num_nodes)), num_nodes * degree // 2, connected=True)]
+    graph = Graph(num_nodes, edges, False, True)
+    source, target = rng.sample(range(num_nodes), 2)
+    distances = shortest_distances(graph, source)
+    # Walk back from the target along edges that are tight for the distances
+    path = [target]
+    while path[-1] != source:
+        node = path[-1]
+        path.append(next(neighbor for neighbor, weight in graph.weighted_neighbors_of(node) if distances[neighbor] + weight == distances[node]))
+    path.reverse()
+    weight = distances[target]
+    prefix = f"The shortest path from node {source} to node {target} is"
+    gold = f"{prefix} {nodes_text(path)} with a total weight of {weight}"
+    adversarial = [
+        f"{prefix} {nodes_text(path)} with a total weight of {weight + 1}",
+        f"{prefix} {source},{target} with a total weight of {weight}",
+        f"{prefix} {nodes_text(path[:1] + path)} with a total weight of {weight}",
+    ]
+    return edges_text(edges), WEIGHTED_EDGES_QUESTION, f"Give the shortest path from node {source} to node {target}.", gold, gold, adversarial
+
+def generate_maximumflow(rng, num_nodes, degree):
+    pairs = set()
+    while len(pairs) < min(num_nodes * degree // 2, num_nodes * (num_nodes - 1)):
+        pairs.add(tuple(rng.sample(range(num_nodes), 2)))
+    edges = [(u, v, rng.randint(1, 10)) for u, v in sorted(pairs)]
+    source, sink = rng.sample(range(num_nodes), 2)
+    flow = max_flow(Graph(num_nodes, edges, True, True), source, sink)
+    prefix = f"The maximum flow from node {source} to node {sink} is"
+    adversarial = [
+        f"{prefix} {flow + 1}.",
+        f"The maximum flow from node {sink} to node {source} is {flow}.",
+        f"{prefix} {flow}. The flows are <{source}, {sink}, {flow}>.",
+    ]
+    return edges_text(edges, directed=True), CAPACITY_EDGES_QUESTION, f"What is the maximum flow from node {source} to node {sink}?", f"{prefix} {flow}.", f"{prefix} {flow}.", adversarial
+
+def generate_bipartitegraphmatching(rng, num_nodes, degree):
+    num_applicants = max(1, num_nodes // 2)
+    num_jobs = max(1, num_nodes - num_applicants)
+    pairs = {(num_applicants - 1, rng.randrange(num_jobs)), (rng.randrange(num_applicants), num_jobs - 1)}
+    while len(pairs) < min(num_nodes * degree // 2, num_applicants * num_jobs):
+        pairs.add((rng.randrange(num_applicants), rng.randrange(num_jobs)))
+    pairs = sorted(pairs)
+    graph = Graph(num_applicants + num_jobs, [(a, num_applicants + j, 0) for a, j in pairs], False, False, num_applicants)
+    size = maximum_matching_size(graph)
+    matching = graph.solutions['matching_pairs']
+    lines = "".join(f"applicant {a}: job {j}\n" for a, j in matching)
+    gold = f"{lines}{size} applicants can find the job they are interested in."
+    a, j = matching[0]
+    adversarial = [
+        f"{lines}{size + 1} applicants can find the job they are interested in.",
+        f"{lines}applicant {a}: job {j}\n{size + 1} applicants can find the job they are interested in.",
+        f"applicant {a}: job {num_applicants + num_jobs + 5}\n{lines[lines.index(chr(10)) + 1:]}{size} applicants can find the job they are interested in.",
+    ]
+    edges = "The edges are represented by the tuples:\n" + ", ".join(f"(Appl{a}, Job{j})" for a, j in pairs)
+    question = "Find an assignment of jobs to applicants in such that the maximum number of applicants find the job they are interested in."
+    return edges, UNDIRECTED_EDGES_QUESTION, question, gold, gold, adversarial
+
+def generate_hamiltonpath(rng, num_nodes, degree):
+    path = list(range(num_nodes))
+    rng.shuffle(path)
+    # A planted Hamilton path plus random edges up to the average degree
+    edges = {(min(u, v), max(u, v)) for u, v in zip(path, path[1:])}
+    edges = sorted(edges | set(random_edges(rng, list(range(num_nodes)), num_nodes * (degree - 2) // 2)))
+    question = "Is there a path in this graph that visits every node exactly once? If yes, give the path. Note that in a path, adjacent nodes must be connected with edges."
+    adversarial = [
+        "No, there is no path.",
+        f"Yes, the path is {', '.join(map(str, path[:-1]))}.",
+        f"Yes, the path is {', '.join(map(str, path[:-1] + path[:1]))}.",
+        f"Yes, the path is {', '.join(map(str, path[1:2] + path[:1] + path[2:]))}.",
+    ]
+    return edges_text(edges), UNDIRECTED_EDGES_QUESTION, question, f"Yes. The path can be: {nodes_text(path)}", f"Yes, the path is {', '.join(map(str, path))}.", adversarial
+
+def generate_gnn(rng, num_nodes, degree):
+    edges = random_edges(rng, list(range(num_nodes)), num_nodes * degree // 2)
+    graph = Graph(num_nodes, [(u, v, 0) for u, v in edges], False, False)
+    initial = np.array([[rng.randint(0, 1), rng.randint(0, 1)] for _ in range(num_nodes)])
+    output = propagate([graph], [initial])[0].astype(int)
+    def embeddings_text(matrix, separator=","):
+        return "".join(f"node {node}: [{separator.join(map(str, vector))}]\n" for node, vector in enumerate(matrix.tolist()))
+    # The initial embeddings are only drawn in the dataset images, here they are listed in the question
+    question = f"The initial embeddings are:\n{embeddings_text(initial)}{GNN_QUESTION}"
+    wrong = output.copy()
+    wrong[rng.randrange(num_nodes), 0] += 1
+    adversarial = [
+        f"The answer is:\n{embeddings_text(wrong)}",
+        f"The answer is:\n{embeddings_text(output[:-1])}",
+        f"The answer is:\n{embeddings_text(initial)}",
+    ]
+    return edges_text(edges), UNDIRECTED_EDGES_QUESTION, question, f"The answer is:\n{embeddings_text(output)}", f"The answer is:\n{embeddings_text(output, ', ')}", adversarial
+
+GENERATORS = {
+    'Connectivity': generate_connectivity,
+    'Cycle': generate_cycle,
+    'TopologicalSort': generate_topologicalsort,
+    'ShortestPath': generate_shortestpath,
+    'MaximumFlow': generate_maximumflow,
+    'BipartiteGraphMatching': generate_bipartitegraphmatching,
+    'HamiltonPath': generate_hamiltonpath,
+    'GNN': generate_gnn,
+}
+
+def malformed_answers(rng, gold):
+    garbage = "".join(rng.choice("abc xyz0123456789,.:()<>[]\n") for _ in range(200))
+    return ["I am not sure.", "", gold[:len(gold) // 2], "The answer is " + "9" * 50, garbage, "node node: [[,]] (, <, >"]
+
+def generate_questions(rng, category, count, num_nodes, degree):
+    """Ground-truth records in the Dataset/*/test.json schema, with the candidate answers of each question"""
+    questions = []
+    for index in range(count):
+        size = rng.randint(max(3, num_nodes // 2), max(3, num_nodes))
+        edges, edges_question, question, gold, correct, adversarial = GENERATORS[category](rng, size, degree)
+        count_answer = f"There are {size} nodes in the diagram."
+        record = {
+            "id": str(index),
+            "image": f"/Dataset/{category}/test/{category}_Graph_test_{index}.png",
+            "difficulty": rng.choice(DIFFICULTIES.get(category, ['easy', 'hard'])),
+            "conversations": [
+                {"from": "human", "value": NODE_COUNT_QUESTION},
+                {"from": "gpt", "value": count_answer},
+                {"from": "human", "value": edges_question},
+                {"from": "gpt", "value": edges},
+                {"from": "human", "value": question},
+                {"from": "gpt", "value": gold},
+            ],
+        }
+        # Segment 1 and 2 answers: the gold answer, or a wrong count / an edge list with one edge dropped
+        candidates = {
+            'correct': [count_answer, edges, correct],
+            'malformed': [malformed_answers(rng, count_answer), malformed_answers(rng, edges), malformed_answers(rng, gold)],
+            'adversarial': [[f"There are {size + 1} nodes in the diagram."], [edges.rsplit(",", 1)[0] if "," in edges else ""], adversarial],
+        }
+        questions.append((record, candidates))
+    return questions
+
+def write_standard(directory, questions):
+    """Write the questions of this run as standard.json, replacing the one of an earlier run with other parameters"""
+    standard_file = os.path.join(directory, 'standard.json')
+    with open(standard_file, 'w', encoding='utf-8') as file:
+        json.dump([record for category_questions in questions.values() for record, _ in category_questions], file)
+    return standard_file
+
+def write_dataset(directory, questions, num_answers, mix, rng):
+    """Write a results JSONL of num_answers answers cycling over the questions"""
+    results_file = os.path.join(directory, f'results_{num_answers}.jsonl')
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    categories = list(questions)
+    with open(results_file, 'w', encoding='utf-8') as file:
+        for index in range(num_answers):
+            category = categories[index % len(categories)]
+            record, candidates = questions[category][(index // len(categories)) % len(questions[category])]
+            result = {"id": record["id"], "image_url": record["image"], "difficulty": record["difficulty"]}
+            for segment, options in zip(SEGMENTS, zip(*(candidates[kind] for kind in kinds))):
+                kind = rng.choices(range(len(kinds)), weights)[0]
+                option = options[kind]
+                result[segment] = option if isinstance(option, str) else rng.choice(option)
+            file.write(json.dumps(result) + "\n")
+    return results_file
+
+def peak_rss_mb(usage):
+    """ru_maxrss is in kilobytes on Linux and in bytes on macOS"""
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_end_to_end(name, standard_file, results_file, workers):
+    """Run an evaluator script as a subprocess, returns wall time, peak memory and exit code"""
+    command = [sys.executable, evaluator_script(name), '--results', results_file, '--standard', standard_file, '--workers', str(workers)]
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen(command, stdout=devnull, stderr=devnull)
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            exit_code = os.waitstatus_to_exitcode(status)
+            peak = peak_rss_mb(usage)
+        else:
+            exit_code = process.wait()
+            peak = None
+    return {"seconds": round(time.perf_counter() - start, 3), "peak_rss_mb": peak, "exit_code": exit_code}
+
+def profile_in_process(name, standard_file, results_file):
+    """Time ground-truth loading and every checker call, per category and segment"""
+    module = load_evaluator(name)
+    start = time.perf_counter()
+    module.load_ground_truth([standard_file])
+    load_seconds = time.perf_counter() - start
+    timings = defaultdict(lambda: [0, 0.0])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for data in iter_records(results_file):
+            category = category_from_path(data["image_url"])
+            if name == 'chatgpt':
+                if category not in module.question_num:
+                    continue
+                start = time.perf_counter()
+                module.score_result(data)
+                timing = timings[(category, 'segment3')]
+                timing[0] += 1
+                timing[1] += time.perf_counter() - start
+                continue
+            for segment in SEGMENTS:
+                expected = module.get_expected_answer(module.standard_index, category, data["id"], segment)
+                start = time.perf_counter()
+                if segment == 'segment2':
+                    # Edge keys of the answer, queued for the batched segment2 metrics
+                    gold_keys = module.graph_cache.get(category, data["id"]).solutions['edge_keys']
+                    module.segment2_stats.add((category,), module.edge_keys(data[segment], category, data["id"]), gold_keys)
+                module.is_correct_answer(data[segment], expected, segment, category, data["id"])
+                timing = timings[(category, segment)]
+                timing[0] += 1
+                timing[1] += time.perf_counter() - start
+    categories = {}
+    for (category, segment), (count, seconds) in sorted(timings.items()):
+        categories.setdefault(category, {})[segment] = {
+            "answers": count,
+            "seconds": round(seconds, 4),
+            "answers_per_second": round(count / seconds, 1) if seconds else None,
+        }
+    report = {"load_seconds": round(load_seconds, 3), "categories": categories}
+    if resource is not None:
+        report["peak_rss_mb"] = peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF))
+    return report
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, weight = part.split('=')
+        if kind not in ('correct', 'malformed', 'adversarial'):
+            raise ValueError(f"Unknown answer kind {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the evaluators on synthetic graphs and answers")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000], help="Numbers of answers, one end-to-end run per size")
+    parser.add_argument("--questions", type=int, default=50, help="Questions per category")
+    parser.add_argument("--nodes", type=int, default=20, help="Maximum number of nodes per graph")
+    parser.add_argument("--degree", type=int, default=4, help="Average node degree")
+    parser.add_argument("--categories", nargs='+', default=CATEGORIES, choices=CATEGORIES)
+    parser.add_argument("--mix", default="correct=0.5,malformed=0.25,adversarial=0.25", help="Share of correct, malformed and adversarial answers")
+    parser.add_argument("--evaluators", nargs='+', default=list(EVALUATORS), choices=list(EVALUATORS))
+    parser.add_argument("--workers", type=int, default=1, help="--workers passed to the evaluators")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None, help="Keep the generated files in this directory instead of a temporary one")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    with contextlib.ExitStack() as stack:
+        directory = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        questions = {category: generate_questions(rng, category, args.questions, args.nodes, args.degree) for category in args.categories}
+        standard_file = write_standard(directory, questions)
+        report = {
+            "config": vars(args),
+            "generation_seconds": round(time.perf_counter() - start, 3),
+            "scaling": [],
+        }
+        for size in sorted(args.sizes):
+            results_file = write_dataset(directory, questions, size, mix, rng)
+            point = {"answers": size}
+            for name in args.evaluators:
+                run = run_end_to_end(name, standard_file, results_file, args.workers)
+                run["answers_per_second"] = round(size / run["seconds"], 1) if run["seconds"] else None
+                point[name] = run
+                print(f"{name} {size} answers: {run['seconds']}s, {run['answers_per_second']} answers/s, peak {run['peak_rss_mb']} MB")
+            report["scaling"].append(point)
+        # Per-category and per-segment throughput on the largest size
+        report["throughput"] = {name: profile_in_process(name, standard_file, results_file) for name in args.evaluators}
+    for name, profile in report["throughput"].items():
+        for category, segments in profile["categories"].items():
+            for segment, timing in segments.items():
+                print(f"{name} {category} {segment}: {timing['answers_per_second']} answers/s")
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import numpy as np
+from standard_index import category_from_path
+from graph_cache import Graph, parse_graph
+
+FORMAT_VERSION = 1
+# String columns: the id, the image path and the six conversation turns
+STRING_COLUMNS = ['id', 'image'] + [f'turn{turn}' for turn in range(6)]
+ROLES = ['human', 'gpt', 'human', 'gpt', 'human', 'gpt']
+# Bits of the 'flags' column
+DIRECTED, WEIGHTED, BIPARTITE = 1, 2, 4
+NO_VALUE = -1
+
+def convert(json_files, output_dir):
+    """Convert Dataset/*/{train,test}.json files into a columnar dataset directory, returns the number of records
+
+    The graphs are parsed once with graph_cache.parse_graph (jobs of a bipartite graph already numbered
+    after the applicants), so loading them back needs no text parsing.
+    """
+    categories = []
+    difficulties = []
+    columns = {name: [] for name in ['node_count', 'num_applicants', 'flags', 'category', 'difficulty', 'query_source', 'query_target', 'edge_offsets']}
+    edge_sources = []
+    edge_targets = []
+    edge_weights = []
+    strings = {name: [] for name in STRING_COLUMNS}
+    for json_file in json_files:
+        with open(json_file, 'r', encoding='utf-8') as file:
+            records = json.load(file)
+        for record in records:
+            if [turn.get('from') for turn in record['conversations']] != ROLES:
+                raise ValueError(f"Record {record['id']} of {json_file} does not have the six human/gpt turns")
+            category = category_from_path(record['image'])
+            if category not in categories:
+                categories.append(category)
+            difficulty = record.get('difficulty')
+            if difficulty is not None and difficulty not in difficulties:
+                difficulties.append(difficulty)
+            graph = parse_graph(record)
+            columns['node_count'].append(graph.num_nodes)
+            columns['num_applicants'].append(NO_VALUE if graph.num_applicants is None else graph.num_applicants)
+            columns['flags'].append((DIRECTED if graph.directed else 0) | (WEIGHTED if graph.weighted else 0)
+                                    | (BIPARTITE if graph.num_applicants is not None else 0))
+            columns['category'].append(categories.index(category))
+            columns['difficulty'].append(NO_VALUE if difficulty is None else difficulties.index(difficulty))
+            columns['query_source'].append(graph.query[0] if graph.query else NO_VALUE)
+            columns['query_target'].append(graph.query[1] if graph.query else NO_VALUE)
+            columns['edge_offsets'].append(len(edge_sources))
+            edge_sources.extend(graph.sources)
+            edge_targets.extend(graph.targets)
+            edge_weights.extend(graph.edge_weights)
+            strings['id'].append(str(record['id']))
+            strings['image'].append(record['image'])
+            for turn in range(6):
+                strings[f'turn{turn}'].append(record['conversations'][turn]['value'])
+    columns['edge_offsets'].append(len(edge_sources))
+    os.makedirs(output_dir, exist_ok=True)
+    dtypes = {'flags': np.uint8, 'category': np.int8, 'difficulty': np.int8, 'edge_offsets': np.int64}
+    for name, values in columns.items():
+        np.save(os.path.join(output_dir, f'{name}.npy'), np.array(values, dtype=dtypes.get(name, np.int32)))
+    np.save(os.path.join(output_dir, 'edge_sources.npy'), np.array(edge_sources, dtype=np.int32))
+    np.save(os.path.join(output_dir, 'edge_targets.npy'), np.array(edge_targets, dtype=np.int32))
+    np.save(os.path.join(output_dir, 'edge_weights.npy'), np.array(edge_weights, dtype=np.int32))
+    for name, values in strings.items():
+        # UTF-8 blob plus offsets, so a string is one slice of the memory map
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        np.save(os.path.join(output_dir, f'{name}_offsets.npy'), offsets)
+        np.save(os.path.join(output_dir, f'{name}_data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    with open(os.path.join(output_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump({'version': FORMAT_VERSION, 'records': len(strings['id']), 'categories': categories, 'difficulties': difficulties}, file)
+    return len(strings['id'])
+
+class ColumnarDataset:
+    """Read-only view of a converted dataset directory
+
+    Every column is opened with np.load(mmap_mode='r'), so opening is O(1) in the dataset size, records
+    are only decoded when accessed, and processes reading the same files share the OS page cache.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar dataset version {meta['version']} in {directory}")
+        self.categories = meta['categories']
+        self.difficulties = meta['difficulties']
+        self.size = meta['records']
+        self.columns = {}
+
+    def column(self, name):
+        array = self.columns.get(name)
+        if array is None:
+            array = self.columns[name] = np.load(os.path.join(self.directory, f'{name}.npy'), mmap_mode='r')
+        return array
+
+    def __len__(self):
+        return self.size
+
+    def text(self, name, index):
+        offsets = self.column(f'{name}_offsets')
+        return self.column(f'{name}_data')[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def category(self, index):
+        return self.categories[self.column('category')[index]]
+
+    def difficulty(self, index):
+        difficulty = self.column('difficulty')[index]
+        return None if difficulty == NO_VALUE else self.difficulties[difficulty]
+
+    def answer(self, index, turn):
+        """Text of one conversation turn, e.g. turn 5 for the gold answer of segment3"""
+        return self.text(f'turn{turn}', index)
+
+    def record(self, index):
+        """The record as in the JSON files"""
+        record = {
+            'id': self.text('id', index),
+            'image': self.text('image', index),
+            'conversations': [{'from': role, 'value': self.answer(index, turn)} for turn, role in enumerate(ROLES)],
+        }
+        difficulty = self.difficulty(index)
+        if difficulty is not None:
+            record['difficulty'] = difficulty
+        return record
+
+    def edges(self, index):
+        """(sources, targets, weights) arrays of a graph, views into the memory map"""
+        offsets = self.column('edge_offsets')
+        start, end = offsets[index], offsets[index + 1]
+        return self.column('edge_sources')[start:end], self.column('edge_targets')[start:end], self.column('edge_weights')[start:end]
+
+    def query(self, index):
+        """(source, target) named by the question of a record, or None"""
+        query_source = int(self.column('query_source')[index])
+        return None if query_source == NO_VALUE else (query_source, int(self.column('query_target')[index]))
+
+    def graph(self, index):
+        """Build the Graph of a record from its columns, without parsing any text"""
+        sources, targets, weights = self.edges(index)
+        flags = int(self.column('flags')[index])
+        num_applicants = int(self.column('num_applicants')[index])
+        return Graph(int(self.column('node_count')[index]), list(zip(sources.tolist(), targets.tolist(), weights.tolist())),
+                     bool(flags & DIRECTED), bool(flags & WEIGHTED), None if num_applicants == NO_VALUE else num_applicants, self.query(index))
+
+    def keys(self):
+        """(category, id) of every record in order, from the category and id columns without decoding the records"""
+        categories = [self.categories[category] for category in self.column('category').tolist()]
+        data = self.column('id_data').tobytes()
+        offsets = self.column('id_offsets').tolist()
+        return [(category, data[offsets[index]:offsets[index + 1]].decode('utf-8')) for index, category in enumerate(categories)]
+
+def is_columnar_dataset(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'meta.json'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Dataset/*/{train,test}.json files into a memory-mapped columnar dataset")
+    parser.add_argument("--input", nargs='+', required=True, help="JSON files, e.g. Dataset/*/test.json")
+    parser.add_argument("--output", required=True, help="Output directory")
+    args = parser.parse_args()
+    count = convert(args.input, args.output)
+    print(f"Converted {count} records to {args.output}")
@@ -0,0 +1,133 @@
+import itertools
+import numpy as np
+
+# Bits per field of a packed edge key: (u << 42) | (v << 21) | weight
+FIELD_BITS = 21
+FIELD_LIMIT = 1 << FIELD_BITS
+MALFORMED_MASK = (1 << 62) - 1
+# Sums kept per group, the averages are derived from them
+FIELDS = ('count', 'recall', 'error_rate', 'precision', 'f1', 'half_correct', 'exact_match', 'matched', 'predicted', 'gold')
+
+def edge_key(edge, directed, weighted):
+    """Packed int64 key of an edge tuple, (u, v) or (u, v, weight); None if the tuple does not fit the graph
+
+    The endpoints of an undirected edge are ordered, so (2, 1) and (1, 2) get the same key.
+    """
+    if len(edge) != (3 if weighted else 2) or max(edge) >= FIELD_LIMIT:
+        return None
+    u, v = edge[0], edge[1]
+    if not directed and u > v:
+        u, v = v, u
+    return (u << 2 * FIELD_BITS) | (v << FIELD_BITS) | (edge[2] if weighted else 0)
+
+def encode_edges(edges, directed, weighted):
+    """Sorted unique keys of a list of edge tuples
+
+    A tuple that does not fit the graph (wrong arity, value out of range) gets a negative key from its content,
+    so it counts as a predicted edge but can only match the identical tuple.
+    """
+    keys = set()
+    for edge in edges:
+        key = edge_key(edge, directed, weighted)
+        keys.add(key if key is not None else -1 - (hash(edge) & MALFORMED_MASK))
+    return sorted(keys)
+
+def matched_counts(predicted, gold):
+    """(matched, predicted, gold) count arrays for a batch of rows of sorted unique keys
+
+    Every key is offset by its row times the key span, so the concatenated rows of each side are one sorted
+    array, and the matches of the whole batch are found with a single searchsorted of the predicted keys into
+    the gold keys. Malformed tuples (negative keys) are left out of it and only compared, with sets, in the
+    rare rows whose gold answer has any.
+    """
+    rows = len(predicted)
+    predicted_lengths = np.fromiter(map(len, predicted), np.int64, rows)
+    gold_lengths = np.fromiter(map(len, gold), np.int64, rows)
+    predicted_keys = np.fromiter(itertools.chain.from_iterable(predicted), np.int64, int(predicted_lengths.sum()))
+    gold_keys = np.fromiter(itertools.chain.from_iterable(gold), np.int64, int(gold_lengths.sum()))
+    predicted_rows = np.repeat(np.arange(rows), predicted_lengths)
+    gold_rows = np.repeat(np.arange(rows), gold_lengths)
+    valid_predicted = predicted_keys >= 0
+    valid_gold = gold_keys >= 0
+    malformed_gold_rows = np.unique(gold_rows[~valid_gold])
+    predicted_keys, predicted_rows = predicted_keys[valid_predicted], predicted_rows[valid_predicted]
+    gold_keys, gold_rows = gold_keys[valid_gold], gold_rows[valid_gold]
+    matched = np.zeros(rows, dtype=np.int64)
+    if len(predicted_keys) and len(gold_keys):
+        low = min(int(predicted_keys.min()), int(gold_keys.min()))
+        span = max(int(predicted_keys.max()), int(gold_keys.max())) - low + 1
+        if span * rows < 1 << 63:
+            predicted_composite = predicted_rows * span + (predicted_keys - low)
+            gold_composite = gold_rows * span + (gold_keys - low)
+            positions = np.minimum(np.searchsorted(gold_composite, predicted_composite), len(gold_composite) - 1)
+            matched += np.bincount(predicted_rows[gold_composite[positions] == predicted_composite], minlength=rows)
+        else:
+            # Keys too far apart to be offset by row
+            for row in range(rows):
+                matched[row] = len(set(predicted[row]).intersection(gold[row]))
+            return matched, predicted_lengths, gold_lengths
+    for row in malformed_gold_rows:
+        matched[row] += len({key for key in predicted[row] if key < 0}.intersection(key for key in gold[row] if key < 0))
+    return matched, predicted_lengths, gold_lengths
+
+class EdgeMetrics:
+    """Streaming segment2 edge metrics per group (e.g. a category and difficulty)
+
+    Answers are queued with add() and scored `batch_size` at a time: matched_counts gives the matched edges
+    of the whole batch, and the per-answer recall, precision, F1 and exact match are added to fixed-size
+    sums per group, so memory does not grow with the number of answers.
+    """
+
+    def __init__(self, batch_size=4096):
+        self.batch_size = batch_size
+        self.groups = {}
+        self.sums = np.zeros((0, len(FIELDS)))
+        self.pending = []
+
+    def add(self, groups, predicted, gold):
+        """Queue an answer's predicted and gold keys (from encode_edges), counted in each of `groups`"""
+        self.pending.append((tuple(self.groups.setdefault(group, len(self.groups)) for group in groups), predicted, gold))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        matched, predicted, gold = matched_counts([entry[1] for entry in self.pending], [entry[2] for entry in self.pending])
+        zeros = np.zeros(len(matched))
+        recall = np.divide(matched, gold, out=zeros.copy(), where=gold > 0)
+        precision = np.divide(matched, predicted, out=zeros.copy(), where=predicted > 0)
+        # Share of the predicted edges that are wrong, 0 for an answer without edges
+        error_rate = np.where(predicted > 0, 1 - precision, 0.0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=zeros.copy(), where=precision + recall > 0)
+        exact_match = (matched == predicted) & (matched == gold)
+        values = np.stack([zeros + 1, recall, error_rate, precision, f1, recall >= 0.5, exact_match, matched, predicted, gold], axis=1)
+        group_ids = np.fromiter(itertools.chain.from_iterable(entry[0] for entry in self.pending), np.int64)
+        rows = np.repeat(np.arange(len(self.pending)), [len(entry[0]) for entry in self.pending])
+        if len(self.sums) < len(self.groups):
+            self.sums = np.vstack([self.sums, np.zeros((len(self.groups) - len(self.sums), len(FIELDS)))])
+        np.add.at(self.sums, group_ids, values[rows])
+        self.pending = []
+
+    def summary(self, group):
+        """Averages over the answers of a group, and the micro-averaged precision / recall / F1 over all its edges"""
+        self.flush()
+        sums = dict(zip(FIELDS, self.sums[self.groups[group]]))
+        count = sums['count']
+        micro_precision = sums['matched'] / sums['predicted'] if sums['predicted'] else 0.0
+        micro_recall = sums['matched'] / sums['gold'] if sums['gold'] else 0.0
+        return {
+            'count': int(count),
+            'correct_rate': sums['recall'] / count,
+            'error_rate': sums['error_rate'] / count,
+            'precision': sums['precision'] / count,
+            'f1': sums['f1'] / count,
+            'half_correct': sums['half_correct'] / count,
+            'exact_match': sums['exact_match'] / count,
+            'micro_precision': micro_precision,
+            'micro_recall': micro_recall,
+            'micro_f1': 2 * micro_precision * micro_recall / (micro_precision + micro_recall) if micro_precision + micro_recall else 0.0,
+        }
+
+    def __iter__(self):
+        return iter(self.groups)
@@ -0,0 +1,20 @@
+import glob
+import importlib.util
+import os
+import sys
+
+EVALUATE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVALUATORS = {'llava': 'Evaluate_LLaVA*.py', 'chatgpt': 'Evaluate_ChatGPT*.py'}
+
+def evaluator_script(name):
+    """Path of an evaluator script, found by pattern as the file names contain '*'"""
+    return glob.glob(os.path.join(EVALUATE_DIR, EVALUATORS[name]))[0]
+
+def load_evaluator(name):
+    """Import an evaluator script as a fresh module (its file name is not a valid module name)"""
+    spec = importlib.util.spec_from_file_location(f"evaluate_{name}", evaluator_script(name))
+    module = importlib.util.module_from_spec(spec)
+    # Registered, so its functions can be pickled to worker processes
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,114 @@
+import re
+import numpy as np
+from instrumentation import timed
+
+# "node 3: [2,3]", spaces and newlines are optional since LLaVA answers are stripped of them
+EMBEDDING_PATTERN = re.compile(r"node\s*(\d+)\s*:\s*\[([^\]]*)\]", re.IGNORECASE)
+LAYER_PATTERN = re.compile(r"after (\w+) layers? of", re.IGNORECASE)
+LAYER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10}
+
+def parse_embeddings(text):
+    """Parse 'node i: [x, y, ...]' lines into (node ids, embedding matrix) sorted by node id
+
+    Returns None if there is no embedding, a node is listed twice or the embeddings differ in length.
+    """
+    embeddings = {}
+    for node, values in EMBEDDING_PATTERN.findall(text):
+        node = int(node)
+        if node in embeddings:
+            return None
+        try:
+            embeddings[node] = [float(value) for value in values.split(',') if value.strip()]
+        except ValueError:
+            return None
+    if not embeddings or len({len(vector) for vector in embeddings.values()}) != 1:
+        return None
+    nodes = sorted(embeddings)
+    return np.array(nodes), np.array([embeddings[node] for node in nodes])
+
+def layer_count(question):
+    """Number of graph convolution layers asked for, one if the question does not say"""
+    match = LAYER_PATTERN.search(question)
+    if match is None:
+        return 1
+    word = match.group(1).lower()
+    return int(word) if word.isdigit() else LAYER_WORDS.get(word, 1)
+
+def block_diagonal_edges(graphs):
+    """Stack the edge lists of several graphs into one block-diagonal graph
+
+    Returns (sources, targets, offsets), where the nodes of graphs[i] start at offsets[i] and undirected
+    edges are listed in both directions, so a layer is a single scatter-add over the stacked arrays.
+    """
+    offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+    np.cumsum([graph.size for graph in graphs], out=offsets[1:])
+    sources = []
+    targets = []
+    for graph, offset in zip(graphs, offsets):
+        graph_sources = np.asarray(graph.sources, dtype=np.int64)
+        graph_targets = np.asarray(graph.targets, dtype=np.int64)
+        sources.append(graph_sources + offset)
+        targets.append(graph_targets + offset)
+        if not graph.directed:
+            sources.append(graph_targets + offset)
+            targets.append(graph_sources + offset)
+    return np.concatenate(sources), np.concatenate(targets), offsets
+
+def propagate(graphs, embeddings, layers=1):
+    """Apply `layers` sum-aggregation layers (H <- A H) to a batch of graphs at once
+
+    embeddings[i] is the (graphs[i].size x d) initial embedding matrix, all with the same d.
+    Returns the list of the final embedding matrices.
+    """
+    sources, targets, offsets = block_diagonal_edges(graphs)
+    features = np.concatenate(embeddings)
+    for _ in range(layers):
+        # Sparse adjacency x embedding product: every node receives the sum of its in-neighbors
+        aggregated = np.zeros_like(features)
+        np.add.at(aggregated, targets, features[sources])
+        features = aggregated
+    return [features[offsets[i]:offsets[i + 1]] for i in range(len(graphs))]
+
+def precompute_gnn(standard_index, graph_cache):
+    """Compute the expected embeddings of every GNN question, stored in graph.solutions['gnn'][id]
+
+    The initial embeddings are usually only drawn in the image; when the question lists them, the expected
+    embeddings are propagated from the graph (in one batch per embedding size and layer count), otherwise
+    the gold answer is parsed. They are kept per record, as records that only differ by the embeddings drawn in
+    their image share one graph. Returns the (category, id) of the gold answers that disagree with the graph.
+    """
+    batches = {}
+    for category, id in standard_index.records:
+        if category != 'GNN':
+            continue
+        record = standard_index.get_record(category, id)
+        if len(record["conversations"]) < 6:
+            continue
+        graph = graph_cache.get(category, id)
+        question = record["conversations"][4]["value"]
+        gold = parse_embeddings(record["conversations"][5]["value"])
+        initial = parse_embeddings(question)
+        if initial is None or initial[0].max() >= graph.size:
+            graph.solutions.setdefault('gnn', {})[id] = gold
+            continue
+        # Nodes missing from the question start from a zero embedding
+        nodes, vectors = initial
+        matrix = np.zeros((graph.size, vectors.shape[1]))
+        matrix[nodes] = vectors
+        batches.setdefault((vectors.shape[1], layer_count(question)), []).append((category, id, graph, matrix, gold))
+    mismatches = []
+    for (_, layers), batch in batches.items():
+        outputs = propagate([graph for _, _, graph, _, _ in batch], [matrix for _, _, _, matrix, _ in batch], layers)
+        for (category, id, graph, _, gold), output in zip(batch, outputs):
+            expected = graph.solutions.setdefault('gnn', {})[id] = (np.arange(graph.size), output)
+            if gold is not None and not embeddings_match(gold, expected):
+                mismatches.append((category, id))
+    return mismatches
+
+@timed('validation')
+def embeddings_match(predicted, expected):
+    """Compare two parsed (node ids, matrix) pairs as arrays, e.g. '[2, 3]' and '[2.0,3.0]' are equal"""
+    if predicted is None or expected is None:
+        return False
+    return (np.array_equal(predicted[0], expected[0]) and predicted[1].shape == expected[1].shape
+            and np.allclose(predicted[1], expected[1]))
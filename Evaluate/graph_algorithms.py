@@ -0,0 +1,327 @@
+import heapq
+import re
+from instrumentation import timed
+
+INF = float('inf')
+GOLD_WEIGHT_PATTERN = re.compile(r"total weight of (\d+)")
+GOLD_FLOW_PATTERN = re.compile(r"maximum flow from node \d+ to node \d+ is (\d+)")
+GOLD_MATCHING_PATTERN = re.compile(r"(\d+) applicants can find")
+GOLD_PAIR_PATTERN = re.compile(r"applicant (\d+): job (\d+)")
+
+@timed('validation')
+def is_topological_order(graph, order):
+    """Check a topological order in O(V + E) with a node -> position map
+
+    The order must list exactly the nodes of the graph (0 to size - 1, isolated ones included), each once,
+    and the source of each edge must come before its target.
+    """
+    if len(order) != graph.size:
+        return False
+    position = [-1] * graph.size
+    for index, node in enumerate(order):
+        if not 0 <= node < graph.size or position[node] >= 0:
+            return False
+        position[node] = index
+    for u, v in zip(graph.sources, graph.targets):
+        if position[u] > position[v]:
+            return False
+    return True
+
+def shortest_distances(graph, source):
+    """Dijkstra distances from source to every node (INF if unreachable), computed once per (graph, source)"""
+    distances = graph.distances.get(source)
+    if distances is not None:
+        return distances
+    distances = [INF] * graph.size
+    distances[source] = 0
+    offsets, neighbors, weights = graph.offsets, graph.neighbors, graph.weights
+    heap = [(0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for i in range(offsets[node], offsets[node + 1]):
+            new_distance = distance + weights[i]
+            if new_distance < distances[neighbors[i]]:
+                distances[neighbors[i]] = new_distance
+                heapq.heappush(heap, (new_distance, neighbors[i]))
+    graph.distances[source] = distances
+    return distances
+
+@timed('validation')
+def is_shortest_path(graph, nodes, weight):
+    """Check that nodes is a shortest path between the queried nodes and that weight is its total weight
+
+    Uses the precomputed distances, so the check is O(path length). Without a query in the question,
+    the endpoints of the path itself are used. An undirected path may be given in either direction.
+    """
+    if not nodes:
+        return False
+    source, target = graph.query if graph.query else (nodes[0], nodes[-1])
+    if (nodes[0], nodes[-1]) != (source, target):
+        if graph.directed or (nodes[0], nodes[-1]) != (target, source):
+            return False
+    if not (0 <= source < graph.size and 0 <= target < graph.size):
+        return False
+    path_weight = graph.path_weight(nodes)
+    return path_weight is not None and path_weight == weight == shortest_distances(graph, source)[target]
+
+def neighbor_masks(graph):
+    """Adjacency of every node as an int bitset (bit v of masks[u] is set for an edge u -> v), computed once per graph"""
+    masks = graph.solutions.get('neighbor_masks')
+    if masks is None:
+        masks = [0] * graph.size
+        for u, v in zip(graph.sources, graph.targets):
+            masks[u] |= 1 << v
+            if not graph.directed:
+                masks[v] |= 1 << u
+        graph.solutions['neighbor_masks'] = masks
+    return masks
+
+@timed('validation')
+def is_hamilton_path(graph, nodes):
+    """Check in one pass that nodes visits each of the graph's nodes exactly once along edges of the graph"""
+    if len(nodes) != graph.num_nodes or not nodes:
+        return False
+    masks = neighbor_masks(graph)
+    visited = 0
+    previous = None
+    for node in nodes:
+        if not 0 <= node < graph.size or visited >> node & 1:
+            return False
+        if previous is not None and not masks[previous] >> node & 1:
+            return False
+        visited |= 1 << node
+        previous = node
+    return True
+
+@timed('validation')
+def is_simple_cycle(graph, nodes):
+    """Check in one pass that nodes is a simple cycle of the graph
+
+    The cycle may be given closed (first node repeated at the end) or open, the closing edge is checked
+    either way. No node may repeat, and an undirected cycle needs at least 3 nodes so no edge is walked twice.
+    """
+    if len(nodes) > 1 and nodes[0] == nodes[-1]:
+        nodes = nodes[:-1]
+    if len(nodes) < (2 if graph.directed else 3):
+        return False
+    masks = neighbor_masks(graph)
+    visited = 0
+    previous = nodes[-1]
+    if not 0 <= previous < graph.size:
+        return False
+    for node in nodes:
+        if not 0 <= node < graph.size or visited >> node & 1 or not masks[previous] >> node & 1:
+            return False
+        visited |= 1 << node
+        previous = node
+    return True
+
+def verify_candidates(graph, candidates, verifier):
+    """Verify many candidate answers against the same graph, e.g. the k samples of a pass@k run
+
+    Candidates are node sequences or answer strings; the graph's bitsets and solutions are built once for the
+    batch and identical candidates are only verified once. Returns one bool per candidate, in order.
+    """
+    verdicts = {}
+    results = []
+    for candidate in candidates:
+        key = candidate if isinstance(candidate, str) else tuple(candidate)
+        if key not in verdicts:
+            verdicts[key] = verifier(graph, candidate)
+        results.append(verdicts[key])
+    return results
+
+def max_flow(graph, source, sink):
+    """Maximum flow value from source to sink with Dinic's algorithm, computed once per (graph, source, sink)"""
+    key = ('max_flow', source, sink)
+    if key in graph.solutions:
+        return graph.solutions[key]
+    # Residual arcs: arc 2i is edge i with its capacity, arc 2i + 1 its reverse with capacity 0
+    arc_heads = []
+    capacities = []
+    arcs_of = [[] for _ in range(graph.size)]
+    for u, v, w in graph.edges():
+        arcs_of[u].append(len(arc_heads))
+        arc_heads.append(v)
+        capacities.append(w)
+        arcs_of[v].append(len(arc_heads))
+        arc_heads.append(u)
+        capacities.append(0)
+    flow = 0
+    while source != sink:
+        # BFS levels on the residual graph
+        level = [-1] * graph.size
+        level[source] = 0
+        queue = [source]
+        for node in queue:
+            for arc in arcs_of[node]:
+                if capacities[arc] > 0 and level[arc_heads[arc]] < 0:
+                    level[arc_heads[arc]] = level[node] + 1
+                    queue.append(arc_heads[arc])
+        if level[sink] < 0:
+            break
+        # Blocking flow with iterative DFS, next_arc keeps the current arc of every node
+        next_arc = [0] * graph.size
+        while True:
+            path = []
+            node = source
+            while node != sink:
+                arcs = arcs_of[node]
+                while next_arc[node] < len(arcs):
+                    arc = arcs[next_arc[node]]
+                    if capacities[arc] > 0 and level[arc_heads[arc]] == level[node] + 1:
+                        break
+                    next_arc[node] += 1
+                else:
+                    # Dead end, retreat one step
+                    if not path:
+                        break
+                    level[node] = -1
+                    node = arc_heads[path.pop() ^ 1]
+                    continue
+                path.append(arc)
+                node = arc_heads[arc]
+            if node != sink:
+                break
+            bottleneck = min(capacities[arc] for arc in path)
+            for arc in path:
+                capacities[arc] -= bottleneck
+                capacities[arc ^ 1] += bottleneck
+            flow += bottleneck
+    graph.solutions[key] = flow
+    return flow
+
+@timed('validation')
+def is_valid_flow(graph, source, sink, flows, value):
+    """Check a predicted flow [(u, v, f), ...] edge by edge: capacity, conservation and total value"""
+    capacities = graph.solutions.get('capacities')
+    if capacities is None:
+        # Parallel edges add up their capacities
+        capacities = {}
+        for u, v, w in graph.edges():
+            capacities[(u, v)] = capacities.get((u, v), 0) + w
+        graph.solutions['capacities'] = capacities
+    edge_flows = {}
+    for u, v, f in flows:
+        edge_flows[(u, v)] = edge_flows.get((u, v), 0) + f
+    balance = {}
+    for (u, v), f in edge_flows.items():
+        if f < 0 or f > capacities.get((u, v), 0):
+            return False
+        balance[u] = balance.get(u, 0) - f
+        balance[v] = balance.get(v, 0) + f
+    if any(amount != 0 for node, amount in balance.items() if node not in (source, sink)):
+        return False
+    return -balance.get(source, 0) == value and balance.get(sink, 0) == value
+
+def maximum_matching_size(graph):
+    """Size of a maximum matching of a bipartite graph with Hopcroft-Karp, computed once per graph
+
+    Applicants are the nodes below graph.num_applicants, jobs are the nodes from there on.
+    The (applicant, job) pairs of the matching are kept in graph.solutions['matching_pairs'].
+    """
+    if 'matching' in graph.solutions:
+        return graph.solutions['matching']
+    applicants = range(graph.num_applicants)
+    match_of = [-1] * graph.size
+    matching = 0
+    while True:
+        # BFS from the free applicants, layering the alternating paths
+        distance = {}
+        queue = [u for u in applicants if match_of[u] < 0]
+        for u in queue:
+            distance[u] = 0
+        found = False
+        for u in queue:
+            for job in graph.neighbors_of(u):
+                partner = match_of[job]
+                if partner < 0:
+                    found = True
+                elif partner not in distance:
+                    distance[partner] = distance[u] + 1
+                    queue.append(partner)
+        if not found:
+            break
+        # DFS along the layers for vertex-disjoint augmenting paths
+        for free in [u for u in applicants if match_of[u] < 0]:
+            stack = [(free, iter(graph.neighbors_of(free)))]
+            path = []
+            while stack:
+                u, jobs = stack[-1]
+                for job in jobs:
+                    partner = match_of[job]
+                    if partner < 0:
+                        path.append((u, job))
+                        stack = []
+                        break
+                    if distance.get(partner) == distance[u] + 1:
+                        path.append((u, job))
+                        stack.append((partner, iter(graph.neighbors_of(partner))))
+                        break
+                else:
+                    # No augmenting path through u in this phase
+                    distance[u] = None
+                    stack.pop()
+                    if path:
+                        path.pop()
+            if path and match_of[path[-1][1]] < 0:
+                for u, job in path:
+                    match_of[u] = job
+                    match_of[job] = u
+                matching += 1
+    graph.solutions['matching'] = matching
+    graph.solutions['matching_pairs'] = [(u, match_of[u]) for u in applicants if match_of[u] >= 0]
+    return matching
+
+@timed('validation')
+def is_valid_matching(graph, pairs, count):
+    """Check a predicted matching [(applicant, job), ...] of stated size count against the hashed edge set"""
+    applicants = set()
+    jobs = set()
+    for applicant, job in pairs:
+        if applicant in applicants or job in jobs or not graph.has_edge(applicant, job):
+            return False
+        applicants.add(applicant)
+        jobs.add(job)
+    return len(pairs) == count == maximum_matching_size(graph)
+
+def audit_gold_answers(standard_index, graph_cache):
+    """Precompute the solutions of every ShortestPath, MaximumFlow and BipartiteGraphMatching question
+
+    Returns the (category, id) of the gold answers that disagree with the solution computed from the graph.
+    """
+    mismatches = []
+    for category, id in standard_index.records:
+        if category not in ('ShortestPath', 'MaximumFlow', 'BipartiteGraphMatching'):
+            continue
+        gold_answer = standard_index.get_answer(category, id, 'segment3')
+        graph = graph_cache.get(category, id)
+        if category == 'ShortestPath':
+            gold_match = GOLD_WEIGHT_PATTERN.search(gold_answer or '')
+            if graph.query is None or gold_match is None:
+                continue
+            source, target = graph.query
+            if not (0 <= source < graph.size and 0 <= target < graph.size):
+                mismatches.append((category, id))
+            elif shortest_distances(graph, source)[target] != int(gold_match.group(1)):
+                mismatches.append((category, id))
+        elif category == 'MaximumFlow':
+            gold_match = GOLD_FLOW_PATTERN.search(gold_answer or '')
+            if graph.query is None or gold_match is None:
+                continue
+            source, sink = graph.query
+            if not (0 <= source < graph.size and 0 <= sink < graph.size):
+                mismatches.append((category, id))
+            elif max_flow(graph, source, sink) != int(gold_match.group(1)):
+                mismatches.append((category, id))
+        elif category == 'BipartiteGraphMatching':
+            gold_match = GOLD_MATCHING_PATTERN.search(gold_answer or '')
+            if gold_match is None:
+                continue
+            # The pairs must be edges under the applicant count of the graph, or the job numbering disagrees
+            gold_pairs = [(int(a), int(j)) for a, j in GOLD_PAIR_PATTERN.findall(gold_answer)]
+            if not is_valid_matching(graph, gold_pairs, int(gold_match.group(1))):
+                mismatches.append((category, id))
+    return mismatches
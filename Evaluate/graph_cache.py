@@ -0,0 +1,211 @@
+import copy
+import hashlib
+import re
+from array import array
+
+NODE_COUNT_PATTERN = re.compile(r"(\d+) nodes")
+# Matches (u, v), (u, v, w), <u, v>, <u, v, w> and (ApplX, JobY)
+EDGE_PATTERN = re.compile(r"([(<])\s*(Appl)?(\d+)\s*,\s*(?:Job)?(\d+)\s*(?:,\s*(\d+)\s*)?[)>]")
+# Query endpoints, e.g. "from node 4 to node 2" or "between node 8 and node 2"
+QUERY_PATTERN = re.compile(r"node (\d+) (?:to|and) node (\d+)")
+# (applicant, job) pairs of a BipartiteGraphMatching answer, jobs numbered after the applicants
+MATCHING_PAIR_PATTERN = re.compile(r"applicant (\d+): job (\d+)")
+
+class Graph:
+    """Ground-truth graph parsed once into CSR-style int arrays
+
+    Node ids are not always contiguous (e.g. a Connectivity graph with 8 nodes may use ids 0-8),
+    so the arrays are sized by `size`, while `num_nodes` keeps the count stated in the dataset.
+    Undirected edges are stored in both directions in the adjacency arrays.
+    """
+
+    def __init__(self, num_nodes, edges, directed, weighted, num_applicants=None, query=None):
+        self.num_nodes = num_nodes
+        self.directed = directed
+        self.weighted = weighted
+        # (source, target) of the question, if it names two nodes
+        self.query = query
+        # Shortest distances per source node and other solver results, filled by graph_algorithms
+        self.distances = {}
+        self.solutions = {}
+        # Only set for BipartiteGraphMatching, where JobY is stored as node num_applicants + Y
+        self.num_applicants = num_applicants
+        max_node = max((max(u, v) for u, v, _ in edges), default=-1)
+        self.size = max(num_nodes, max_node + 1)
+        # Edge list in dataset order
+        self.sources = array('l', (u for u, _, _ in edges))
+        self.targets = array('l', (v for _, v, _ in edges))
+        self.edge_weights = array('l', (w for _, _, w in edges))
+        # CSR adjacency: neighbors[offsets[u]:offsets[u + 1]] are the (out-)neighbors of u
+        degree = [0] * (self.size + 1)
+        for u, v, _ in edges:
+            degree[u + 1] += 1
+            if not directed:
+                degree[v + 1] += 1
+        for i in range(self.size):
+            degree[i + 1] += degree[i]
+        self.offsets = array('l', degree)
+        self.neighbors = array('l', [0]) * degree[-1]
+        self.weights = array('l', [0]) * degree[-1]
+        position = degree[:-1]
+        for u, v, w in edges:
+            self.neighbors[position[u]] = v
+            self.weights[position[u]] = w
+            position[u] += 1
+            if not directed:
+                self.neighbors[position[v]] = u
+                self.weights[position[v]] = w
+                position[v] += 1
+        # Edge index: packed int key -> weight, for O(1) membership and weight lookup
+        self.edge_index = {}
+        for u, v, w in edges:
+            self.edge_index.setdefault(self.edge_key(u, v), w)
+
+    @property
+    def num_edges(self):
+        return len(self.sources)
+
+    def edges(self):
+        """Iterate over (u, v, w) in dataset order, w is 0 for unweighted graphs"""
+        return zip(self.sources, self.targets, self.edge_weights)
+
+    def edge_key(self, u, v):
+        """Pack an edge into one int, undirected edges are normalized to (min, max)"""
+        if not self.directed and u > v:
+            u, v = v, u
+        return (u << 32) | v
+
+    def has_edge(self, u, v):
+        return self.edge_key(u, v) in self.edge_index
+
+    def edge_weight(self, u, v):
+        """Weight of the edge (u, v), or None if it is not in the graph"""
+        return self.edge_index.get(self.edge_key(u, v))
+
+    def path_weight(self, nodes):
+        """Total weight of a node sequence, or None if any step is not an edge of the graph"""
+        total_weight = 0
+        for i in range(len(nodes) - 1):
+            weight = self.edge_index.get(self.edge_key(nodes[i], nodes[i + 1]))
+            if weight is None:
+                return None
+            total_weight += weight
+        return total_weight
+
+    def with_query(self, query):
+        """The same graph asked about another query: the arrays and the solutions are shared, not copied"""
+        question = copy.copy(self)
+        question.query = query
+        return question
+
+    def neighbors_of(self, node):
+        return self.neighbors[self.offsets[node]:self.offsets[node + 1]]
+
+    def weighted_neighbors_of(self, node):
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.neighbors[start:end], self.weights[start:end])
+
+def parse_graph(record):
+    """Parse the node count and edge list of a ground-truth record into a Graph"""
+    nodes_str = record["conversations"][1]["value"]
+    edges_str = record["conversations"][3]["value"]
+    node_count_match = NODE_COUNT_PATTERN.search(nodes_str)
+    edges = []
+    directed = weighted = bipartite = False
+    for bracket, appl, u, v, w in EDGE_PATTERN.findall(edges_str):
+        directed = bracket == '<'
+        weighted = w != ''
+        bipartite = appl != ''
+        edges.append((int(u), int(v), int(w) if weighted else 0))
+    num_nodes = int(node_count_match.group(1)) if node_count_match else 0
+    num_applicants = None
+    if bipartite:
+        gold_answer = record["conversations"][5]["value"] if len(record["conversations"]) > 5 else ''
+        gold_pairs = [(int(a), int(j)) for a, j in MATCHING_PAIR_PATTERN.findall(gold_answer)]
+        num_applicants = bipartite_applicant_count(num_nodes, edges, gold_pairs)
+        edges = [(u, num_applicants + v, w) for u, v, w in edges]
+    if not node_count_match:
+        num_nodes = max((max(u, v) + 1 for u, v, _ in edges), default=0)
+    return Graph(num_nodes, edges, directed, weighted, num_applicants, parse_query(record))
+
+def parse_query(record):
+    """(source, target) named by the question of a record, or None"""
+    if len(record["conversations"]) > 4:
+        query_match = QUERY_PATTERN.search(record["conversations"][4]["value"])
+        if query_match:
+            return (int(query_match.group(1)), int(query_match.group(2)))
+    return None
+
+def graph_text_key(category, nodes_text, edges_text, question=None):
+    """Hash of the text a graph is parsed from: the node and edge turns
+
+    GNN questions list the initial embeddings, so their question is part of the key too.
+    """
+    turns = [category, nodes_text, edges_text]
+    if category == 'GNN' and question is not None:
+        turns.append(question)
+    return hashlib.sha1('\0'.join(turns).encode('utf-8')).digest()
+
+def bipartite_applicant_count(num_nodes, edges, gold_pairs=()):
+    """Number of applicants in a bipartite graph, jobs are numbered after the applicants
+
+    Isolated applicants or jobs make the split ambiguous; the offset under which every (applicant, job) pair of
+    the gold answer is an edge is preferred, then the split implied by the node count.
+    """
+    max_applicant = max((u for u, _, _ in edges), default=-1)
+    max_job = max((v for _, v, _ in edges), default=-1)
+    fewest, most = max_applicant + 1, max(max_applicant + 1, num_nodes - (max_job + 1))
+    if gold_pairs and fewest < most:
+        pairs = {(u, v) for u, v, _ in edges}
+        for offset in range(most, fewest - 1, -1):
+            if all((applicant, job - offset) in pairs for applicant, job in gold_pairs):
+                return offset
+    return most
+
+class GraphCache:
+    """Parses each ground-truth graph once and shares it between all checkers
+
+    Records with the same graph text (e.g. many Connectivity questions on one graph) share one parsed graph
+    and its solutions; each record only keeps its own query.
+    """
+
+    def __init__(self, standard_index):
+        self.standard_index = standard_index
+        self.graphs = {}
+        # graph_text_key -> the Graph parsed first from that text
+        self.shared = {}
+
+    def get(self, category, id):
+        key = (category, str(id))
+        graph = self.graphs.get(key)
+        if graph is None:
+            source = self.standard_index.graph_sources.get(key)
+            if source is not None:
+                # Columnar: only the turns of the key are decoded, the graph is built from the columns
+                dataset, position = source
+                text_key = graph_text_key(category, dataset.answer(position, 1), dataset.answer(position, 3), dataset.answer(position, 4))
+                shared = self.shared.get(text_key)
+                if shared is not None:
+                    graph = shared.with_query(dataset.query(position))
+                else:
+                    graph = self.shared[text_key] = dataset.graph(position)
+            else:
+                record = self.standard_index.get_record(category, id)
+                if record is None:
+                    return None
+                conversations = record["conversations"]
+                text_key = graph_text_key(category, conversations[1]["value"], conversations[3]["value"],
+                                          conversations[4]["value"] if len(conversations) > 4 else None)
+                shared = self.shared.get(text_key)
+                if shared is not None:
+                    graph = shared.with_query(parse_query(record))
+                else:
+                    graph = self.shared[text_key] = parse_graph(record)
+            self.graphs[key] = graph
+        return graph
+
+    def parse_all(self):
+        """Parse every graph up front, e.g. before forking worker processes"""
+        for category, id in self.standard_index.records:
+            self.get(category, id)
+        return self
@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import numpy as np
+from standard_index import category_from_path
+from graph_cache import parse_graph
+from columnar_dataset import ColumnarDataset, is_columnar_dataset, DIRECTED, WEIGHTED, NO_VALUE
+
+# Hash levels, from the strictest: the graph and the queried nodes, the weighted graph, the graph without weights
+LEVELS = ('question', 'graph', 'topology')
+# Message tags: undirected edge, message from a predecessor, message from a successor
+UNDIRECTED, FROM_PREDECESSOR, FROM_SUCCESSOR = 1, 2, 3
+TAG_MULTIPLIERS = np.array([0, 0x2545F4914F6CDD1D, 0xD6E8FEB86659FD93, 0xA0761D6478BD642F], dtype=np.uint64)
+
+def mix(values):
+    """splitmix64 finalizer on a uint64 array, arithmetic wraps around"""
+    # In place after the first copy, a large batch is mixed many times
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+def segment_sums(values, starts, ends):
+    """Sums of values[starts[i]:ends[i]], modulo 2**64"""
+    cumulative = np.zeros(len(values) + 1, dtype=np.uint64)
+    np.cumsum(values, out=cumulative[1:])
+    return cumulative[ends] - cumulative[starts]
+
+class GraphBatch:
+    """The graphs of many records as flat arrays, the nodes and edges of a graph being contiguous
+
+    Records are added from JSON files (parsed with graph_cache.parse_graph) or, without parsing anything,
+    from the columns of a converted columnar dataset. Ids are only decoded for the records that are reported.
+    """
+
+    def __init__(self):
+        self.parts = []
+        # Names of the sources (e.g. 'train' and 'test'), a source can span several input files
+        self.sources = []
+        self.categories = []
+        # Per input file: the list of ids (JSON) or the ColumnarDataset to read them from
+        self.id_readers = []
+
+    @staticmethod
+    def name_index(names, name):
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def category_index(self, category):
+        return self.name_index(self.categories, category)
+
+    def add_json(self, json_file, source):
+        with open(json_file, 'r', encoding='utf-8') as file:
+            records = json.load(file)
+        columns = {name: [] for name in ['node_count', 'edge_count', 'directed', 'weighted', 'query_source', 'query_target', 'category']}
+        edge_sources, edge_targets, edge_weights = [], [], []
+        for record in records:
+            graph = parse_graph(record)
+            columns['node_count'].append(graph.size)
+            columns['edge_count'].append(len(graph.sources))
+            columns['directed'].append(graph.directed)
+            columns['weighted'].append(graph.weighted)
+            columns['query_source'].append(graph.query[0] if graph.query else NO_VALUE)
+            columns['query_target'].append(graph.query[1] if graph.query else NO_VALUE)
+            columns['category'].append(self.category_index(category_from_path(record['image'])))
+            edge_sources.extend(graph.sources)
+            edge_targets.extend(graph.targets)
+            edge_weights.extend(graph.edge_weights)
+        part = {name: np.array(values, dtype=np.int64) for name, values in columns.items()}
+        part.update(edge_sources=np.array(edge_sources, dtype=np.int64), edge_targets=np.array(edge_targets, dtype=np.int64),
+                    edge_weights=np.array(edge_weights, dtype=np.int64))
+        self.add_part(part, source, [str(record['id']) for record in records])
+
+    def add_columnar(self, directory, source):
+        dataset = ColumnarDataset(directory)
+        offsets = np.asarray(dataset.column('edge_offsets'), dtype=np.int64)
+        flags = np.asarray(dataset.column('flags'))
+        edge_counts = np.diff(offsets)
+        part = {
+            'edge_count': edge_counts,
+            'directed': (flags & DIRECTED) > 0,
+            'weighted': (flags & WEIGHTED) > 0,
+            'query_source': np.asarray(dataset.column('query_source'), dtype=np.int64),
+            'query_target': np.asarray(dataset.column('query_target'), dtype=np.int64),
+            'category': np.array([self.category_index(category) for category in dataset.categories], dtype=np.int64)[np.asarray(dataset.column('category'))],
+            'edge_sources': np.asarray(dataset.column('edge_sources'), dtype=np.int64)[offsets[0]:offsets[-1]],
+            'edge_targets': np.asarray(dataset.column('edge_targets'), dtype=np.int64)[offsets[0]:offsets[-1]],
+            'edge_weights': np.asarray(dataset.column('edge_weights'), dtype=np.int64)[offsets[0]:offsets[-1]],
+        }
+        # Node ids may go past the stated node count (see graph_cache.Graph.size)
+        node_count = np.asarray(dataset.column('node_count'), dtype=np.int64)
+        non_empty = edge_counts > 0
+        if non_empty.any():
+            largest = np.maximum(part['edge_sources'], part['edge_targets'])
+            node_count[non_empty] = np.maximum(node_count[non_empty], np.maximum.reduceat(largest, (offsets[:-1] - offsets[0])[non_empty]) + 1)
+        part['node_count'] = node_count
+        self.add_part(part, source, dataset)
+
+    def add_part(self, part, source, id_reader):
+        part['source'] = np.full(len(part['node_count']), self.name_index(self.sources, source), dtype=np.int64)
+        part['part'] = np.full(len(part['node_count']), len(self.id_readers), dtype=np.int64)
+        part['position'] = np.arange(len(part['node_count']), dtype=np.int64)
+        self.parts.append(part)
+        self.id_readers.append(id_reader)
+
+    def finalize(self):
+        """Concatenate the parts, returns self"""
+        for name in self.parts[0]:
+            setattr(self, name, np.concatenate([part[name] for part in self.parts]))
+        self.parts = []
+        self.node_offsets = np.zeros(len(self.node_count) + 1, dtype=np.int64)
+        np.cumsum(self.node_count, out=self.node_offsets[1:])
+        self.edge_offsets = np.zeros(len(self.edge_count) + 1, dtype=np.int64)
+        np.cumsum(self.edge_count, out=self.edge_offsets[1:])
+        return self
+
+    def __len__(self):
+        return len(self.node_count)
+
+    def describe(self, record):
+        """Source, category and id of a record"""
+        id_reader = self.id_readers[self.part[record]]
+        position = int(self.position[record])
+        id = id_reader[position] if isinstance(id_reader, list) else id_reader.text('id', position)
+        return {'source': self.sources[self.source[record]], 'category': self.categories[self.category[record]], 'id': id}
+
+def message_layout(batch):
+    """Messages of the WL refinement, sorted by receiving node once for all levels and iterations
+
+    Every edge sends a message each way. Returns (senders, message edge index, tags, starts, ends, mixed
+    edge weights), where the messages received by node v are starts[v]:ends[v].
+    """
+    edge_graph = np.repeat(np.arange(len(batch), dtype=np.int64), batch.edge_count)
+    sources = batch.edge_sources + batch.node_offsets[:-1][edge_graph]
+    targets = batch.edge_targets + batch.node_offsets[:-1][edge_graph]
+    directed = batch.directed[edge_graph]
+    receivers = np.concatenate([targets, sources])
+    order = np.argsort(receivers, kind='stable')
+    senders = np.concatenate([sources, targets])[order]
+    edges = np.concatenate([np.arange(len(sources))] * 2)[order]
+    tags = np.concatenate([np.where(directed, FROM_PREDECESSOR, UNDIRECTED), np.where(directed, FROM_SUCCESSOR, UNDIRECTED)])[order]
+    counts = np.bincount(receivers, minlength=int(batch.node_offsets[-1]))
+    ends = np.cumsum(counts)
+    # Weights of the unweighted graphs are ignored
+    mixed_weights = mix(np.where(batch.weighted[edge_graph], batch.edge_weights, 0).astype(np.uint64))
+    return senders, edges, tags, ends - counts, ends, mixed_weights
+
+def wl_labels(batch, layout, iterations=3, weights=True, query=True):
+    """Weisfeiler-Lehman node labels of every graph of the batch after each iteration, as uint64 arrays
+
+    All graphs are refined at once: a node's new label hashes its label with the multiset of the labels of
+    its neighbors, each combined with the edge weight and direction (a multiset is hashed as a sum of mixed
+    values). With `query` the queried source and target nodes start with their own labels.
+    """
+    senders, edges, tags, starts, ends, mixed_weights = layout
+    # Odd multipliers, so each message is a bijection of the sender's (already mixed) label
+    multipliers = TAG_MULTIPLIERS[tags]
+    if weights:
+        multipliers ^= mixed_weights[edges] << np.uint64(1)
+    label = np.zeros(len(ends), dtype=np.uint64)
+    if query:
+        for endpoint, tag in ((batch.query_source, 1), (batch.query_target, 2)):
+            has_query = (endpoint >= 0) & (endpoint < batch.node_count)
+            label[batch.node_offsets[:-1][has_query] + endpoint[has_query]] ^= np.uint64(tag)
+    label = mix(label)
+    labels = []
+    for _ in range(iterations):
+        neighborhood = segment_sums(label[senders] * multipliers, starts, ends)
+        label = mix(label * np.uint64(0x632BE59BD9B4E019) + neighborhood)
+        labels.append(label)
+    return labels
+
+def graph_hashes(batch, label, weights=True):
+    """Hash of every graph: the multiset of its node labels, its size and whether it is directed (and weighted)"""
+    node_sums = segment_sums(mix(label), batch.node_offsets[:-1], batch.node_offsets[1:])
+    shape = (batch.node_count.astype(np.uint64) << np.uint64(34)) ^ (batch.edge_count.astype(np.uint64) << np.uint64(2))
+    shape ^= batch.directed.astype(np.uint64) ^ ((batch.weighted & weights).astype(np.uint64) << np.uint64(1))
+    return mix(node_sums ^ mix(shape))
+
+def structural_hashes(batch, iterations=3):
+    """{level: uint64 hash per record} for the question, graph and topology levels, and the topology node labels"""
+    layout = message_layout(batch)
+    hashes = {}
+    hashes['question'] = graph_hashes(batch, wl_labels(batch, layout, iterations, weights=True, query=True)[-1])
+    hashes['graph'] = graph_hashes(batch, wl_labels(batch, layout, iterations, weights=True, query=False)[-1])
+    topology_labels = wl_labels(batch, layout, iterations, weights=False, query=False)
+    hashes['topology'] = graph_hashes(batch, topology_labels[-1], weights=False)
+    return hashes, topology_labels
+
+def clusters_of(keys):
+    """(cluster id per record, or -1 when its key is unique, and the number of clusters)"""
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    shared = counts[inverse] > 1
+    cluster = np.full(len(keys), -1, dtype=np.int64)
+    shared_keys, cluster[shared] = np.unique(inverse[shared], return_inverse=True)
+    return cluster, len(shared_keys)
+
+def connected_components(count, left, right):
+    """Component label (smallest member) of every element, given the pairs that are connected
+
+    Vectorized min-label propagation with pointer jumping, no Python loop over the pairs.
+    """
+    component = np.arange(count)
+    while True:
+        previous = component.copy()
+        smallest = np.minimum(component[left], component[right])
+        np.minimum.at(component, left, smallest)
+        np.minimum.at(component, right, smallest)
+        component = component[component]
+        if np.array_equal(component, previous):
+            return component
+
+def minhash_signatures(batch, labels, num_perm=32, seed=0):
+    """MinHash signature of the multiset of node labels of every graph, shape (records, num_perm)
+
+    The k-th occurrence of a label within a graph is a separate feature, so the estimated Jaccard similarity
+    is that of the label multisets.
+    """
+    node_graph = np.repeat(np.arange(len(batch), dtype=np.uint64), batch.node_count)
+    if len(batch) < 1 << 24:
+        # One sort of (graph, top 40 bits of the label) keys is much cheaper than a lexsort of both
+        sorted_labels = np.sort((node_graph << np.uint64(40)) | (labels >> np.uint64(24))) & np.uint64((1 << 40) - 1)
+    else:
+        sorted_labels = labels[np.lexsort((labels, node_graph))]
+    # Either way graphs stay contiguous and in order, so node_offsets still delimit them
+    positions = np.arange(len(sorted_labels))
+    run_start = np.ones(len(sorted_labels), dtype=bool)
+    run_start[1:] = sorted_labels[1:] != sorted_labels[:-1]
+    run_start[batch.node_offsets[:-1][batch.node_count > 0]] = True
+    run_first = np.maximum.accumulate(np.where(run_start, positions, 0))
+    features = mix(sorted_labels ^ mix((positions - run_first).astype(np.uint64)))
+    non_empty = batch.node_count > 0
+    starts = batch.node_offsets[:-1][non_empty]
+    # Permutation-major, so every permutation writes one contiguous row; graphs without nodes keep the maximum
+    signatures = np.full((num_perm, len(batch)), np.iinfo(np.uint64).max, dtype=np.uint64)
+    # The features are already mixed, an xor and an odd multiplier make each permutation
+    seeds = mix(np.arange(2 * num_perm, dtype=np.uint64) + np.uint64(seed))
+    seeds[num_perm:] |= np.uint64(1)
+    hashed = np.empty_like(features)
+    for permutation in range(num_perm):
+        np.multiply(np.bitwise_xor(features, seeds[permutation], out=hashed), seeds[num_perm + permutation], out=hashed)
+        minimum = np.minimum.reduceat(hashed, starts) if len(starts) else hashed[:0]
+        if len(starts) == len(batch):
+            signatures[permutation] = minimum
+        else:
+            signatures[permutation, non_empty] = minimum
+    return signatures.T
+
+def near_duplicate_clusters(signatures, bands=8, threshold=0.8):
+    """Cluster id per record (-1 if none) from MinHash LSH: records sharing a band bucket are candidates,
+    and are joined when their signatures agree on at least `threshold` of the positions
+    """
+    rows = signatures.shape[1] // bands
+    # The record index goes in the low bits of the bucket key, so a plain sort gives the bucket order
+    index_bits = max(1, (len(signatures) - 1).bit_length())
+    index_mask = np.uint64((1 << index_bits) - 1)
+    indices = np.arange(len(signatures), dtype=np.uint64)
+    left, right = [], []
+    for band in range(bands):
+        band_key = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            band_key = mix(band_key ^ signatures[:, column])
+        # Neighbours in bucket order are candidate pairs, each bucket becomes a chain
+        packed = np.sort((band_key & ~index_mask) | indices)
+        same_bucket = (packed[1:] & ~index_mask) == (packed[:-1] & ~index_mask)
+        order = (packed & index_mask).astype(np.int64)
+        left.append(order[:-1][same_bucket])
+        right.append(order[1:][same_bucket])
+    left, right = np.concatenate(left), np.concatenate(right)
+    similar = (signatures[left] == signatures[right]).mean(axis=1) >= threshold
+    component = connected_components(len(signatures), left[similar], right[similar])
+    return clusters_of(component)
+
+def cluster_report(batch, cluster, count, max_clusters):
+    """Summary of the clusters of one level, and the members of the largest clusters that span several sources"""
+    members = cluster >= 0
+    # Clusters holding records of more than one source (e.g. train and test) are contamination
+    pairs = np.unique(np.stack([cluster[members], batch.source[members]]), axis=1)
+    sources_per_cluster = np.bincount(pairs[0], minlength=count)
+    mixed = members.copy()
+    mixed[members] = sources_per_cluster[cluster[members]] > 1
+    report = {
+        'clusters': count,
+        'duplicate_records': int(members.sum()),
+        'cross_source_clusters': int((sources_per_cluster > 1).sum()),
+        'contaminated_records': {source: int((mixed & (batch.source == index)).sum()) for index, source in enumerate(batch.sources)},
+    }
+    sizes = np.bincount(cluster[members], minlength=count)
+    # Clusters across sources first, then the largest
+    listed = [int(c) for c in np.lexsort((-sizes, sources_per_cluster <= 1))[:max_clusters]]
+    order = np.argsort(cluster, kind='stable')
+    bounds = np.searchsorted(cluster[order], listed), np.searchsorted(cluster[order], listed, side='right')
+    report['examples'] = [[batch.describe(record) for record in order[start:end]] for start, end in zip(*bounds)]
+    return report
+
+def source_name(path):
+    """'train' or 'test' from a Dataset/<Cat>/{train,test}.json path or a columnar directory name, else the path"""
+    name = os.path.basename(os.path.normpath(path))
+    for split in ('train', 'test'):
+        if split in name:
+            return split
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate graphs within and across dataset splits")
+    parser.add_argument("--inputs", nargs='+', required=True, help="Dataset/*/{train,test}.json files or columnar dataset directories")
+    parser.add_argument("--iterations", type=int, default=3, help="Weisfeiler-Lehman iterations")
+    parser.add_argument("--num-perm", type=int, default=32, help="MinHash permutations for the near duplicates (0 to skip)")
+    parser.add_argument("--bands", type=int, default=8, help="LSH bands, num-perm / bands rows each")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard similarity of the node label multisets for near duplicates")
+    parser.add_argument("--examples", type=int, default=20, help="Clusters listed per level, those spanning several sources first")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    batch = GraphBatch()
+    for path in args.inputs:
+        if is_columnar_dataset(path):
+            batch.add_columnar(path, source_name(path))
+        else:
+            batch.add_json(path, source_name(path))
+    batch.finalize()
+    hashes, topology_labels = structural_hashes(batch, args.iterations)
+    report = {'records': len(batch), 'levels': {}}
+    for level in LEVELS:
+        report['levels'][level] = cluster_report(batch, *clusters_of(hashes[level]), args.examples)
+    if args.num_perm:
+        # Labels after two iterations: one changed edge only changes the labels near it
+        signatures = minhash_signatures(batch, topology_labels[min(1, len(topology_labels) - 1)], args.num_perm)
+        report['levels']['near_duplicate'] = cluster_report(batch, *near_duplicate_clusters(signatures, args.bands, args.threshold), args.examples)
+    for level, level_report in report['levels'].items():
+        print(f"{level}: {level_report['clusters']} clusters, {level_report['duplicate_records']} records, "
+              f"{level_report['cross_source_clusters']} clusters across sources, contaminated records {level_report['contaminated_records']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
@@ -0,0 +1,453 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from standard_index import load_standard_index, category_from_path
+from graph_cache import GraphCache
+from gnn_layers import parse_embeddings
+from parallel_eval import score_in_order
+
+# Bump whenever the drawing changes, so cached images are rendered again
+RENDERER_VERSION = 1
+LAYOUTS = ('auto', 'circular', 'spring', 'random', 'bipartite')
+DEFAULT_STYLE = {
+    'size': 640,
+    'margin': 40,
+    'node_radius': 16,
+    'edge_width': 2.0,
+    'arrow_size': 12,
+    'font_scale': 2,
+    'background': [255, 255, 255],
+    'node_color': [173, 216, 230],
+    'node_border': [40, 40, 40],
+    'edge_color': [60, 60, 60],
+    'label_color': [0, 0, 0],
+    'weight_color': [200, 30, 30],
+}
+# 5x7 bitmap glyphs of the characters in node labels, weights and GNN embeddings
+FONT = {
+    '0': ['01110', '10001', '10011', '10101', '11001', '10001', '01110'],
+    '1': ['00100', '01100', '00100', '00100', '00100', '00100', '01110'],
+    '2': ['01110', '10001', '00001', '00010', '00100', '01000', '11111'],
+    '3': ['11110', '00001', '00001', '01110', '00001', '00001', '11110'],
+    '4': ['00010', '00110', '01010', '10010', '11111', '00010', '00010'],
+    '5': ['11111', '10000', '11110', '00001', '00001', '10001', '01110'],
+    '6': ['00110', '01000', '10000', '11110', '10001', '10001', '01110'],
+    '7': ['11111', '00001', '00010', '00100', '01000', '01000', '01000'],
+    '8': ['01110', '10001', '10001', '01110', '10001', '10001', '01110'],
+    '9': ['01110', '10001', '10001', '01111', '00001', '00010', '01100'],
+    'A': ['01110', '10001', '10001', '11111', '10001', '10001', '10001'],
+    'J': ['00111', '00010', '00010', '00010', '00010', '10010', '01100'],
+    'b': ['10000', '10000', '10110', '11001', '10001', '10001', '11110'],
+    'l': ['01100', '00100', '00100', '00100', '00100', '00100', '01110'],
+    'o': ['00000', '00000', '01110', '10001', '10001', '10001', '01110'],
+    'p': ['00000', '11110', '10001', '10001', '11110', '10000', '10000'],
+    'e': ['00000', '00000', '01110', '10001', '11111', '10000', '01110'],
+    '[': ['01110', '01000', '01000', '01000', '01000', '01000', '01110'],
+    ']': ['01110', '00010', '00010', '00010', '00010', '00010', '01110'],
+    ',': ['00000', '00000', '00000', '00000', '01100', '00100', '01000'],
+    '.': ['00000', '00000', '00000', '00000', '00000', '01100', '01100'],
+    '-': ['00000', '00000', '00000', '11111', '00000', '00000', '00000'],
+    '+': ['00000', '00100', '00100', '11111', '00100', '00100', '00000'],
+}
+GLYPHS = {character: np.array([[bit == '1' for bit in row] for row in rows]) for character, rows in FONT.items()}
+
+def drawn_nodes(graph):
+    """Nodes to draw: all of them, or when the ids are not contiguous the nodes of the edges and the lowest
+    unused ids up to the stated node count"""
+    if graph.size == graph.num_nodes or graph.num_applicants is not None:
+        return list(range(graph.size))
+    nodes = set(graph.sources) | set(graph.targets)
+    for node in range(graph.size):
+        if len(nodes) >= graph.num_nodes:
+            break
+        nodes.add(node)
+    return sorted(nodes)
+
+def node_label(graph, node):
+    if graph.num_applicants is None:
+        return str(node)
+    return f"Appl{node}" if node < graph.num_applicants else f"Job{node - graph.num_applicants}"
+
+def initial_embeddings(record):
+    """[node, label] of the initial embeddings listed by the question of a GNN record, e.g. [3, '[2,3]']
+
+    None if the question does not list them: they are then only drawn in the original image.
+    """
+    conversations = record["conversations"]
+    parsed = parse_embeddings(conversations[4]["value"]) if len(conversations) > 4 else None
+    if parsed is None:
+        return None
+    nodes, vectors = parsed
+    return [[int(node), '[' + ','.join(f'{value:g}' for value in vector) + ']'] for node, vector in zip(nodes, vectors)]
+
+def graph_spec(graph, embeddings=None):
+    """Canonical description of what is drawn, the content that is hashed"""
+    spec = {'nodes': drawn_nodes(graph), 'directed': graph.directed, 'weighted': graph.weighted,
+            'num_applicants': graph.num_applicants, 'edges': [list(edge) for edge in graph.edges()]}
+    if embeddings is not None:
+        spec['embeddings'] = embeddings
+    return spec
+
+def content_key(graph, layout, style, seed, embeddings=None):
+    payload = {'version': RENDERER_VERSION, 'graph': graph_spec(graph, embeddings), 'layout': layout, 'style': style, 'seed': seed}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+def spring_layout(count, edges, rng, iterations=60):
+    """Fruchterman-Reingold force-directed positions, all pairwise forces at once (O(n^2) per iteration)"""
+    positions = rng.random((count, 2))
+    if count < 2:
+        return positions
+    optimal = 1 / np.sqrt(count)
+    temperature = 0.1
+    for _ in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01)
+        # Every pair repels with k^2 / d, the ends of every edge attract with d^2 / k
+        force = (delta * (optimal ** 2 / distance ** 2)[..., None]).sum(axis=1)
+        if len(edges):
+            edge_delta = positions[edges[:, 0]] - positions[edges[:, 1]]
+            pull = edge_delta * (np.linalg.norm(edge_delta, axis=1) / optimal)[:, None]
+            np.add.at(force, edges[:, 0], -pull)
+            np.add.at(force, edges[:, 1], pull)
+        length = np.maximum(np.linalg.norm(force, axis=1), 1e-9)
+        positions += force * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= 0.1 / (iterations + 1)
+    return positions
+
+def layout_positions(graph, nodes, layout, rng):
+    """Positions of the drawn nodes, scaled to the unit square"""
+    index = {node: position for position, node in enumerate(nodes)}
+    count = len(nodes)
+    if layout == 'auto':
+        layout = 'bipartite' if graph.num_applicants is not None else 'spring'
+    if layout == 'circular':
+        angle = 2 * np.pi * np.arange(count) / max(count, 1)
+        positions = np.stack([np.cos(angle), np.sin(angle)], axis=1)
+    elif layout == 'random':
+        positions = rng.random((count, 2))
+    elif layout == 'bipartite':
+        applicants = graph.num_applicants if graph.num_applicants is not None else (count + 1) // 2
+        column = np.array([0.0 if node < applicants else 1.0 for node in nodes])
+        row = np.zeros(count)
+        for side in (0.0, 1.0):
+            members = np.flatnonzero(column == side)
+            row[members] = np.arange(len(members)) / max(len(members) - 1, 1)
+        positions = np.stack([column, row], axis=1)
+    else:
+        edges = np.array([(index[u], index[v]) for u, v in zip(graph.sources, graph.targets) if u != v], dtype=np.int64).reshape(-1, 2)
+        positions = spring_layout(count, edges, rng)
+    if count == 0:
+        return positions.reshape(0, 2)
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    # Same scale on both axes, centered
+    span = max(float((high - low).max()), 1e-9)
+    return (positions - low) / span + (1 - (high - low) / span) / 2
+
+def blend(canvas, top, left, alpha, color):
+    """Blend color into the canvas window at (top, left) with per-pixel coverage alpha"""
+    height, width = alpha.shape
+    window = canvas[top:top + height, left:left + width]
+    alpha = alpha[:window.shape[0], :window.shape[1], None]
+    window[:] = (window * (1 - alpha) + np.asarray(color) * alpha + 0.5).astype(np.uint8)
+
+def composite(canvas, layer, color):
+    """Blend color into the whole canvas with the coverage layer, only where it is non-zero"""
+    covered = np.flatnonzero(layer)
+    alpha = layer.ravel()[covered][:, None]
+    pixels = canvas.reshape(-1, 3)
+    pixels[covered] = (pixels[covered] * (1 - alpha) + np.asarray(color) * alpha + 0.5).astype(np.uint8)
+
+def pixel_grid(shape, low, high):
+    """Pixel-center coordinates of the window of an image of `shape` covering the box [low, high], and its corner"""
+    top, left = max(int(np.floor(low[1])), 0), max(int(np.floor(low[0])), 0)
+    bottom, right = min(int(np.ceil(high[1])) + 1, shape[0]), min(int(np.ceil(high[0])) + 1, shape[1])
+    if bottom <= top or right <= left:
+        return None
+    y, x = np.mgrid[top:bottom, left:right] + 0.5
+    return x, y, top, left
+
+def segment_coverage(layer, starts, ends, width):
+    """Add a batch of anti-aliased segments to a coverage layer (max of the coverages)
+
+    Every segment is walked along its major axis and only the few pixels across it are evaluated, so the cost
+    is proportional to the drawn length rather than to the bounding box; all segments are done at once.
+    """
+    if not len(starts):
+        return
+    direction = ends - starts
+    steep = np.abs(direction[:, 1]) > np.abs(direction[:, 0])
+    # (major, minor) coordinates, major being the axis the segment advances most along
+    major_axis = steep.astype(np.int64)
+    start_major, end_major = starts[np.arange(len(starts)), major_axis], ends[np.arange(len(starts)), major_axis]
+    start_minor, end_minor = starts[np.arange(len(starts)), 1 - major_axis], ends[np.arange(len(starts)), 1 - major_axis]
+    reach = int(np.ceil(width / 2 + 1))
+    first = np.floor(np.minimum(start_major, end_major)).astype(np.int64) - reach
+    steps = np.floor(np.maximum(start_major, end_major)).astype(np.int64) + reach - first + 1
+    segment = np.repeat(np.arange(len(starts)), steps)
+    major = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps) + first[segment]
+    slope = (end_minor - start_minor) / np.where(end_major != start_major, end_major - start_major, 1)
+    minor_center = start_minor[segment] + (np.clip(major + 0.5, np.minimum(start_major, end_major)[segment],
+                                                   np.maximum(start_major, end_major)[segment]) - start_major[segment]) * slope[segment]
+    # The pixels across every major step
+    offsets = np.arange(-reach, reach + 1)
+    minor = (np.floor(minor_center)[:, None] + offsets).ravel()
+    major = np.repeat(major, len(offsets))
+    segment = np.repeat(segment, len(offsets))
+    steep = steep[segment]
+    x, y = np.where(steep, minor, major), np.where(steep, major, minor)
+    inside = (x >= 0) & (x < layer.shape[1]) & (y >= 0) & (y < layer.shape[0])
+    x, y, segment = x[inside], y[inside], segment[inside]
+    # Distance of the pixel centers to their segment
+    point_x, point_y = x + 0.5 - starts[segment, 0], y + 0.5 - starts[segment, 1]
+    length2 = np.maximum((direction ** 2).sum(axis=1), 1e-9)[segment]
+    t = np.clip((point_x * direction[segment, 0] + point_y * direction[segment, 1]) / length2, 0, 1)
+    distance = np.hypot(point_x - t * direction[segment, 0], point_y - t * direction[segment, 1])
+    alpha = np.clip(width / 2 + 0.5 - distance, 0, 1)
+    covered = alpha > 0
+    np.maximum.at(layer.ravel(), (y[covered] * layer.shape[1] + x[covered]).astype(np.int64), alpha[covered])
+
+def disc_coverage(shape, center, radius, ring=None):
+    """(alpha, top, left) window of an anti-aliased filled disc, or of a ring of width `ring`"""
+    grid = pixel_grid(shape, np.asarray(center) - radius - 1, np.asarray(center) + radius + 1)
+    if grid is None:
+        return None
+    x, y, top, left = grid
+    distance = np.hypot(x - center[0], y - center[1])
+    if ring is None:
+        return np.clip(radius + 0.5 - distance, 0, 1), top, left
+    return np.clip(ring / 2 + 0.5 - np.abs(distance - radius + ring / 2), 0, 1), top, left
+
+def triangle_coverage(layer, corners):
+    """Add a batch of anti-aliased filled triangles, corners of shape (triangles, 3, 2), to a coverage layer
+
+    Coverage comes from the smallest signed distance of a pixel to the sides; every triangle is evaluated on a
+    window of the same size, so the whole batch is one array operation.
+    """
+    if not len(corners):
+        return
+    # Counter-clockwise order, so the inside is to the left of every side
+    first, second = corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    clockwise = first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0] < 0
+    corners = np.where(clockwise[:, None, None], corners[:, ::-1], corners)
+    low = np.floor(corners.min(axis=1)).astype(np.int64) - 1
+    extent = int(np.ceil((corners.max(axis=1) - corners.min(axis=1)).max())) + 3
+    offsets = np.arange(extent)
+    # (triangles, extent, extent) pixel coordinates of every window
+    x = low[:, 0, None, None] + offsets[None, None, :]
+    y = low[:, 1, None, None] + offsets[None, :, None]
+    inside = np.full((len(corners), extent, extent), np.inf)
+    for side in range(3):
+        a, b = corners[:, side], corners[:, (side + 1) % 3]
+        normal = np.stack([a[:, 1] - b[:, 1], b[:, 0] - a[:, 0]], axis=1)
+        normal /= np.maximum(np.hypot(normal[:, 0], normal[:, 1]), 1e-9)[:, None]
+        distance = (x + 0.5 - a[:, 0, None, None]) * normal[:, 0, None, None] + (y + 0.5 - a[:, 1, None, None]) * normal[:, 1, None, None]
+        np.minimum(inside, distance, out=inside)
+    alpha = np.clip(inside + 0.5, 0, 1)
+    x, y = np.broadcast_to(x, alpha.shape), np.broadcast_to(y, alpha.shape)
+    covered = (alpha > 0) & (x >= 0) & (x < layer.shape[1]) & (y >= 0) & (y < layer.shape[0])
+    np.maximum.at(layer.ravel(), y[covered] * layer.shape[1] + x[covered], alpha[covered])
+
+def add_coverage(layer, coverage):
+    if coverage is not None:
+        alpha, top, left = coverage
+        window = layer[top:top + alpha.shape[0], left:left + alpha.shape[1]]
+        np.maximum(window, alpha[:window.shape[0], :window.shape[1]], out=window)
+
+def draw_disc(canvas, center, radius, color):
+    coverage = disc_coverage(canvas.shape, center, radius)
+    if coverage is not None:
+        blend(canvas, coverage[1], coverage[2], coverage[0], color)
+
+def draw_text(canvas, text, center, scale, color, background=None):
+    """Bitmap text centered on a point, optionally on a filled box"""
+    glyphs = [GLYPHS[character] for character in text if character in GLYPHS]
+    if not glyphs:
+        return
+    # One column of spacing between the glyphs
+    bitmap = np.concatenate([np.pad(glyph, ((0, 0), (0, 1))) for glyph in glyphs], axis=1)[:, :-1]
+    bitmap = np.kron(bitmap, np.ones((scale, scale), dtype=bool))
+    height, width = bitmap.shape
+    top, left = int(round(center[1] - height / 2)), int(round(center[0] - width / 2))
+    if background is not None:
+        box_top, box_left = max(top - scale, 0), max(left - scale, 0)
+        canvas[box_top:top + height + scale, box_left:left + width + scale] = background
+    # Clip to the canvas
+    crop_top, crop_left = max(-top, 0), max(-left, 0)
+    bitmap = bitmap[crop_top:, crop_left:]
+    top, left = top + crop_top, left + crop_left
+    window = canvas[top:top + bitmap.shape[0], left:left + bitmap.shape[1]]
+    window[bitmap[:window.shape[0], :window.shape[1]]] = color
+
+def text_width(text, scale):
+    return (6 * len(text) - 1) * scale
+
+def render(graph, layout='auto', style=None, rng=None, embeddings=None):
+    """Draw a graph into an RGB uint8 array: edges, arrowheads of directed edges, weights at the edge midpoints,
+    labeled nodes on top and the [node, label] embeddings of a GNN graph under their nodes"""
+    style = dict(DEFAULT_STYLE, **(style or {}))
+    rng = rng if rng is not None else np.random.default_rng(0)
+    size, scale = style['size'], style['font_scale']
+    canvas = np.empty((size, size, 3), dtype=np.uint8)
+    canvas[:] = style['background']
+    nodes = drawn_nodes(graph)
+    labels = [node_label(graph, node) for node in nodes]
+    # Nodes grow to fit their label
+    radius = max([style['node_radius']] + [text_width(label, scale) / 2 + 2 * scale for label in labels])
+    positions = layout_positions(graph, nodes, layout, rng)
+    if 1 < len(nodes) <= 4096 and (layout in ('circular', 'bipartite') or (layout == 'auto' and graph.num_applicants is not None)):
+        # Evenly spaced layouts: shrink the nodes so neighbors keep a gap (long labels may stick out)
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        np.fill_diagonal(distance, np.inf)
+        spacing = float(distance.min())
+        # 2 * radius <= 0.9 * spacing * (size - 2 * (margin + radius))
+        radius = max(min(radius, 0.45 * spacing * (size - 2 * style['margin']) / (1 + 0.9 * spacing)), 4)
+    inner = size - 2 * (style['margin'] + radius)
+    points = style['margin'] + radius + positions * inner
+    node_index = np.zeros(graph.size, dtype=np.int64)
+    node_index[nodes] = np.arange(len(nodes))
+    sources, targets = np.asarray(graph.sources, dtype=np.int64), np.asarray(graph.targets, dtype=np.int64)
+    starts, ends = points[node_index[sources]].reshape(-1, 2), points[node_index[targets]].reshape(-1, 2)
+    # All edges and arrowheads go into one coverage layer, composited once
+    layer = np.zeros((size, size))
+    loops = sources == targets
+    for center in starts[loops]:
+        # Self-loop: a ring above the node
+        add_coverage(layer, disc_coverage(layer.shape, center - (0, radius), radius * 0.7, ring=style['edge_width']))
+    midpoints = (starts + ends) / 2
+    starts, ends = starts[~loops], ends[~loops]
+    if graph.directed:
+        direction = ends - starts
+        direction /= np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-9)[:, None]
+        normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1) * style['arrow_size'] / 2
+        # Edges in both directions are moved apart, each to its own side
+        pairs = sources[~loops] * graph.size + targets[~loops]
+        shift = normal * np.isin(targets[~loops] * graph.size + sources[~loops], pairs)[:, None] * 0.8
+        starts, ends = starts + shift, ends + shift
+        # Their weights further out than the lines, so the two labels do not overlap
+        midpoints[~loops] += shift * 2.5
+        tips = ends - direction * radius
+        # The line stops at the base of the arrowhead
+        ends = tips - direction * style['arrow_size']
+        triangle_coverage(layer, np.stack([tips, ends + normal, ends - normal], axis=1))
+    segment_coverage(layer, starts, ends, style['edge_width'])
+    composite(canvas, layer, style['edge_color'])
+    if graph.weighted:
+        for weight, point in zip(graph.edge_weights, midpoints):
+            draw_text(canvas, str(weight), point, scale, style['weight_color'], style['background'])
+    for label, point in zip(labels, points):
+        draw_disc(canvas, point, radius, style['node_border'])
+        draw_disc(canvas, point, radius - 1.5, style['node_color'])
+        # On a box of the node color, for labels wider than the node
+        draw_text(canvas, label, point, scale, style['label_color'], style['node_color'])
+    for node, label in embeddings or []:
+        if node < graph.size:
+            draw_text(canvas, label, points[node_index[node]] + (0, radius + 6 * scale), scale, style['label_color'], style['background'])
+    return canvas
+
+def encode_png(canvas, level=6):
+    """PNG bytes of an RGB uint8 array, with the standard library only"""
+    height, width, _ = canvas.shape
+    # Filter type 0 (none) in front of every row
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = canvas.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) + chunk(b'IEND', b''))
+
+def render_task(task):
+    """Render one image and write it atomically, run in the worker processes"""
+    path, graph, layout, style, key, compression, embeddings = task
+    canvas = render(graph, layout, style, np.random.default_rng(int(key[:16], 16)), embeddings)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(encode_png(canvas, compression))
+    os.replace(temporary_path, path)
+    return path
+
+def image_path(output_dir, category, key):
+    """Content-addressed image path; the file name starts with the category, as category_from_path expects"""
+    return os.path.join(output_dir, category, f'{category}_{key[:32]}.png')
+
+def render_records(records, graph_cache, output_dir, layout='auto', style=None, seed=0, workers=1, batch_size=16, compression=6):
+    """Render the graph of every record into output_dir, skipping images that already exist
+
+    Returns ({(category, id): image path}, stats). Records with the same graph, layout and style share one image.
+    GNN records are skipped when their question does not list the initial embeddings, as the image could not
+    show them; they are counted in stats['skipped'] and have no path.
+    """
+    style = dict(DEFAULT_STYLE, **(style or {}))
+    paths = {}
+    tasks = {}
+    skipped = 0
+    for record in records:
+        category = category_from_path(record['image'])
+        embeddings = initial_embeddings(record) if category == 'GNN' else None
+        if category == 'GNN' and embeddings is None:
+            skipped += 1
+            continue
+        graph = graph_cache.get(category, record['id'])
+        key = content_key(graph, layout, style, seed, embeddings)
+        path = paths[(category, str(record['id']))] = image_path(output_dir, category, key)
+        if path not in tasks and not os.path.exists(path):
+            tasks[path] = (path, graph, layout, style, key, compression, embeddings)
+    start = time.perf_counter()
+    rendered = sum(1 for _ in score_in_order(render_task, tasks.values(), workers, batch_size))
+    elapsed = time.perf_counter() - start
+    stats = {
+        'records': len(paths),
+        'images': len(set(paths.values())),
+        'rendered': rendered,
+        'cached': len(set(paths.values())) - rendered,
+        'skipped': skipped,
+        'seconds': elapsed,
+        'images_per_second': rendered / elapsed if elapsed > 0 else 0.0,
+    }
+    return paths, stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the graph images of dataset records into a content-addressed cache")
+    parser.add_argument("--dataset", nargs='+', required=True, help="Dataset/*/{train,test}.json files or columnar dataset directories, each indexed on its own (ids repeat across splits)")
+    parser.add_argument("--output-dir", default="rendered", help="Images are written to OUTPUT_DIR/<category>/<category>_<hash>.png")
+    parser.add_argument("--layout", default="auto", choices=LAYOUTS, help="auto: bipartite for BipartiteGraphMatching, spring otherwise")
+    parser.add_argument("--size", type=int, default=DEFAULT_STYLE['size'], help="Image width and height in pixels")
+    parser.add_argument("--style", default=None, help="JSON object overriding the drawing style, e.g. '{\"node_radius\": 20}'")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the spring and random layouts")
+    parser.add_argument("--workers", type=int, default=1, help="Rendering processes")
+    parser.add_argument("--compression", type=int, default=6, help="zlib level of the PNG files, 1 is about twice as fast and ~20%% larger")
+    parser.add_argument("--output", nargs='+', default=None, help="Write the records of every --dataset file, in order, as a dataset JSON file with their image paths replaced")
+    parser.add_argument("--image-root", default=None, help="Directory the written image paths are relative to (default: parent of --output-dir)")
+    args = parser.parse_args()
+    if args.output and len(args.output) != len(args.dataset):
+        parser.error("--output needs one file per --dataset file")
+
+    style = dict(json.loads(args.style) if args.style else {}, size=args.size)
+    image_root = args.image_root or os.path.dirname(os.path.abspath(args.output_dir))
+    totals = dict.fromkeys(['records', 'images', 'rendered', 'cached', 'skipped', 'seconds'], 0)
+    for position, dataset in enumerate(args.dataset):
+        # One index per file, as train and test records of a task have the same ids
+        standard_index = load_standard_index([dataset])
+        graph_cache = GraphCache(standard_index).parse_all()
+        records = list(standard_index.records.values())
+        paths, stats = render_records(records, graph_cache, args.output_dir, args.layout, style, args.seed, args.workers, compression=args.compression)
+        for name in totals:
+            totals[name] += stats[name]
+        if args.output:
+            # Skipped records keep their original image
+            with open(args.output[position], 'w', encoding='utf-8') as file:
+                json.dump([dict(record, image='/' + os.path.relpath(paths[(category, id)], image_root).replace(os.sep, '/'))
+                           if (category, id) in paths else record
+                           for (category, id), record in zip(standard_index.records, records)], file, ensure_ascii=False, indent=2)
+    print(f"{totals['records']} records, {totals['images']} images: {totals['rendered']} rendered, {totals['cached']} already cached, "
+          f"{totals['seconds']:.1f} s, {totals['rendered'] / totals['seconds'] if totals['seconds'] > 0 else 0.0:.1f} images/s with {args.workers} worker(s)")
+    if totals['skipped']:
+        print(f"{totals['skipped']} GNN records skipped: their questions do not list the initial embeddings, which are only drawn in the original images")
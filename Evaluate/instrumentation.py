@@ -0,0 +1,162 @@
+import contextlib
+import functools
+import heapq
+import json
+import time
+from collections import Counter
+
+# Returned by the profiler when it is disabled, so an instrumented block costs one attribute check
+NULL_CONTEXT = contextlib.nullcontext()
+
+class Profiler:
+    """Per-stage timers, parse failures and exceptions per category, and the slowest items of a scoring run
+
+    Stages nest, and a stage's time excludes the stages opened inside it (e.g. 'extraction' does not include
+    the 'validation' of the parsed answer). Worker processes reset their copy when they start, and
+    parallel_eval merges what they collected into the parent's profiler after every batch.
+    """
+
+    def __init__(self, slowest=20):
+        self.enabled = False
+        self.slowest_count = slowest
+        self.reset()
+
+    def reset(self):
+        self.stage_seconds = Counter()
+        self.stage_calls = Counter()
+        self.parse_failures = Counter()
+        # (category, exception type) -> count
+        self.exceptions = Counter()
+        # Min-heap of (seconds, category, id), the slowest items seen so far
+        self.slowest = []
+        self.stack = []
+        self.started = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self.reset()
+
+    def stage(self, name):
+        """Context manager timing a stage, e.g. `with profiler.stage('aggregation'):`"""
+        return _Stage(self, name) if self.enabled else NULL_CONTEXT
+
+    def item(self, category, id):
+        """Context manager timing the scoring of one item, the slowest ones are kept"""
+        return _Item(self, category, id) if self.enabled else NULL_CONTEXT
+
+    def timed_iter(self, name, iterable):
+        """Iterate, counting the time spent producing each element (e.g. reading records) as a stage"""
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    element = next(iterator)
+                except StopIteration:
+                    return
+            yield element
+
+    def parse_failure(self, category, error=None):
+        """Count an answer that could not be parsed, and the type of the exception it raised if any"""
+        if not self.enabled:
+            return
+        self.parse_failures[category] += 1
+        if error is not None:
+            self.exceptions[(category, type(error).__name__)] += 1
+
+    def pop(self):
+        """Return what was collected since the last call (picklable) and reset, used by worker processes"""
+        collected = {
+            'stage_seconds': dict(self.stage_seconds),
+            'stage_calls': dict(self.stage_calls),
+            'parse_failures': dict(self.parse_failures),
+            'exceptions': list(self.exceptions.items()),
+            'slowest': self.slowest,
+        }
+        self.reset()
+        return collected
+
+    def merge(self, collected):
+        self.stage_seconds.update(collected['stage_seconds'])
+        self.stage_calls.update(collected['stage_calls'])
+        self.parse_failures.update(collected['parse_failures'])
+        self.exceptions.update(dict(collected['exceptions']))
+        for entry in collected['slowest']:
+            self._keep_slowest(entry)
+
+    def _keep_slowest(self, entry):
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def report(self):
+        exceptions = {}
+        for (category, error_type), count in sorted(self.exceptions.items()):
+            exceptions.setdefault(category, {})[error_type] = count
+        return {
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            'stages': {name: {'seconds': round(seconds, 4), 'calls': self.stage_calls[name]}
+                       for name, seconds in sorted(self.stage_seconds.items())},
+            'parse_failures': dict(sorted(self.parse_failures.items())),
+            'exceptions': exceptions,
+            'slowest_items': [{'category': category, 'id': id, 'seconds': round(seconds, 6)}
+                              for seconds, category, id in sorted(self.slowest, reverse=True)],
+        }
+
+    def write(self, json_file):
+        with open(json_file, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = self.profiler.stack
+        if stack:
+            # Pause the enclosing stage
+            outer_name, outer_start = stack[-1]
+            self.profiler.stage_seconds[outer_name] += now - outer_start
+        stack.append((self.name, now))
+
+    def __exit__(self, *exc_info):
+        now = time.perf_counter()
+        stack = self.profiler.stack
+        name, start = stack.pop()
+        self.profiler.stage_seconds[name] += now - start
+        self.profiler.stage_calls[name] += 1
+        if stack:
+            # Resume the enclosing stage
+            stack[-1] = (stack[-1][0], now)
+
+class _Item:
+    def __init__(self, profiler, category, id):
+        self.profiler = profiler
+        self.category = category
+        self.id = str(id)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler._keep_slowest((time.perf_counter() - self.start, self.category, self.id))
+
+# Shared by the evaluators and the checkers of a process
+profiler = Profiler()
+
+def timed(stage):
+    """Decorator counting the calls of a function as a profiler stage"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.stage(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
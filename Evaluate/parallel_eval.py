@@ -0,0 +1,58 @@
+import collections
+import contextlib
+import io
+import itertools
+import multiprocessing
+import sys
+from instrumentation import profiler
+
+def score_in_order(score_fn, records, workers=1, batch_size=64, initializer=None, initargs=()):
+    """Apply score_fn to every record and yield the outcomes in input order
+
+    With workers > 1 the records are sharded into batches over a process pool. Workers are forked when
+    the platform allows it, so they share the ground truth already parsed by the parent; otherwise
+    `initializer(*initargs)` has to load it in each worker. At most 2 * workers batches are in flight,
+    so a streamed results file is never read ahead unboundedly, and anything the checkers print is
+    replayed by the parent in input order, so the output is identical to a serial run. When profiling,
+    what the workers collect is merged into the parent's profiler batch by batch.
+    """
+    if workers <= 1:
+        for record in records:
+            yield score_fn(record)
+        return
+    start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+    context = multiprocessing.get_context(start_method)
+    records = iter(records)
+    batches = iter(lambda: list(itertools.islice(records, batch_size)), [])
+    with context.Pool(workers, _init_worker, (initializer, initargs)) as pool:
+        pending = collections.deque()
+        for batch in batches:
+            pending.append(pool.apply_async(_score_batch, (score_fn, batch)))
+            if len(pending) >= 2 * workers:
+                yield from _merge(pending.popleft())
+        while pending:
+            yield from _merge(pending.popleft())
+
+def _init_worker(initializer, initargs):
+    # A forked worker starts with a copy of the parent's profiler, only report its own measurements
+    profiler.reset()
+    if initializer is not None:
+        initializer(*initargs)
+
+def _merge(async_result):
+    """Replay the output of a finished batch and yield its outcomes"""
+    results, collected = async_result.get()
+    if collected is not None:
+        profiler.merge(collected)
+    for outcome, printed in results:
+        sys.stdout.write(printed)
+        yield outcome
+
+def _score_batch(score_fn, batch):
+    """Score a batch in a worker, capturing what each record prints"""
+    results = []
+    for record in batch:
+        with contextlib.redirect_stdout(io.StringIO()) as printed:
+            outcome = score_fn(record)
+        results.append((outcome, printed.getvalue()))
+    return results, profiler.pop() if profiler.enabled else None
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import re
+from standard_index import load_standard_index, category_from_path
+from graph_cache import QUERY_PATTERN
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Prompt')
+# Categories with a weighted edge list, asked with the Q2/Weighted prompts
+WEIGHTED_CATEGORIES = ('ShortestPath', 'MaximumFlow')
+Q3_VARIANTS = ('0-shot', '0-COT', '2-shot|COT', 'DPR')
+# Categories without a Q3 template are asked the question of the dataset record
+FALLBACK_TEMPLATE = "You are a visual intelligence assistant. Answer the following question: {question}"
+# Only these are placeholders, the templates contain other braces (e.g. in their examples)
+PLACEHOLDER_PATTERN = re.compile(r"\{(a|b|edges_representation|question)\}")
+
+class PreparedTemplate:
+    """A template split once at its placeholders, so filling it in is a single join
+
+    Everything before the first placeholder is the same for every question of the template: `prefix` is the
+    shared-prefix boundary an inference server can keep in its prefix (KV) cache.
+    """
+
+    def __init__(self, key, text):
+        self.key = key
+        parts = PLACEHOLDER_PATTERN.split(text)
+        self.literals = parts[0::2]
+        self.fields = parts[1::2]
+        self.prefix = self.literals[0]
+
+    def render(self, values):
+        pieces = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            pieces.append(values.get(field, ''))
+            pieces.append(literal)
+        return ''.join(pieces)
+
+class PromptTemplates:
+    """The Prompt/Q1, Q2 and Q3 templates, read and split once and filled per record
+
+    Q3 templates exist for Connectivity, Cycle, HamiltonPath and ShortestPath. {a} and {b} are the queried nodes,
+    and the DPR templates get the model's own segment2 edge description as {edges_representation}.
+    """
+
+    def __init__(self, prompt_dir=PROMPT_DIR, q2_variant='0-shot', q3_variant='0-shot'):
+        self.q2 = {}
+        for kind in ('Unweighted', 'Weighted'):
+            self.q2[kind] = self.load(prompt_dir, 'Q2', kind, f'{q2_variant}-prompt.txt')
+        self.q1 = self.load(prompt_dir, 'Q1', 'prompt.txt')
+        self.q3 = {}
+        q3_dir = os.path.join(prompt_dir, 'Q3')
+        for category in sorted(os.listdir(q3_dir)) if os.path.isdir(q3_dir) else []:
+            if os.path.exists(os.path.join(q3_dir, category, f'{q3_variant}-prompt.txt')):
+                self.q3[category] = self.load(prompt_dir, 'Q3', category, f'{q3_variant}-prompt.txt')
+        self.fallback = PreparedTemplate('fallback', FALLBACK_TEMPLATE)
+
+    @staticmethod
+    def load(prompt_dir, *parts):
+        with open(os.path.join(prompt_dir, *parts), 'r', encoding='utf-8') as file:
+            return PreparedTemplate('/'.join(parts), file.read().strip())
+
+    def template(self, record, segment):
+        category = category_from_path(record['image'])
+        if segment == 'segment1':
+            return self.q1
+        if segment == 'segment2':
+            return self.q2['Weighted' if category in WEIGHTED_CATEGORIES else 'Unweighted']
+        return self.q3.get(category, self.fallback)
+
+    def render(self, record, segment, segment2_answer=None):
+        """(template, prompt) of one segment of a record"""
+        template = self.template(record, segment)
+        if not template.fields:
+            return template, template.prefix
+        question = record['conversations'][4]['value']
+        query_match = QUERY_PATTERN.search(question)
+        a, b = query_match.groups() if query_match else ('', '')
+        return template, template.render({'a': a, 'b': b, 'question': question, 'edges_representation': segment2_answer or ''})
+
+    def uses_segment2(self, record):
+        """Whether the segment3 prompt of a record needs the segment2 answer (the DPR templates)"""
+        return 'edges_representation' in self.template(record, 'segment3').fields
+
+def prompt_request(templates, records, index, segment, segment2_answer=None):
+    template, prompt = templates.render(records[index], segment, segment2_answer)
+    return {'index': index, 'segment': segment, 'template': template.key, 'prompt': prompt, 'prefix_length': len(template.prefix)}
+
+def assemble(records, templates, segments):
+    """Prompt requests of the records, grouped by shared prefix
+
+    Returns (requests, deferred): the requests that can be sent now, and the (record index, segment) of the
+    DPR segment3 prompts, which can only be rendered once the segment2 answer of the record is known (their
+    segment2 is asked even when it is not in `segments`).
+    """
+    requests = []
+    deferred = []
+    for index, record in enumerate(records):
+        asked = list(segments)
+        if 'segment3' in asked and templates.uses_segment2(record):
+            asked.remove('segment3')
+            deferred.append((index, 'segment3'))
+            if 'segment2' not in asked:
+                asked.append('segment2')
+        for segment in asked:
+            requests.append(prompt_request(templates, records, index, segment))
+    return group_by_prefix(requests), deferred
+
+def group_by_prefix(requests):
+    """Order requests so prompts with a shared prefix are sent back to back, and number the template groups
+
+    In sorted order every prompt shares with its predecessor the longest prefix it shares with any earlier
+    prompt, and the prompts of a template stay contiguous.
+    """
+    ordered = sorted(requests, key=lambda request: request['prompt'])
+    group = -1
+    for position, request in enumerate(ordered):
+        if position == 0 or request['template'] != ordered[position - 1]['template']:
+            group += 1
+        request['group'] = group
+    return ordered
+
+def prefix_sharing(prompts, tokenize=None):
+    """(total, shared) prompt length when sent in this order, shared being the prefix already seen just before
+
+    Lengths are in characters, or in tokens with tokenize (e.g. SimpleTokenizer().encode of sequence_packing).
+    """
+    total = 0
+    shared = 0
+    previous = None
+    for prompt in prompts:
+        units = tokenize(prompt) if tokenize else prompt
+        total += len(units)
+        if previous is not None:
+            shared += len(os.path.commonprefix([previous, units]))
+        previous = units
+    return total, shared
+
+def sharing_report(requests, tokenize=None):
+    """Prefix-sharing ratio of the grouped order, against the order of the records"""
+    total, shared = prefix_sharing([request['prompt'] for request in requests], tokenize)
+    input_order = sorted(requests, key=lambda request: (request['index'], request['segment']))
+    _, input_shared = prefix_sharing([request['prompt'] for request in input_order], tokenize)
+    return {
+        'requests': len(requests),
+        'groups': len({request['group'] for request in requests}),
+        'prompt_length': total,
+        'shared_prefix_length': shared,
+        # Share of the prefill that a prefix cache holding the previous prompt does not recompute
+        'prefix_sharing_ratio': shared / total if total else 0.0,
+        'input_order_ratio': input_shared / total if total else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assemble the prompts of the dataset records grouped by shared prefix")
+    parser.add_argument("--dataset", nargs='+', required=True, help="Dataset/*/test.json files or columnar dataset directories")
+    parser.add_argument("--segments", nargs='+', default=['segment1', 'segment2', 'segment3'])
+    parser.add_argument("--q2-variant", default="0-shot", help="Q2 prompt: 0-shot or 4-shot")
+    parser.add_argument("--q3-variant", default="0-shot", choices=Q3_VARIANTS)
+    parser.add_argument("--prompt-dir", default=PROMPT_DIR)
+    parser.add_argument("--tokens", action='store_true', help="Measure the sharing in SimpleTokenizer tokens instead of characters")
+    parser.add_argument("--output", default=None, help="Write the grouped requests (id, segment, group, prefix_length, prompt) as JSONL")
+    args = parser.parse_args()
+
+    records = list(load_standard_index(args.dataset).records.values())
+    templates = PromptTemplates(args.prompt_dir, args.q2_variant, args.q3_variant)
+    requests, deferred = assemble(records, templates, args.segments)
+    tokenize = None
+    if args.tokens:
+        from sequence_packing import SimpleTokenizer
+        tokenize = SimpleTokenizer().encode
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            for request in requests:
+                record = records[request['index']]
+                file.write(json.dumps({'id': record['id'], 'image': record['image'], 'segment': request['segment'], 'group': request['group'],
+                                       'prefix_length': request['prefix_length'], 'prompt': request['prompt']}, ensure_ascii=False) + '\n')
+    report = sharing_report(requests, tokenize)
+    report['deferred'] = len(deferred)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import http.server
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from standard_index import load_standard_index
+from prompt_assembly import PROMPT_DIR, Q3_VARIANTS, PromptTemplates, assemble, group_by_prefix, prompt_request, sharing_report
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+class RateLimiter:
+    """Token bucket: at most `rate` requests per second on average, bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class ResponseCache:
+    """Content-addressed response cache, one JSON file per request payload hash"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as file:
+                return json.load(file)['response']
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, response):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so an interrupted run never leaves a partial entry
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({'response': response}, file, ensure_ascii=False)
+        os.replace(temporary_path, path)
+
+class QueryRunner:
+    """Sends chat-completion requests with bounded concurrency, rate limiting, retries and a response cache
+
+    Identical payloads are only sent once: answers come from the cache, and requests already in flight are
+    shared. The HTTP calls are blocking urllib calls run in a thread pool, so only the standard library is needed.
+    """
+
+    def __init__(self, endpoint, model, cache, concurrency=8, rate=None, burst=1, retries=5, timeout=120,
+                 api_key=None, max_tokens=1024, temperature=0.0):
+        self.endpoint = endpoint
+        self.model = model
+        self.cache = cache
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_limiter = RateLimiter(rate, burst)
+        self.retries = retries
+        self.timeout = timeout
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.in_flight = {}
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.stats = {'requests': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0}
+
+    def payload(self, prompt, image_url):
+        content = [{'type': 'text', 'text': prompt}]
+        if image_url:
+            content.append({'type': 'image_url', 'image_url': {'url': image_url}})
+        return {'model': self.model, 'messages': [{'role': 'user', 'content': content}],
+                'max_tokens': self.max_tokens, 'temperature': self.temperature}
+
+    async def query(self, prompt, image_url):
+        """Answer text of a prompt, None if every attempt failed or the replies were malformed"""
+        payload = self.payload(prompt, image_url)
+        key = self.cache.key(payload)
+        response = self.cache.get(key)
+        if response is not None:
+            self.stats['cache_hits'] += 1
+            return response
+        if key in self.in_flight:
+            self.stats['cache_hits'] += 1
+            return await self.in_flight[key]
+        future = self.in_flight[key] = asyncio.get_running_loop().create_future()
+        response = None
+        try:
+            response = await self.send(payload)
+            if response is not None:
+                self.cache.put(key, response)
+            return response
+        finally:
+            # Release the duplicate waiters even if the request was cancelled or raised
+            if not future.done():
+                future.set_result(response)
+            del self.in_flight[key]
+
+    async def send(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            await self.rate_limiter.acquire()
+            async with self.semaphore:
+                self.stats['requests'] += 1
+                try:
+                    return await loop.run_in_executor(self.executor, self.post, body)
+                except urllib.error.HTTPError as error:
+                    if error.code not in RETRY_STATUSES:
+                        print(f"Request failed with HTTP {error.code}, not retried")
+                        break
+                    retry_after = error.headers.get('Retry-After')
+                except (urllib.error.URLError, TimeoutError, ConnectionError) as error:
+                    retry_after = None
+                except (ValueError, KeyError, IndexError, TypeError) as error:
+                    # A 200 reply that is not JSON or has no choices: the server will not answer differently
+                    print(f"Malformed response ({type(error).__name__}: {error}), not retried")
+                    break
+            if attempt < self.retries:
+                self.stats['retries'] += 1
+                # Exponential backoff with jitter, or what the server asks for
+                delay = float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else min(60, 2 ** attempt) * (0.5 + random.random())
+                await asyncio.sleep(delay)
+        self.stats['failures'] += 1
+        return None
+
+    def post(self, body):
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(self.endpoint, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())['choices'][0]['message']['content']
+
+def image_url_of(record, image_root=None, image_base_url=None):
+    """Image of a record as a base64 data URL read from image_root, or as a URL under image_base_url"""
+    relative_path = record['image'].lstrip('/')
+    if image_root:
+        with open(os.path.join(image_root, relative_path), 'rb') as file:
+            return 'data:image/png;base64,' + base64.b64encode(file.read()).decode('ascii')
+    if image_base_url:
+        return image_base_url.rstrip('/') + '/' + relative_path
+    # Without the image the Q1 and Q2 prompts of all records are the same request
+    raise ValueError("an image source is needed: image_root or image_base_url")
+
+async def answer_records(runner, templates, records, segments, image_root=None, image_base_url=None):
+    """Ask the segments of the records in prefix-grouped order, returns (results in the schema of the evaluators, sent requests, failed requests)
+
+    The requests are started in the order of prompt_assembly.assemble, and the rate limiter and the semaphore
+    are first come first served, so prompts with a shared prefix reach the server back to back. A segment
+    whose query failed is written as "" (scored as wrong) and listed in the failed requests.
+    """
+    results = [{'id': record['id'], 'image_url': record['image'], 'difficulty': record.get('difficulty')} for record in records]
+    failed = []
+    # Read and encode the image of every record once, off the event loop, for all of its segments
+    loop = asyncio.get_running_loop()
+    image_urls = await asyncio.gather(*[loop.run_in_executor(runner.executor, image_url_of, record, image_root, image_base_url)
+                                        for record in records])
+
+    async def ask(request):
+        answer = await runner.query(request['prompt'], image_urls[request['index']])
+        if answer is None:
+            failed.append(request)
+        results[request['index']][request['segment']] = answer or ""
+
+    requests, deferred = assemble(records, templates, segments)
+    await asyncio.gather(*[ask(request) for request in requests])
+    # DPR: the segment3 prompt contains the model's own segment2 edge description
+    dependent = group_by_prefix([prompt_request(templates, records, index, segment, results[index]['segment2'])
+                                 for index, segment in deferred])
+    await asyncio.gather(*[ask(request) for request in dependent])
+    return results, requests + dependent, failed
+
+async def run(records, output_file, runner, templates, segments, image_root=None, image_base_url=None, window=4096):
+    """Answer all records, `window` records at a time, and write the results as JSONL in input order
+
+    Returns the number of results, the prefix-sharing report of the order the prompts were sent in and the
+    (id, segment) of the failed queries.
+    """
+    sent = []
+    failed = []
+    written = 0
+    with open(output_file, 'w', encoding='utf-8') as file:
+        for start in range(0, len(records), window):
+            results, requests, window_failed = await answer_records(runner, templates, records[start:start + window], segments, image_root, image_base_url)
+            for result in results:
+                file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            written += len(results)
+            failed += [(results[request['index']]['id'], request['segment']) for request in window_failed]
+            for request in requests:
+                request['index'] += start
+            sent += requests
+    runner.executor.shutdown()
+    return written, sharing_report(sent), failed
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Local stand-in for a chat-completion server, for testing the runner offline
+
+    Answers with the first words of the prompt; every `fail_every`-th request gets a 503 to exercise retries, and
+    requests whose image URL contains `malformed_marker` get a 200 reply without choices.
+    """
+
+    fail_every = 0
+    malformed_marker = None
+    request_count = 0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubHandler.request_count += 1
+        if self.fail_every and StubHandler.request_count % self.fail_every == 0:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        prompt = payload['messages'][0]['content'][0]['text']
+        image = payload['messages'][0]['content'][1]['image_url']['url'] if len(payload['messages'][0]['content']) > 1 else ''
+        if self.malformed_marker and self.malformed_marker in image:
+            body = json.dumps({'error': 'no choices'}).encode('utf-8')
+        else:
+            body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': f"Stub answer to: {prompt[:80]} ({image[-16:]})"}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def self_test(dataset_files, count=12):
+    """Run the runner against the stand-in server on `count` records and check the results
+
+    Every third request gets a 503 and the requests of the first record a reply without choices, so the test covers
+    retries, malformed replies and the image of every record.
+    """
+    import tempfile
+    import threading
+    records = list(load_standard_index(dataset_files).records.values())[:count]
+    templates = PromptTemplates()
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    StubHandler.fail_every, StubHandler.request_count = 3, 0
+    # The data URL of the first record's image
+    StubHandler.malformed_marker = base64.b64encode(b"malformed image").decode('ascii')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as directory:
+        image_root = os.path.join(directory, 'images')
+        for number, record in enumerate(records):
+            path = os.path.join(image_root, record['image'].lstrip('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b"malformed image" if number == 0 else f"image {number}".encode('ascii'))
+
+        async def main():
+            runner = QueryRunner(f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions', 'stub',
+                                 ResponseCache(os.path.join(directory, 'cache')), concurrency=4, retries=3)
+            written, _, failed = await run(records, os.path.join(directory, 'results.jsonl'), runner, templates,
+                                           ['segment1', 'segment2', 'segment3'], image_root)
+            return runner, written, failed
+
+        runner, written, failed = asyncio.run(main())
+        with open(os.path.join(directory, 'results.jsonl'), encoding='utf-8') as file:
+            results = [json.loads(line) for line in file]
+    server.shutdown()
+    assert written == len(records) == len(results)
+    assert [result['id'] for result in results] == [record['id'] for record in records]
+    # Every segment of the first record gets a malformed reply, and is written as an empty answer
+    segments = ['segment1', 'segment2', 'segment3']
+    assert sorted(failed) == [(records[0]['id'], segment) for segment in segments], failed
+    assert all(results[0][segment] == "" for segment in segments)
+    assert all(result[segment] for result in results[1:] for segment in segments)
+    # Each record sends its own image, so the segment1 prompts are not answered from one cached reply
+    assert len({result['segment1'] for result in results[1:]}) == len(records) - 1
+    assert runner.stats['retries'] > 0 and runner.stats['failures'] == len(segments)
+    print(f"Self-test passed: {written} records, {runner.stats}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a model for the three segments of every dataset record")
+    parser.add_argument("--dataset", nargs='+', help="Dataset/*/test.json files or columnar dataset directories")
+    parser.add_argument("--output", default="results.jsonl", help="Results in the schema of the evaluators (JSONL)")
+    parser.add_argument("--endpoint", default="http://localhost:8000/v1/chat/completions", help="OpenAI-compatible chat completions URL")
+    parser.add_argument("--model", default="gpt-4-vision-preview")
+    parser.add_argument("--api-key-env", default="OPENAI_API_KEY", help="Environment variable holding the API key")
+    parser.add_argument("--segments", nargs='+', default=['segment1', 'segment2', 'segment3'])
+    parser.add_argument("--q2-variant", default="0-shot", help="Q2 prompt: 0-shot or 4-shot")
+    parser.add_argument("--q3-variant", default="0-shot", choices=Q3_VARIANTS)
+    parser.add_argument("--prompt-dir", default=PROMPT_DIR)
+    parser.add_argument("--image-root", default=None, help="Directory containing Dataset/..., images are sent inline")
+    parser.add_argument("--image-base-url", default=None, help="URL prefix of the Dataset/... images")
+    parser.add_argument("--window", type=int, default=4096, help="Records assembled and grouped together")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache-dir", default=".query_cache", help="Content-addressed response cache")
+    parser.add_argument("--serve-stub", type=int, default=None, metavar="PORT", help="Run the local stand-in server instead")
+    parser.add_argument("--stub-fail-every", type=int, default=0)
+    parser.add_argument("--self-test", action='store_true', help="Run the runner against the stand-in server on a few --dataset records")
+    args = parser.parse_args()
+
+    if args.serve_stub is not None:
+        StubHandler.fail_every = args.stub_fail_every
+        http.server.ThreadingHTTPServer(('127.0.0.1', args.serve_stub), StubHandler).serve_forever()
+    elif args.self_test:
+        self_test(args.dataset)
+    else:
+        if not args.image_root and not args.image_base_url:
+            parser.error("one of --image-root and --image-base-url is needed, the segment1 and segment2 prompts are the same for every record")
+        records = list(load_standard_index(args.dataset).records.values())
+        templates = PromptTemplates(args.prompt_dir, args.q2_variant, args.q3_variant)
+
+        async def main():
+            runner = QueryRunner(args.endpoint, args.model, ResponseCache(args.cache_dir), args.concurrency, args.rate,
+                                 args.burst, args.retries, args.timeout, os.environ.get(args.api_key_env))
+            written, report, failed = await run(records, args.output, runner, templates, args.segments, args.image_root, args.image_base_url, args.window)
+            print(f"Wrote {written} results to {args.output}: {runner.stats}")
+            if failed:
+                print(f"Warning: {len(failed)} queries failed and were written as empty answers: "
+                      + ", ".join(f"{id} {segment}" for id, segment in failed[:10]) + (" ..." if len(failed) > 10 else ""))
+            print(f"Prefix sharing: {report['prefix_sharing_ratio']:.1%} of the prompt characters (records order: {report['input_order_ratio']:.1%})")
+
+        asyncio.run(main())
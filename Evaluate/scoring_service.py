@@ -0,0 +1,286 @@
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from evaluators import EVALUATORS, load_evaluator
+
+# Latencies kept for the percentiles of /stats
+LATENCY_WINDOW = 10000
+# Finished jobs kept until they are fetched
+MAX_JOBS = 10000
+
+def percentiles(values, points=(50, 90, 99)):
+    """Nearest-rank percentiles (and the maximum) of a list of latencies in seconds, as milliseconds"""
+    if not values:
+        return {}
+    values = sorted(values)
+    summary = {f"p{point}": round(values[min(len(values) - 1, len(values) * point // 100)] * 1000, 3) for point in points}
+    summary['max'] = round(values[-1] * 1000, 3)
+    return summary
+
+class ScoringService:
+    """Scores batches of answers against ground truth that stays loaded between requests
+
+    The evaluators are loaded once with their graph cache and answer keys, and share the parsed ground truth.
+    Verdicts are the ones of score_answer of the evaluators (is_correct_answer, compare_answers_*), and the
+    verdicts of recent (evaluator, category, id, segment, answer) items are kept in an LRU cache. Batches are
+    scored one at a time on a single thread, as the checkers keep module-level state.
+    """
+
+    def __init__(self, evaluators, standard_files, cache_size=100000):
+        self.evaluators = {}
+        # The LLaVA evaluator precomputes everything the ChatGPT one needs (and the segment2 edge keys), so it loads first
+        for name in sorted(evaluators, key=lambda name: name != 'llava'):
+            evaluator = load_evaluator(name)
+            if self.evaluators:
+                # Share the ground truth, graphs and answer keys of the first evaluator
+                first = next(iter(self.evaluators.values()))
+                evaluator.standard_index, evaluator.graph_cache = first.standard_index, first.graph_cache
+                evaluator.gold_mismatches = first.gold_mismatches
+            evaluator.load_ground_truth(standard_files)
+            self.evaluators[name] = evaluator
+        self.default_evaluator = evaluators[0]
+        self.standard_index = self.evaluators[self.default_evaluator].standard_index
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.devnull = open(os.devnull, 'w')
+        self.started = time.time()
+        self.counters = {'requests': 0, 'batches': 0, 'items': 0, 'cache_hits': 0, 'unknown': 0, 'errors': 0}
+        self.busy_seconds = 0.0
+        self.item_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def score_item(self, item):
+        """Verdict of one {category, id, segment, answer[, evaluator]} item
+
+        An item with a list of sampled "answers" instead of one "answer" is scored as pass@k: correct if any
+        sample passes, plus the number passed, the number of samples and the verdict of every sample.
+        """
+        name = item.get('evaluator', self.default_evaluator)
+        category, id, answer, answers = item.get('category'), item.get('id'), item.get('answer'), item.get('answers')
+        segment = item.get('segment', 'segment3')
+        evaluator = self.evaluators.get(name)
+        if evaluator is None:
+            return {'error': f"evaluator {name} is not loaded"}
+        if answers is not None:
+            if not isinstance(answers, list) or not all(isinstance(sample, str) for sample in answers):
+                return {'error': "answers must be a list of strings"}
+        elif not isinstance(answer, str):
+            return {'error': "answer must be a string"}
+        if not self.standard_index.has_record(category, id):
+            self.counters['unknown'] += 1
+            return {'error': f"unknown question {category} {id}"}
+        key = (name, category, id, segment, answer if answers is None else tuple(answers))
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return dict(verdict, cached=True)
+        if name == 'chatgpt':
+            if segment != 'segment3' or category not in evaluator.question_num:
+                return {'error': f"the chatgpt evaluator scores segment3 of {', '.join(evaluator.question_num)}"}
+            if answers is None:
+                rough_correct, exact_correct, rule_hits = evaluator.score_answer(category, id, answer)
+                verdict = {'correct': bool(exact_correct), 'rough': bool(rough_correct), 'rules': rule_hits}
+            else:
+                verdicts = evaluator.score_candidates(category, id, answers)
+        else:
+            if answers is None:
+                outcome = evaluator.score_answer(category, id, segment, answer)
+            else:
+                outcome = verdicts = evaluator.score_candidates(category, id, segment, answers)
+            if outcome is None:
+                return {'error': f"no gold answer for {segment} of {category} {id}"}
+            if answers is None:
+                verdict = {'correct': bool(outcome[0])}
+        if answers is not None:
+            verdict = {'correct': any(verdicts), 'passed': sum(verdicts), 'samples': len(verdicts), 'verdicts': verdicts}
+        self.cache[key] = verdict
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return dict(verdict, cached=False)
+
+    def score_batch(self, items):
+        """Verdicts of a batch of items, in order; runs on the scoring thread"""
+        start = time.perf_counter()
+        verdicts, latencies = [], []
+        # What the checkers print about single answers is not wanted in the service log
+        with contextlib.redirect_stdout(self.devnull):
+            for item in items:
+                item_start = time.perf_counter()
+                try:
+                    verdict = self.score_item(item)
+                except Exception as error:
+                    verdict = {'error': f"{type(error).__name__}: {error}"}
+                if 'error' in verdict:
+                    self.counters['errors'] += 1
+                verdicts.append(verdict)
+                latencies.append(time.perf_counter() - item_start)
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.counters['batches'] += 1
+            self.counters['items'] += len(items)
+            self.busy_seconds += seconds
+            self.item_latencies.extend(latencies)
+            self.batch_latencies.append(seconds)
+        return verdicts
+
+    def score(self, items):
+        """Score a batch and wait for its verdicts"""
+        return self.executor.submit(self.score_batch, items).result()
+
+    def submit(self, items):
+        """Queue a batch and return its job id at once, the verdicts are fetched with job()"""
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = self.executor.submit(self.score_batch, items)
+            # Forget the oldest finished jobs that were never fetched
+            while len(self.jobs) > MAX_JOBS:
+                oldest = next(iter(self.jobs))
+                if not self.jobs[oldest].done():
+                    break
+                del self.jobs[oldest]
+        return job_id
+
+    def job(self, job_id):
+        """{'status': 'pending'} or {'status': 'done', 'verdicts': [...]}; a finished job is removed once fetched"""
+        with self.lock:
+            future = self.jobs.get(job_id)
+            if future is None:
+                return None
+            if not future.done():
+                return {'status': 'pending'}
+            del self.jobs[job_id]
+        return {'status': 'done', 'verdicts': future.result()}
+
+    def stats(self):
+        """Request, item and cache counters, throughput and latency percentiles"""
+        with self.lock:
+            uptime = time.time() - self.started
+            stats = dict(self.counters)
+            stats.update({
+                'uptime_s': round(uptime, 1),
+                'pending_jobs': sum(1 for future in self.jobs.values() if not future.done()),
+                'cached_verdicts': len(self.cache),
+                'records': len(self.standard_index.records),
+                'evaluators': list(self.evaluators),
+                # Items per second of scoring, and over the uptime of the service
+                'items_per_second': round(self.counters['items'] / self.busy_seconds, 1) if self.busy_seconds else None,
+                'items_per_second_uptime': round(self.counters['items'] / uptime, 1) if uptime else None,
+                'item_latency_ms': percentiles(list(self.item_latencies)),
+                'batch_latency_ms': percentiles(list(self.batch_latencies)),
+            })
+        return stats
+
+class ScoringHandler(http.server.BaseHTTPRequestHandler):
+    """JSON API of the scoring service
+
+    POST /score: {"items": [...]} -> {"verdicts": [...]}, waits for the verdicts
+    POST /jobs: {"items": [...]} -> 202 {"job": id}, returns at once
+    GET /jobs/<id>: {"status": "pending"} or {"status": "done", "verdicts": [...]}
+    GET /stats: counters, throughput and latency percentiles
+    """
+
+    service = None
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_items(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+        items = payload.get('items') if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError("expected {\"items\": [{\"category\", \"id\", \"segment\", \"answer\" or \"answers\"}, ...]}")
+        return items
+
+    def do_POST(self):
+        with self.service.lock:
+            self.service.counters['requests'] += 1
+        try:
+            items = self.read_items()
+        except ValueError as error:
+            self.send_json(400, {'error': str(error)})
+            return
+        if self.path == '/score':
+            self.send_json(200, {'verdicts': self.service.score(items)})
+        elif self.path == '/jobs':
+            self.send_json(202, {'job': self.service.submit(items)})
+        else:
+            self.send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_GET(self):
+        with self.service.lock:
+            self.service.counters['requests'] += 1
+        if self.path == '/stats':
+            self.send_json(200, self.service.stats())
+        elif self.path.startswith('/jobs/'):
+            job = self.service.job(self.path[len('/jobs/'):])
+            if job is None:
+                self.send_json(404, {'error': "unknown job"})
+            else:
+                self.send_json(200, job)
+        else:
+            self.send_json(404, {'error': f"unknown path {self.path}"})
+
+    def log_message(self, *args):
+        pass
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP over a Unix socket, for clients on the same machine"""
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ('local', 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local scoring service that keeps the ground truth and answer keys loaded")
+    parser.add_argument("--standard", nargs='+', required=True, help="standard.json, test.json files or columnar dataset directories")
+    parser.add_argument("--evaluators", nargs='+', choices=sorted(EVALUATORS), default=['llava', 'chatgpt'],
+                        help="Evaluators to load, the first one scores items that do not name one")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of host:port")
+    parser.add_argument("--cache-size", type=int, default=100000, help="Verdicts kept in memory for repeated answers")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ScoringHandler.service = ScoringService(args.evaluators, args.standard, args.cache_size)
+    if ScoringHandler.service.evaluators[args.evaluators[0]].gold_mismatches:
+        print(f"Warning: {len(ScoringHandler.service.evaluators[args.evaluators[0]].gold_mismatches)} gold answers disagree with the solution computed from the graph", file=sys.stderr)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, ScoringHandler)
+        address = args.socket
+    else:
+        server = http.server.ThreadingHTTPServer((args.host, args.port), ScoringHandler)
+        address = f"http://{args.host}:{args.port}"
+    print(f"{len(ScoringHandler.service.standard_index.records)} records loaded in {time.perf_counter() - start:.1f} s, serving on {address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
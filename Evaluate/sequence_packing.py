@@ -0,0 +1,129 @@
+import re
+import numpy as np
+
+# Prefix of each turn in the packed text, only the text of the gpt turns is trained on
+ROLE_PREFIXES = {'human': "USER: ", 'gpt': "ASSISTANT: "}
+
+class SimpleTokenizer:
+    """Offline stand-in tokenizer: words and punctuation, ids assigned in order of first appearance
+
+    Any tokenizer with encode(text) -> list of ids (and optionally pad_token_id / eos_token_id), e.g. a
+    Hugging Face tokenizer wrapped with add_special_tokens=False, can be used instead.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\n")
+
+    def __init__(self):
+        self.pad_token_id = 0
+        self.eos_token_id = 1
+        self.vocab = {'<pad>': 0, '</s>': 1}
+
+    def encode(self, text):
+        return [self.vocab.setdefault(token, len(self.vocab)) for token in self.TOKEN_PATTERN.findall(text)]
+
+def encode_conversation(record, tokenizer):
+    """Token ids of a record's conversation and its loss mask (1 on the gpt answers and their end token)"""
+    input_ids = []
+    loss_mask = []
+    eos_token_id = getattr(tokenizer, 'eos_token_id', None)
+    for turn in record['conversations']:
+        prefix = tokenizer.encode(ROLE_PREFIXES[turn['from']])
+        text = tokenizer.encode(turn['value'] + "\n")
+        trained = turn['from'] == 'gpt'
+        input_ids += prefix + text
+        loss_mask += [0] * len(prefix) + [int(trained)] * len(text)
+        if trained and eos_token_id is not None:
+            input_ids.append(eos_token_id)
+            loss_mask.append(1)
+    return input_ids, loss_mask
+
+def first_fit_decreasing(lengths, capacity):
+    """Assign items to bins of the given capacity, longest first, each into the first bin with room
+
+    A max segment tree over the remaining capacities finds that bin in O(log n), so packing is O(n log n).
+    Returns the list of bins, each a list of item indices.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: -lengths[index])
+    leaves = 1
+    while leaves < max(len(lengths), 1):
+        leaves *= 2
+    # tree[leaves + b] is the remaining capacity of bin b, inner nodes hold the max of their children
+    tree = [capacity] * (2 * leaves)
+    bins = []
+    for index in order:
+        length = lengths[index]
+        # Descend to the leftmost bin with enough room
+        node = 1
+        while node < leaves:
+            node = 2 * node if tree[2 * node] >= length else 2 * node + 1
+        bin_index = node - leaves
+        if bin_index == len(bins):
+            bins.append([])
+        bins[bin_index].append(index)
+        tree[node] -= length
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    return bins
+
+def pack_conversations(records, tokenizer, max_length, truncate=True):
+    """Pack conversations into sequences of max_length tokens
+
+    Each pack has the padded input_ids, the loss_mask (gpt turns only), position_ids that restart at every
+    sample, cu_seqlens (the sample boundaries, as used by variable-length attention kernels) and the indices
+    of the packed records. Conversations longer than max_length are truncated, or skipped if truncate=False.
+    Returns (packs, stats).
+    """
+    samples = []
+    skipped = 0
+    for record_index, record in enumerate(records):
+        input_ids, loss_mask = encode_conversation(record, tokenizer)
+        if len(input_ids) > max_length:
+            if not truncate:
+                skipped += 1
+                continue
+            input_ids, loss_mask = input_ids[:max_length], loss_mask[:max_length]
+        samples.append((record_index, input_ids, loss_mask))
+    pad_token_id = getattr(tokenizer, 'pad_token_id', None) or 0
+    packs = []
+    for bin_items in first_fit_decreasing([len(input_ids) for _, input_ids, _ in samples], max_length):
+        input_ids = np.full(max_length, pad_token_id, dtype=np.int64)
+        loss_mask = np.zeros(max_length, dtype=np.int8)
+        position_ids = np.zeros(max_length, dtype=np.int64)
+        cu_seqlens = [0]
+        for item in bin_items:
+            _, sample_ids, sample_mask = samples[item]
+            start, end = cu_seqlens[-1], cu_seqlens[-1] + len(sample_ids)
+            input_ids[start:end] = sample_ids
+            loss_mask[start:end] = sample_mask
+            position_ids[start:end] = np.arange(len(sample_ids))
+            cu_seqlens.append(end)
+        packs.append({
+            'input_ids': input_ids,
+            'loss_mask': loss_mask,
+            'position_ids': position_ids,
+            'cu_seqlens': np.array(cu_seqlens, dtype=np.int32),
+            'record_indices': [samples[item][0] for item in bin_items],
+        })
+    tokens = sum(len(input_ids) for _, input_ids, _ in samples)
+    stats = {
+        'records': len(samples),
+        'skipped': skipped,
+        'packs': len(packs),
+        'tokens': tokens,
+        # Share of real tokens in the packed batch, and what padding every sample to the longest one would give
+        'packing_efficiency': tokens / (len(packs) * max_length) if packs else 0.0,
+        'padding_efficiency': tokens / (len(samples) * max(len(input_ids) for _, input_ids, _ in samples)) if samples else 0.0,
+    }
+    return packs, stats
+
+def attention_mask(pack):
+    """Block-diagonal causal mask of a pack (True where attention is allowed), for kernels without cu_seqlens"""
+    length = len(pack['input_ids'])
+    segment = np.full(length, -1, dtype=np.int64)
+    boundaries = pack['cu_seqlens']
+    for sample in range(len(boundaries) - 1):
+        segment[boundaries[sample]:boundaries[sample + 1]] = sample
+    causal = np.tril(np.ones((length, length), dtype=bool))
+    return causal & (segment[:, None] == segment[None, :]) & (segment[:, None] >= 0)
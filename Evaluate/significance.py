@@ -0,0 +1,144 @@
+import argparse
+import json
+import math
+import numpy as np
+
+class VerdictTable:
+    """Per-item verdicts (correct or not) grouped into cells, e.g. 'Cycle_easy_segment3'
+
+    An item is counted in every cell it is added to (e.g. its difficulty and the category total), and items
+    are identified by their id within a cell, which is what pairs the verdicts of two models.
+    """
+
+    def __init__(self):
+        # cell -> (item ids, verdicts as a bytearray)
+        self.cells = {}
+
+    def add(self, cells, item, correct):
+        for cell in cells:
+            items, verdicts = self.cells.setdefault(cell, ([], bytearray()))
+            items.append(str(item))
+            verdicts.append(1 if correct else 0)
+
+    def verdicts(self, cell):
+        return np.frombuffer(bytes(self.cells[cell][1]), dtype=np.uint8)
+
+    def write(self, jsonl_file):
+        with open(jsonl_file, 'w', encoding='utf-8') as file:
+            for cell, (items, verdicts) in self.cells.items():
+                for item, correct in zip(items, verdicts):
+                    file.write(json.dumps({'cell': cell, 'item': item, 'correct': correct}) + '\n')
+
+    @classmethod
+    def read(cls, jsonl_file):
+        table = cls()
+        with open(jsonl_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    table.add([entry['cell']], entry['item'], entry['correct'])
+        return table
+
+def quantiles(draws, confidence):
+    """Percentile interval of every column of a (resamples, cells) array"""
+    return np.quantile(draws, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0)
+
+def bootstrap_intervals(table, resamples=10000, confidence=0.95, seed=0):
+    """Percentile bootstrap confidence interval of the accuracy of every cell, {cell: (accuracy, low, high, items)}
+
+    When the n items of a cell are resampled with replacement, the number of correct ones is distributed as
+    Binomial(n, accuracy), so a single binomial draw of shape (resamples, cells) resamples every cell at once.
+    """
+    cells = [cell for cell in table.cells if table.cells[cell][1]]
+    if not cells:
+        return {}
+    items = np.array([len(table.cells[cell][1]) for cell in cells])
+    accuracy = np.array([sum(table.cells[cell][1]) for cell in cells]) / items
+    draws = np.random.default_rng(seed).binomial(items, accuracy, size=(resamples, len(cells))) / items
+    low, high = quantiles(draws, confidence)
+    return {cell: (accuracy[column], low[column], high[column], int(items[column])) for column, cell in enumerate(cells)}
+
+def mcnemar_p_value(only_a, only_b):
+    """Exact two-sided McNemar test: the items only one model got right are a fair coin under the null"""
+    discordant = only_a + only_b
+    if discordant == 0:
+        return 1.0
+    tail = sum(math.comb(discordant, count) for count in range(min(only_a, only_b) + 1))
+    return min(1.0, 2 * tail / 2 ** discordant)
+
+def paired_comparison(table_a, table_b, resamples=10000, confidence=0.95, seed=0):
+    """Model A vs model B on the items both scored, for every cell they share
+
+    Resampling the items in pairs, the counts of (both right, only A, only B, both wrong) follow a multinomial
+    distribution. Only the discordant counts matter, and they are drawn as chained binomials (only A, then only B
+    out of the rest), each one vectorized draw of shape (resamples, cells), giving the bootstrap distribution of
+    the accuracy difference of every cell. Returns {cell: dict} with both accuracies, the difference and its interval,
+    the bootstrap p-value of a zero difference and the exact McNemar p-value.
+    """
+    cells = []
+    counts = []
+    for cell in table_a.cells:
+        if cell not in table_b.cells:
+            continue
+        verdicts_b = dict(zip(*table_b.cells[cell]))
+        pair_counts = [0, 0, 0, 0]
+        for item, correct_a in zip(*table_a.cells[cell]):
+            correct_b = verdicts_b.get(item)
+            if correct_b is not None:
+                # 0: both right, 1: only A, 2: only B, 3: both wrong
+                pair_counts[(1 - correct_a) * 2 + (1 - correct_b)] += 1
+        if sum(pair_counts):
+            cells.append(cell)
+            counts.append(pair_counts)
+    if not cells:
+        return {}
+    counts = np.array(counts)
+    items = counts.sum(axis=1)
+    rng = np.random.default_rng(seed)
+    p_only_a = counts[:, 1] / items
+    # P(only B | not only A); 0 when every item is only A
+    rest = 1 - p_only_a
+    p_only_b = np.divide(counts[:, 2] / items, rest, out=np.zeros(len(cells)), where=rest > 0).clip(0, 1)
+    only_a = rng.binomial(items, p_only_a, size=(resamples, len(cells)))
+    only_b = rng.binomial(items - only_a, p_only_b)
+    differences = (only_a - only_b) / items
+    low, high = quantiles(differences, confidence)
+    # Two-sided: how often the resampled difference falls on either side of zero
+    p_values = np.minimum(1.0, 2 * np.minimum((differences <= 0).mean(axis=0), (differences >= 0).mean(axis=0)))
+    comparison = {}
+    for column, cell in enumerate(cells):
+        both, only_a, only_b, _ = counts[column].tolist()
+        comparison[cell] = {
+            'items': int(items[column]),
+            'accuracy_a': (both + only_a) / items[column],
+            'accuracy_b': (both + only_b) / items[column],
+            'difference': (only_a - only_b) / items[column],
+            'low': low[column],
+            'high': high[column],
+            'bootstrap_p': p_values[column],
+            'mcnemar_p': mcnemar_p_value(only_a, only_b),
+        }
+    return comparison
+
+def print_intervals(table, resamples=10000, confidence=0.95, seed=0):
+    for cell, (accuracy, low, high, items) in sorted(bootstrap_intervals(table, resamples, confidence, seed).items()):
+        print(f"{cell}: Accuracy {accuracy:.4f}, {confidence:.0%} CI [{low:.4f}, {high:.4f}], n={items}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals and paired tests from the --verdicts files of the evaluators")
+    parser.add_argument("--verdicts", nargs='+', required=True, help="One verdicts file for intervals, two (model A, model B) for a paired comparison")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tables = [VerdictTable.read(verdicts_file) for verdicts_file in args.verdicts]
+    for verdicts_file, table in zip(args.verdicts, tables):
+        print(f"\nBootstrap confidence intervals of {verdicts_file}:\n")
+        print_intervals(table, args.resamples, args.confidence, args.seed)
+    if len(tables) == 2:
+        print(f"\nPaired comparison, A = {args.verdicts[0]}, B = {args.verdicts[1]}:\n")
+        for cell, result in sorted(paired_comparison(tables[0], tables[1], args.resamples, args.confidence, args.seed).items()):
+            print(f"{cell}: A {result['accuracy_a']:.4f}, B {result['accuracy_b']:.4f}, A - B {result['difference']:+.4f} "
+                  f"{args.confidence:.0%} CI [{result['low']:+.4f}, {result['high']:+.4f}], bootstrap p={result['bootstrap_p']:.4f}, "
+                  f"McNemar p={result['mcnemar_p']:.4f}, n={result['items']}")
@@ -0,0 +1,104 @@
+import json
+import os
+from collections.abc import Mapping
+
+# Position of the gpt answer for each segment in the 'conversations' list
+SEGMENT_TURNS = {'segment1': 1, 'segment2': 3, 'segment3': 5}
+
+def category_from_path(path):
+    """Get the task category from an image path, e.g. '/Dataset/Cycle/test/Cycle_Graph_test_0.png' -> 'Cycle'"""
+    category = os.path.basename(path).split('_')[0]
+    # The HamiltonPath split is stored under the misspelled name 'HamlitonPath'
+    if category == 'HamlitonPath':
+        category = 'HamiltonPath'
+    return category
+
+class Records(Mapping):
+    """(category, id) -> record, in load order
+
+    Records from JSON files are kept as loaded; records of a columnar dataset are only an (dataset, position)
+    entry and are decoded from the memory-mapped columns each time they are accessed.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def __getitem__(self, key):
+        entry = self.entries[key]
+        if isinstance(entry, tuple):
+            dataset, position = entry
+            return dataset.record(position)
+        return entry
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+class StandardIndex:
+    """Hash index over ground-truth records, keyed by (category, id) and (category, id, segment)"""
+
+    def __init__(self):
+        self.records = Records()
+        self.answers = {}
+        # (category, id) -> (ColumnarDataset, index) for records loaded from a columnar dataset
+        self.graph_sources = {}
+
+    def check_new(self, key):
+        if key in self.records:
+            raise ValueError(f"Duplicate ground-truth record for category {key[0]}, id {key[1]}")
+
+    def add(self, item):
+        category = category_from_path(item['image'])
+        key = (category, str(item['id']))
+        self.check_new(key)
+        self.records.entries[key] = item
+        for segment, turn in SEGMENT_TURNS.items():
+            if turn < len(item['conversations']):
+                self.answers[key + (segment,)] = item['conversations'][turn]['value']
+        return key
+
+    def add_columnar(self, dataset):
+        """Index the records of a columnar dataset by position, from its category and id columns only"""
+        for position, key in enumerate(dataset.keys()):
+            self.check_new(key)
+            self.records.entries[key] = self.graph_sources[key] = (dataset, position)
+
+    def has_record(self, category, id):
+        """Whether the record exists, without decoding a columnar record"""
+        return (category, str(id)) in self.records
+
+    def get_record(self, category, id):
+        return self.records.get((category, str(id)))
+
+    def get_answer(self, category, id, segment):
+        key = (category, str(id))
+        source = self.graph_sources.get(key)
+        if source is not None:
+            dataset, position = source
+            turn = SEGMENT_TURNS.get(segment)
+            return dataset.answer(position, turn) if turn is not None else None
+        return self.answers.get(key + (segment,))
+
+    def __len__(self):
+        return len(self.records)
+
+def load_standard_index(json_files):
+    """Build the ground-truth index from any set of test.json / standard.json files or columnar dataset directories"""
+    if isinstance(json_files, str):
+        json_files = [json_files]
+    index = StandardIndex()
+    for json_file in json_files:
+        if os.path.isdir(json_file):
+            # Converted by columnar_dataset.py, the graphs are read from the columns instead of parsed from text
+            from columnar_dataset import ColumnarDataset
+            index.add_columnar(ColumnarDataset(json_file))
+            continue
+        with open(json_file, 'r', encoding='utf-8') as file:
+            for item in json.load(file):
+                index.add(item)
+    return index
@@ -0,0 +1,86 @@
+import json
+
+def iter_records(json_file, chunk_size=1 << 20):
+    """Yield result records one by one from a JSON array or a JSONL file, keeping memory bounded"""
+    with open(json_file, 'r', encoding='utf-8') as file:
+        first_chunk = file.read(chunk_size)
+        while first_chunk and not first_chunk.strip():
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            first_chunk += chunk
+        if first_chunk.lstrip()[:1] == '[':
+            yield from _iter_json_array(file, first_chunk, chunk_size)
+        else:
+            # JSONL: one record per line, empty lines are ignored
+            file.seek(0)
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+# Longest tail a cut-off literal can leave at the end of the buffer (e.g. '-Infinit' or 'fals')
+PARTIAL_TAIL = 16
+
+def _iter_json_array(file, first_chunk, chunk_size, max_record_size=1 << 28):
+    """Incrementally decode the elements of a top-level JSON array
+
+    An element cut off at the end of the buffer is completed with the next chunk; any other decoding error is
+    raised at once as a JSONDecodeError with the line, column and character in the file, without reading
+    further. A single element larger than max_record_size characters is an error too.
+    """
+    decoder = json.JSONDecoder()
+    start = first_chunk.index('[') + 1
+    buffer = first_chunk[start:]
+    # Position in the file of buffer[0]: character offset, line and column
+    offset = start
+    line, column = _advance(1, 0, first_chunk[:start])
+    position = 0
+    eof = False
+    while True:
+        # Skip whitespace and the separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        complete = False
+        if position < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                # A value running up to the end of the buffer may be cut off (e.g. a number), so wait for more data
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError as error:
+                # Only an error at the end of the buffer (or in a string running up to it) can be fixed by more data
+                cut_off = error.msg.startswith('Unterminated string') or len(buffer) - error.pos <= PARTIAL_TAIL
+                if eof or not cut_off:
+                    raise _file_error(error, file, offset, line, column)
+                if len(buffer) - position > max_record_size:
+                    raise ValueError(f"JSON array element larger than {max_record_size} characters at character {offset + position} of {file.name}")
+        if complete:
+            yield record
+            position = end
+            continue
+        if eof:
+            raise ValueError(f"Truncated JSON array in {file.name}")
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        # Drop what has been decoded, keeping track of where the buffer starts in the file
+        offset += position
+        line, column = _advance(line, column, buffer[:position])
+        buffer = buffer[position:] + chunk
+        position = 0
+
+def _advance(line, column, text):
+    """Line and column (0-based) after text, starting from line and column"""
+    newlines = text.count('\n')
+    if not newlines:
+        return line, column + len(text)
+    return line + newlines, len(text) - text.rindex('\n') - 1
+
+def _file_error(error, file, offset, line, column):
+    """The JSONDecodeError of a buffer, located in the file: buffer[0] is at character offset, line and column"""
+    lineno = line + error.lineno - 1
+    colno = error.colno + column if error.lineno == 1 else error.colno
+    file_error = json.JSONDecodeError(error.msg, error.doc, error.pos)
+    file_error.pos, file_error.lineno, file_error.colno = offset + error.pos, lineno, colno
+    file_error.args = (f"{error.msg} in {file.name}: line {lineno} column {colno} (char {offset + error.pos})",)
+    return file_error
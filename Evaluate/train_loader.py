@@ -0,0 +1,136 @@
+import collections
+import glob
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import torch.utils.data
+    IterableDataset = torch.utils.data.IterableDataset
+except ImportError:
+    # Without PyTorch the loader is a plain iterable, sharded with the worker / num_workers arguments
+    torch = None
+    IterableDataset = object
+
+from standard_index import category_from_path
+from stream_results import iter_records
+from columnar_dataset import ColumnarDataset, is_columnar_dataset
+
+def discover_splits(dataset_dir, split='train'):
+    """Map each category to its split file, e.g. {'Cycle': ['Dataset/Cycle/train.json'], ...}"""
+    sources = {}
+    for json_file in sorted(glob.glob(os.path.join(dataset_dir, '*', f'{split}.json'))):
+        # 'HamlitonPath' -> 'HamiltonPath'
+        category = category_from_path(os.path.basename(os.path.dirname(json_file)))
+        sources.setdefault(category, []).append(json_file)
+    return sources
+
+def read_image(path):
+    """Default image loader, the raw bytes of the file (None if it does not exist)"""
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+class ConversationStream(IterableDataset):
+    """Streaming loader over the conversation splits
+
+    Categories are interleaved with the given mixing weights (equal by default; a category that runs out is
+    dropped and the others keep their relative weights). Record j of a category belongs to shard
+    j % (world_size * num_workers), and each shard mixes its records with an RNG seeded by (seed, epoch, shard),
+    so every rank and worker sees a deterministic, disjoint part of the data. Images are read ahead in a
+    thread pool, `prefetch` records in advance. Each item is the record with its category, the
+    (question, answer) pairs of the three segments in `turns` and the loaded image in `image_data`.
+    """
+
+    def __init__(self, sources, weights=None, seed=0, rank=0, world_size=1, worker=None, num_workers=None,
+                 image_root='', load_image=read_image, prefetch=32, image_threads=4, shuffle_buffer=0):
+        # sources: category -> list of JSON / JSONL files or columnar dataset directories
+        self.sources = sources
+        self.weights = {category: 1.0 if weights is None else weights.get(category, 0.0) for category in sources}
+        self.seed = seed
+        self.epoch = 0
+        self.rank = rank
+        self.world_size = world_size
+        self.worker = worker
+        self.num_workers = num_workers
+        self.image_root = image_root
+        self.load_image = load_image
+        self.prefetch = prefetch
+        self.image_threads = image_threads
+        self.shuffle_buffer = shuffle_buffer
+
+    def set_epoch(self, epoch):
+        """Change the mixing order for a new epoch"""
+        self.epoch = epoch
+
+    def shard(self):
+        """(shard index, number of shards) of this process and data worker"""
+        worker, num_workers = self.worker, self.num_workers
+        if worker is None and torch is not None:
+            worker_info = torch.utils.data.get_worker_info()
+            if worker_info is not None:
+                worker, num_workers = worker_info.id, worker_info.num_workers
+        worker, num_workers = worker or 0, num_workers or 1
+        return self.rank * num_workers + worker, self.world_size * num_workers
+
+    def category_records(self, category, shard, num_shards):
+        """Stream the records of one category that belong to a shard"""
+        position = 0
+        for path in self.sources[category]:
+            if is_columnar_dataset(path):
+                # Only the records of this shard are decoded
+                dataset = ColumnarDataset(path)
+                for index in range(len(dataset)):
+                    if dataset.category(index) == category:
+                        if position % num_shards == shard:
+                            yield dataset.record(index)
+                        position += 1
+                continue
+            for record in iter_records(path):
+                if position % num_shards == shard:
+                    yield record
+                position += 1
+
+    def mixed_records(self):
+        """Interleave the categories of this shard with the mixing weights"""
+        shard, num_shards = self.shard()
+        rng = random.Random(f"{self.seed}-{self.epoch}-{shard}")
+        streams = {category: self.category_records(category, shard, num_shards) for category, weight in self.weights.items() if weight > 0}
+        buffer = []
+        while streams:
+            categories = list(streams)
+            category = rng.choices(categories, [self.weights[category] for category in categories])[0]
+            record = next(streams[category], None)
+            if record is None:
+                del streams[category]
+                continue
+            if self.shuffle_buffer <= 1:
+                yield category, record
+                continue
+            # Shuffle within a bounded buffer, the stream is never held in memory
+            buffer.append((category, record))
+            if len(buffer) >= self.shuffle_buffer:
+                yield buffer.pop(rng.randrange(len(buffer)))
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def item(self, category, record, image_data):
+        conversations = record['conversations']
+        return dict(record, category=category, image_data=image_data,
+                    turns=[(conversations[turn]['value'], conversations[turn + 1]['value']) for turn in range(0, len(conversations) - 1, 2)])
+
+    def __iter__(self):
+        with ThreadPoolExecutor(self.image_threads) as executor:
+            pending = collections.deque()
+            for category, record in self.mixed_records():
+                # The image paths start with /Dataset/...
+                image_path = os.path.join(self.image_root, record['image'].lstrip('/'))
+                pending.append((category, record, executor.submit(self.load_image, image_path)))
+                if len(pending) > self.prefetch:
+                    category, record, image = pending.popleft()
+                    yield self.item(category, record, image.result())
+            while pending:
+                category, record, image = pending.popleft()
+                yield self.item(category, record, image.result())
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+class VerdictCache:
+    """Persistent verdict cache, an append-only JSONL file of {"key": ..., "verdict": ...} lines
+
+    The key hashes the evaluator version, the category, the ground-truth record (graph, question and gold
+    answer), the segment and the answer text, so on a re-run only new or changed answers are scored again.
+    Bump the evaluator version whenever a checker changes to invalidate the old verdicts.
+    """
+
+    def __init__(self, cache_file, version, flush_every=10000):
+        self.cache_file = cache_file
+        self.version = version
+        self.flush_every = flush_every
+        self.verdicts = {}
+        self.new_verdicts = []
+        self.record_digests = {}
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut off by an interrupted run
+                        continue
+                    self.verdicts[entry['key']] = entry['verdict']
+
+    def record_digest(self, category, record):
+        """Hash of a ground-truth record, computed once per record"""
+        record_key = (category, str(record['id']))
+        digest = self.record_digests.get(record_key)
+        if digest is None:
+            turns = [turn['value'] for turn in record['conversations']]
+            digest = hashlib.sha1(json.dumps(turns).encode('utf-8')).hexdigest()
+            self.record_digests[record_key] = digest
+        return digest
+
+    def key(self, category, record, segment, answer):
+        # Normalize line endings, any other difference in the answer text may change the verdict
+        answer = answer.replace('\r\n', '\n')
+        content = json.dumps([self.version, category, self.record_digest(category, record), segment, answer])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Cached verdict, or None if the answer has not been scored yet"""
+        return self.verdicts.get(key)
+
+    def add(self, key, verdict):
+        if key in self.verdicts:
+            return
+        self.verdicts[key] = verdict
+        self.new_verdicts.append(key)
+        if len(self.new_verdicts) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Append the verdicts added since the last flush to the cache file"""
+        if not self.new_verdicts:
+            return
+        with open(self.cache_file, 'a', encoding='utf-8') as file:
+            for key in self.new_verdicts:
+                file.write(json.dumps({'key': key, 'verdict': self.verdicts[key]}) + '\n')
+        self.new_verdicts = []